@@ -1,14 +1,39 @@
 # Fargate Application for EFS Mount Target Auto-scaling
 # This application mounts multiple EFS mount targets and distributes file access
 
+import io
 import os
 import json
+import ctypes
+import errno
+import asyncio
+import atexit
 import logging
+import math
+import mmap
+import resource
+import signal
+import bisect
 import hashlib
+import functools
+import itertools
+import shutil
+import tempfile
+import threading
+import time
 import subprocess
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager, nullcontext
 import boto3
 from botocore.exceptions import ClientError
 
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional; batch routing falls back to pure Python
+    np = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -85,6 +110,10 @@ def get_default_mount_targets():
     return []
 
 
+# NFS rsize/wsize used for every mount; streaming I/O uses the same buffer size
+NFS_IO_SIZE = 1048576
+
+
 def mount_nfs_targets(mount_targets):
     """
     Mount each NFS mount target to a unique mount point
@@ -102,7 +131,7 @@ def mount_nfs_targets(mount_targets):
     successfully_mounted = []
     
     for index, mount_target in enumerate(mount_targets):
-        mount_point = f"/mnt/efs-{index}"
+        mount_point = mount_point_for_index(index)
         mount_target_id = mount_target.get('mount_target_id', 'unknown')
         ip_address = mount_target.get('ip_address')
         
@@ -121,7 +150,7 @@ def mount_nfs_targets(mount_targets):
             mount_command = [
                 'mount',
                 '-t', 'nfs4',
-                '-o', 'nfsvers=4.1,rsize=1048576,wsize=1048576,hard,timeo=600,retrans=2',
+                '-o', f"nfsvers=4.1,rsize={NFS_IO_SIZE},wsize={NFS_IO_SIZE},hard,timeo=600,retrans=2",
                 nfs_source,
                 mount_point
             ]
@@ -173,12 +202,27 @@ def initialize():
     Initialize the Fargate application
     - Retrieve mount target list from SSM Parameter Store
     - Mount all mount targets
+    - Flush queued work on SIGTERM/SIGINT before exiting
     
     Returns:
         tuple: (mount_targets, successfully_mounted)
     """
     logger.info("Initializing Fargate application")
     
+    # Select the path hash function, routing and write modes, cache sizes and aio pool size
+    configure_hash_function()
+    configure_routing()
+    configure_path_cache()
+    configure_read_routing()
+    configure_known_directories()
+    configure_metadata_cache()
+    configure_read_cache()
+    configure_file_handle_cache()
+    configure_write_mode()
+    configure_append_buffer()
+    aio.configure()
+    install_signal_handlers()
+    
     # Retrieve mount targets from SSM Parameter Store
     mount_targets = get_mount_targets_from_ssm()
     
@@ -189,278 +233,3709 @@ def initialize():
     return mount_targets, successfully_mounted
 
 
-def calculate_file_path_hash(file_path):
+def _sha256_path_hash(file_path):
+    # SHA-256 over the UTF-8 path; same value as int(hexdigest, 16) without the hex round trip
+    return int.from_bytes(hashlib.sha256(file_path.encode('utf-8')).digest(), 'big')
+
+
+def _blake2b_path_hash(file_path):
+    # BLAKE2b with an 8-byte digest gives a 64-bit key at a fraction of SHA-256's cost
+    return int.from_bytes(hashlib.blake2b(file_path.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _fnv1a_path_hash(file_path):
+    # 64-bit FNV-1a in pure Python; no dependencies, but slower than the C-backed hashes
+    hash_value = 0xcbf29ce484222325
+    for byte in file_path.encode('utf-8'):
+        hash_value = ((hash_value ^ byte) * 0x100000001b3) & 0xffffffffffffffff
+    return hash_value
+
+
+# Registry of path hash functions: name -> callable(str) -> int
+# 'sha256' is the default and keeps routing compatible with earlier releases.
+HASH_FUNCTIONS = {
+    'sha256': _sha256_path_hash,
+    'blake2b': _blake2b_path_hash,
+    'fnv1a': _fnv1a_path_hash
+}
+
+try:
+    import xxhash
+    HASH_FUNCTIONS['xxh64'] = lambda file_path: xxhash.xxh64_intdigest(file_path.encode('utf-8'))
+    HASH_FUNCTIONS['xxh3'] = lambda file_path: xxhash.xxh3_64_intdigest(file_path.encode('utf-8'))
+except ImportError:
+    # xxhash is optional; the built-in hashes are always available
+    pass
+
+DEFAULT_HASH_FUNCTION = 'sha256'
+
+_active_hash_name = DEFAULT_HASH_FUNCTION
+_active_hash_function = HASH_FUNCTIONS[DEFAULT_HASH_FUNCTION]
+
+
+def register_hash_function(name, hash_function):
     """
-    Calculate hash value from file path
+    Register a path hash function
     
     Args:
-        file_path: File path string
+        name: Name used to select the function (e.g. in PATH_HASH_FUNCTION)
+        hash_function: Callable taking a path string and returning a non-negative int
+    """
+    HASH_FUNCTIONS[name] = hash_function
+
+
+def get_hash_function(name):
+    """
+    Look up a path hash function by name
+    
+    Args:
+        name: Registered hash function name
         
     Returns:
-        int: Hash value as integer
+        callable: Hash function taking a path string and returning an int
         
-    Requirements: 3.1
+    Raises:
+        ValueError: If the name is not registered
     """
-    # Use hashlib to create a consistent hash
-    # SHA256 provides good distribution and consistency
-    hash_object = hashlib.sha256(file_path.encode('utf-8'))
-    # Convert hex digest to integer
-    hash_value = int(hash_object.hexdigest(), 16)
-    return hash_value
+    try:
+        return HASH_FUNCTIONS[name]
+    except KeyError:
+        raise ValueError(f"Unknown hash function: {name} (available: {', '.join(sorted(HASH_FUNCTIONS))})")
 
 
-def select_mount_target_index(file_path, num_mount_targets):
+def configure_hash_function(name=None):
     """
-    Select mount target index using hash-based routing
+    Select the path hash function used for routing
+    
+    All tasks sharing an EFS file system must use the same function, otherwise
+    the same path is routed to different mount targets by different tasks.
     
     Args:
-        file_path: File path string
-        num_mount_targets: Number of available mount targets
+        name: Registered hash function name (default: PATH_HASH_FUNCTION
+            environment variable, or 'sha256')
         
     Returns:
-        int: Selected mount target index (0 to num_mount_targets-1)
+        str: Name of the selected hash function
         
-    Requirements: 3.1, 3.2
+    Raises:
+        ValueError: If the name is not registered
     """
-    if num_mount_targets <= 0:
-        raise ValueError("Number of mount targets must be greater than 0")
-    
-    # Calculate hash value
-    hash_value = calculate_file_path_hash(file_path)
+    global _active_hash_name, _active_hash_function
     
-    # Perform modulo operation to get index
-    index = hash_value % num_mount_targets
+    if name is None:
+        name = os.environ.get('PATH_HASH_FUNCTION', DEFAULT_HASH_FUNCTION)
     
-    return index
+    _active_hash_function = get_hash_function(name)
+    _active_hash_name = name
+    logger.info(f"Using path hash function: {name}")
+    return name
 
 
-def resolve_file_path(original_path, mount_target_index):
+def calculate_file_path_hash(file_path):
     """
-    Construct complete file path from original path and mount target index
+    Calculate hash value from file path
+    
+    Uses the hash function selected with configure_hash_function()
+    (SHA-256 by default).
     
     Args:
-        original_path: Original file path (relative or absolute)
-        mount_target_index: Selected mount target index
+        file_path: File path string
         
     Returns:
-        str: Complete file path with mount point prefix
+        int: Hash value as integer
         
-    Requirements: 3.3
+    Requirements: 3.1
+    """
+    return _active_hash_function(file_path)
+
+
+class HashRing:
+    """
+    Consistent-hash ring over mount target IDs with virtual nodes
+    
+    Each mount target is placed on the ring at virtual_nodes points derived from
+    its mount_target_id, so ring positions do not depend on list order. When a
+    target is added only the paths falling into its new arcs (about 1/N) move;
+    every other path keeps its mount target and its NFS client caches.
+    """
+    
+    __slots__ = ('node_ids', 'virtual_nodes', '_points', '_owners')
+    
+    def __init__(self, node_ids, virtual_nodes=100, hash_function=None):
+        if not node_ids:
+            raise ValueError("Number of mount targets must be greater than 0")
+        if virtual_nodes <= 0:
+            raise ValueError("Number of virtual nodes must be greater than 0")
+        
+        hash_function = hash_function or calculate_file_path_hash
+        
+        ring = sorted(
+            (hash_function(f"{node_id}#{replica}"), index)
+            for index, node_id in enumerate(node_ids)
+            for replica in range(virtual_nodes)
+        )
+        
+        self.node_ids = tuple(node_ids)
+        self.virtual_nodes = virtual_nodes
+        self._points = [point for point, _ in ring]
+        self._owners = [index for _, index in ring]
+    
+    def lookup_hash(self, hash_value):
+        """
+        Return the index of the node owning a hash value
+        
+        Args:
+            hash_value: Hash of the routing key
+            
+        Returns:
+            int: Index into node_ids (O(log V) bisect over the ring points)
+        """
+        position = bisect.bisect_right(self._points, hash_value)
+        if position == len(self._points):
+            position = 0
+        return self._owners[position]
+    
+    def walk_hash(self, hash_value):
+        """
+        Yield node indices in ring order starting at the owner of a hash value
+        
+        Each node is yielded once, so the second value is where the key fails
+        over to if its owner is unavailable.
+        
+        Args:
+            hash_value: Hash of the routing key
+            
+        Yields:
+            int: Index into node_ids
+        """
+        start = bisect.bisect_right(self._points, hash_value)
+        seen = set()
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+                if len(seen) == len(self.node_ids):
+                    return
+    
+    def lookup(self, file_path):
+        """
+        Return the index of the node owning a file path
+        
+        Args:
+            file_path: File path string
+            
+        Returns:
+            int: Index into node_ids
+        """
+        return self.lookup_hash(calculate_file_path_hash(file_path))
+
+
+_MASK64 = 0xffffffffffffffff
+
+
+def _mix64(value):
+    # splitmix64 finalizer: spreads a 64-bit key ^ seed over all output bits
+    value = ((value ^ (value >> 30)) * 0xbf58476d1ce4e5b9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94d049bb133111eb) & _MASK64
+    return value ^ (value >> 31)
+
+
+class RendezvousRouter:
     """
-    # Construct mount point path
-    mount_point = f"/mnt/efs-{mount_target_index}"
+    Weighted rendezvous (highest random weight) routing over mount target IDs
     
-    # Remove leading slash from original path if present to avoid double slashes
-    clean_path = original_path.lstrip('/')
+    Every mount target scores each key and the highest score wins. Adding or
+    removing a target only moves the keys that target wins or loses. Weighted
+    scores use -weight / ln(u), which gives each target a share of keys
+    proportional to its weight. With our N <= 6 targets a flat loop over
+    precomputed per-target seeds beats any index structure.
+    """
+    
+    __slots__ = ('node_ids', 'weights', '_seeds', '_weighted')
+    
+    def __init__(self, node_ids, weights=None, hash_function=None):
+        if not node_ids:
+            raise ValueError("Number of mount targets must be greater than 0")
+        
+        hash_function = hash_function or calculate_file_path_hash
+        
+        if weights is None:
+            weights = (1.0,) * len(node_ids)
+        if len(weights) != len(node_ids):
+            raise ValueError("Number of weights must match number of mount targets")
+        if any(weight <= 0 for weight in weights):
+            raise ValueError("Mount target weights must be greater than 0")
+        
+        self.node_ids = tuple(node_ids)
+        self.weights = tuple(float(weight) for weight in weights)
+        self._seeds = tuple(hash_function(str(node_id)) & _MASK64 for node_id in node_ids)
+        self._weighted = len(set(self.weights)) > 1
+    
+    def lookup_hash(self, hash_value):
+        """
+        Return the index of the node with the highest score for a hash value
+        
+        Args:
+            hash_value: Hash of the routing key (reduced to 64 bits)
+            
+        Returns:
+            int: Index into node_ids
+        """
+        key = hash_value & _MASK64
+        best_index = 0
+        best_score = -1.0
+        
+        if self._weighted:
+            log = math.log
+            for index, seed in enumerate(self._seeds):
+                # u in (0, 1); -w / ln(u) is increasing in u
+                u = (_mix64(key ^ seed) + 1) / 18446744073709551617.0
+                score = -self.weights[index] / log(u)
+                if score > best_score:
+                    best_score = score
+                    best_index = index
+        else:
+            for index, seed in enumerate(self._seeds):
+                score = _mix64(key ^ seed)
+                if score > best_score:
+                    best_score = score
+                    best_index = index
+        
+        return best_index
     
-    # Construct complete file path
-    complete_path = os.path.join(mount_point, clean_path)
+    def rank_hash(self, hash_value):
+        """
+        Return node indices ordered from highest to lowest score for a hash value
+        
+        The first entry is lookup_hash(hash_value); the rest are the key's
+        failover order.
+        
+        Args:
+            hash_value: Hash of the routing key (reduced to 64 bits)
+            
+        Returns:
+            list: Indices into node_ids
+        """
+        key = hash_value & _MASK64
+        if self._weighted:
+            scores = [
+                -weight / math.log((_mix64(key ^ seed) + 1) / 18446744073709551617.0)
+                for seed, weight in zip(self._seeds, self.weights)
+            ]
+        else:
+            scores = [_mix64(key ^ seed) for seed in self._seeds]
+        return sorted(range(len(scores)), key=lambda index: (-scores[index], index))
     
-    return complete_path
+    def lookup(self, file_path):
+        """
+        Return the index of the node with the highest score for a file path
+        
+        Args:
+            file_path: File path string
+            
+        Returns:
+            int: Index into node_ids
+        """
+        return self.lookup_hash(calculate_file_path_hash(file_path))
 
 
-def get_file_path(original_path, mount_targets):
+def jump_consistent_hash(key, num_buckets):
     """
-    Calculate hash-based routing for file access and return complete file path
+    Map a 64-bit key to a bucket with jump consistent hashing (Lamping & Veach)
     
-    This function implements the hash-based routing algorithm:
-    1. Calculate hash value from file path
-    2. Select mount target using modulo operation
-    3. Construct complete file path with selected mount point
+    Needs no per-target state. When the bucket count grows from N to N+1 only
+    about 1/(N+1) of the keys move, and all of them move to the new bucket,
+    which matches the Lambda only ever appending mount targets.
     
     Args:
-        original_path: Original file path
-        mount_targets: List of mount targets (or successfully mounted list)
+        key: Routing key (reduced to 64 bits)
+        num_buckets: Number of buckets
         
     Returns:
-        str: Complete file path with selected mount point
-        
-    Requirements: 3.1, 3.2, 3.3, 3.4
+        int: Bucket index (0 to num_buckets-1)
     """
-    if not mount_targets:
-        raise ValueError("No mount targets available")
+    if num_buckets <= 0:
+        raise ValueError("Number of mount targets must be greater than 0")
     
-    # Get number of mount targets
-    num_mount_targets = len(mount_targets)
+    key &= _MASK64
+    bucket = -1
+    jump = 0
+    while jump < num_buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & _MASK64
+        jump = int((bucket + 1) * (2147483648.0 / ((key >> 33) + 1)))
     
-    # Select mount target index using hash-based routing
-    index = select_mount_target_index(original_path, num_mount_targets)
+    return bucket
+
+
+# Routing modes for select_mount_target_index
+# 'modulo' (default) is hash % N; 'ring' is the consistent-hash ring above;
+# 'rendezvous' is weighted highest-random-weight hashing; 'jump' is jump
+# consistent hashing over list positions.
+ROUTING_MODES = ('modulo', 'ring', 'rendezvous', 'jump')
+DEFAULT_ROUTING_MODE = 'modulo'
+DEFAULT_RING_VIRTUAL_NODES = 100
+
+# Directory depth used as the routing key; 0 routes on the full path
+DEFAULT_ROUTING_DIRECTORY_DEPTH = 0
+
+_routing_mode = DEFAULT_ROUTING_MODE
+_ring_virtual_nodes = DEFAULT_RING_VIRTUAL_NODES
+_routing_directory_depth = DEFAULT_ROUTING_DIRECTORY_DEPTH
+
+
+def directory_routing_key(file_path, depth):
+    """
+    Return the directory prefix of a path used as its routing key
     
-    # Resolve complete file path
-    complete_path = resolve_file_path(original_path, index)
+    With depth N every file under the same N leading directories shares a key,
+    so one mount target (and one NFS client attribute cache) serves that tree.
+    Files closer to the root than N are keyed by their full path, so they are
+    spread over the mount targets instead of all sharing one short prefix.
     
-    return complete_path
+    Args:
+        file_path: File path string
+        depth: Number of leading directories to keep (0 returns the path unchanged)
+        
+    Returns:
+        str: Routing key (e.g. 'data/2024' for 'data/2024/01/a.bin' at depth 2)
+    """
+    if depth <= 0:
+        return file_path
+    relative_path = file_path.lstrip('/')
+    parts = relative_path.split('/', depth)
+    if len(parts) > depth:
+        return '/'.join(parts[:depth])
+    return relative_path
 
 
-def read_file(original_path, mount_targets, mode='r', encoding='utf-8'):
+def configure_routing(mode=None, virtual_nodes=None, directory_depth=None):
     """
-    Read file content using hash-based routing
+    Select the routing mode used by select_mount_target_index
     
     Args:
-        original_path: Original file path
-        mount_targets: List of mount targets (or successfully mounted list)
-        mode: File open mode (default: 'r' for text, 'rb' for binary)
-        encoding: Text encoding (default: 'utf-8', ignored for binary mode)
+        mode: Routing mode (default: ROUTING_MODE environment variable, or 'modulo')
+        virtual_nodes: Virtual nodes per mount target for ring mode
+            (default: RING_VIRTUAL_NODES environment variable, or 100)
+        directory_depth: Route on the first N directories of each path instead of
+            the full path, 0 to disable
+            (default: ROUTING_DIRECTORY_DEPTH environment variable, or 0)
         
     Returns:
-        File content (str for text mode, bytes for binary mode)
+        str: Selected routing mode
         
     Raises:
-        ValueError: If no mount targets available
-        FileNotFoundError: If file does not exist
-        IOError: If file cannot be read
-        
-    Requirements: 3.1, 3.2, 3.3, 3.4
+        ValueError: If the mode, virtual node count or directory depth is invalid
     """
-    # Get the complete file path using hash-based routing
-    complete_path = get_file_path(original_path, mount_targets)
+    global _routing_mode, _ring_virtual_nodes, _routing_directory_depth
     
-    logger.debug(f"Reading file: {original_path} -> {complete_path}")
+    if mode is None:
+        mode = os.environ.get('ROUTING_MODE', DEFAULT_ROUTING_MODE)
+    if mode not in ROUTING_MODES:
+        raise ValueError(f"Unknown routing mode: {mode} (available: {', '.join(ROUTING_MODES)})")
     
-    # Read the file
-    try:
-        if 'b' in mode:
-            # Binary mode
-            with open(complete_path, mode) as f:
-                return f.read()
-        else:
-            # Text mode
-            with open(complete_path, mode, encoding=encoding) as f:
-                return f.read()
-    except Exception as e:
-        logger.error(f"Failed to read file {original_path}: {str(e)}")
-        raise
+    if virtual_nodes is None:
+        virtual_nodes_str = os.environ.get('RING_VIRTUAL_NODES', str(DEFAULT_RING_VIRTUAL_NODES))
+        try:
+            virtual_nodes = int(virtual_nodes_str)
+        except ValueError:
+            raise ValueError(f"RING_VIRTUAL_NODES must be a valid integer, got: {virtual_nodes_str}")
+    if virtual_nodes <= 0:
+        raise ValueError("Number of virtual nodes must be greater than 0")
+    
+    if directory_depth is None:
+        depth_str = os.environ.get('ROUTING_DIRECTORY_DEPTH', str(DEFAULT_ROUTING_DIRECTORY_DEPTH))
+        try:
+            directory_depth = int(depth_str)
+        except ValueError:
+            raise ValueError(f"ROUTING_DIRECTORY_DEPTH must be a valid integer, got: {depth_str}")
+    if directory_depth < 0:
+        raise ValueError("Routing directory depth must not be negative")
+    
+    _routing_mode = mode
+    _ring_virtual_nodes = virtual_nodes
+    _routing_directory_depth = directory_depth
+    logger.info(
+        f"Using routing mode: {mode}"
+        + (f" ({virtual_nodes} virtual nodes)" if mode == 'ring' else "")
+        + (f", keyed on directory depth {directory_depth}" if directory_depth else "")
+    )
+    return mode
 
 
-def write_file(original_path, content, mount_targets, mode='w', encoding='utf-8'):
+def get_mount_target_weights(mount_targets):
     """
-    Write content to file using hash-based routing
+    Return routing weights for a mount target list
+    
+    Weights come from the optional 'weight' field of each entry in the SSM
+    document; entries without one get weight 1.0.
     
     Args:
-        original_path: Original file path
-        content: Content to write (str for text mode, bytes for binary mode)
-        mount_targets: List of mount targets (or successfully mounted list)
-        mode: File open mode (default: 'w' for text, 'wb' for binary)
-        encoding: Text encoding (default: 'utf-8', ignored for binary mode)
+        mount_targets: List of mount target dictionaries
         
     Returns:
-        str: Complete file path where content was written
-        
-    Raises:
-        ValueError: If no mount targets available
-        IOError: If file cannot be written
+        tuple: Weight of each entry
+    """
+    return tuple(float(mt.get('weight', 1.0)) for mt in mount_targets)
+
+
+def get_mount_target_ids(mount_targets):
+    """
+    Return stable routing keys for a mount target list
+    
+    Args:
+        mount_targets: List of mount target dictionaries
         
-    Requirements: 3.1, 3.2, 3.3, 3.4
+    Returns:
+        tuple: mount_target_id of each entry (position-based fallback if missing)
+    """
+    return tuple(
+        mt.get('mount_target_id') or f"index-{index}"
+        for index, mt in enumerate(mount_targets)
+    )
+
+
+class PathCache:
     """
-    # Get the complete file path using hash-based routing
-    complete_path = get_file_path(original_path, mount_targets)
+    Bounded, thread-safe LRU cache of resolved paths
     
-    logger.debug(f"Writing file: {original_path} -> {complete_path}")
+    Keyed by the original path. Hit, miss and eviction counters are kept so the
+    size can be tuned against the real working set.
+    """
     
-    # Ensure parent directory exists
-    parent_dir = os.path.dirname(complete_path)
-    if parent_dir:
-        os.makedirs(parent_dir, exist_ok=True)
+    __slots__ = ('maxsize', 'hits', 'misses', 'evictions', '_entries', '_lock')
     
-    # Write the file
-    try:
-        if 'b' in mode:
-            # Binary mode
-            with open(complete_path, mode) as f:
-                f.write(content)
-        else:
-            # Text mode
-            with open(complete_path, mode, encoding=encoding) as f:
-                f.write(content)
-        
-        logger.debug(f"Successfully wrote file: {complete_path}")
-        return complete_path
+    def __init__(self, maxsize):
+        if maxsize <= 0:
+            raise ValueError("Path cache size must be greater than 0")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Return the cached value for a key, or None on a miss
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def discard(self, key):
+        """
+        Drop one entry if present
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """
+        Drop every entry (counters are kept)
+        """
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """
+        Return cache counters
         
-    except Exception as e:
-        logger.error(f"Failed to write file {original_path}: {str(e)}")
-        raise
+        Returns:
+            dict: hits, misses, evictions, size, maxsize and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
 
 
-def append_file(original_path, content, mount_targets, encoding='utf-8'):
+# Resolved-path cache size for MountRouter; 0 disables the cache
+DEFAULT_PATH_CACHE_SIZE = 0
+
+_path_cache_size = DEFAULT_PATH_CACHE_SIZE
+
+
+def configure_path_cache(size=None):
     """
-    Append content to file using hash-based routing
+    Set the size of the resolved-path LRU cache used by new MountRouters
     
     Args:
-        original_path: Original file path
-        content: Content to append (str for text mode, bytes for binary mode)
-        mount_targets: List of mount targets (or successfully mounted list)
-        encoding: Text encoding (default: 'utf-8', ignored for binary mode)
+        size: Maximum cached paths per router, 0 to disable
+            (default: PATH_CACHE_SIZE environment variable, or 0)
         
     Returns:
-        str: Complete file path where content was appended
+        int: Selected cache size
         
     Raises:
-        ValueError: If no mount targets available
-        IOError: If file cannot be written
-        
-    Requirements: 3.1, 3.2, 3.3, 3.4
+        ValueError: If the size is invalid
     """
-    # Determine mode based on content type
-    if isinstance(content, bytes):
-        mode = 'ab'
-    else:
-        mode = 'a'
+    global _path_cache_size
     
-    return write_file(original_path, content, mount_targets, mode=mode, encoding=encoding)
+    if size is None:
+        size_str = os.environ.get('PATH_CACHE_SIZE', str(DEFAULT_PATH_CACHE_SIZE))
+        try:
+            size = int(size_str)
+        except ValueError:
+            raise ValueError(f"PATH_CACHE_SIZE must be a valid integer, got: {size_str}")
+    if size < 0:
+        raise ValueError("Path cache size must not be negative")
+    
+    _path_cache_size = size
+    logger.info(f"Using path cache size: {size}" + (" (disabled)" if size == 0 else ""))
+    return size
 
 
-def file_exists(original_path, mount_targets):
+# Read routing: 'hash' pins reads like writes; 'least_loaded' picks the less
+# loaded of a path's two hash candidates (power of two choices)
+READ_ROUTING_MODES = ('hash', 'least_loaded')
+DEFAULT_READ_ROUTING = 'hash'
+
+# Weight of the newest sample in the per-target latency EWMA
+LATENCY_EWMA_ALPHA = 0.2
+
+_read_routing = DEFAULT_READ_ROUTING
+
+
+def configure_read_routing(mode=None):
     """
-    Check if file exists using hash-based routing
+    Select how read_file picks a mount target
+    
+    Writes are always hash-pinned so a file is written through one NFS client.
     
     Args:
-        original_path: Original file path
-        mount_targets: List of mount targets (or successfully mounted list)
+        mode: Read routing mode (default: READ_ROUTING environment variable, or 'hash')
         
     Returns:
-        bool: True if file exists, False otherwise
+        str: Selected read routing mode
         
-    Requirements: 3.1, 3.2, 3.3, 3.4
+    Raises:
+        ValueError: If the mode is unknown
     """
-    try:
-        complete_path = get_file_path(original_path, mount_targets)
-        return os.path.exists(complete_path)
-    except ValueError:
-        return False
+    global _read_routing
+    
+    if mode is None:
+        mode = os.environ.get('READ_ROUTING', DEFAULT_READ_ROUTING)
+    if mode not in READ_ROUTING_MODES:
+        raise ValueError(f"Unknown read routing mode: {mode} (available: {', '.join(READ_ROUTING_MODES)})")
+    
+    _read_routing = mode
+    logger.info(f"Using read routing: {mode}")
+    return mode
 
 
-def delete_file(original_path, mount_targets):
+def get_mount_points(mount_targets):
     """
-    Delete file using hash-based routing
+    Return the local mount point of each entry in a mount target list
     
     Args:
-        original_path: Original file path
-        mount_targets: List of mount targets (or successfully mounted list)
+        mount_targets: List of mount target dictionaries (or successfully mounted list)
         
     Returns:
-        bool: True if file was deleted, False if file did not exist
-        
-    Raises:
-        ValueError: If no mount targets available
-        IOError: If file cannot be deleted
+        tuple: 'mount_point' of each entry (/mnt/efs-{position} if missing)
+    """
+    positional = _positional_mount_points(len(mount_targets))
+    return tuple([mt.get('mount_point') or positional[index] for index, mt in enumerate(mount_targets)])
+
+
+def mount_point_for_index(index):
+    """
+    Return the local mount point used for the mount target at a list position
+    
+    Args:
+        index: Position of the mount target in the list
         
-    Requirements: 3.1, 3.2, 3.3, 3.4
+    Returns:
+        str: Mount point directory (e.g. /mnt/efs-0)
+    """
+    return f"/mnt/efs-{index}"
+
+
+# Seconds an unhealthy mount target waits before its mount point is probed again
+DEFAULT_HEALTH_RETRY_SECONDS = 30
+
+
+class MountRouter:
     """
-    complete_path = get_file_path(original_path, mount_targets)
+    Routes file paths to mount points for a fixed mount target list
     
-    logger.debug(f"Deleting file: {original_path} -> {complete_path}")
+    Built once per mount target set: the routing mode, hash function and
+    selector (ring, rendezvous seeds, ...) are resolved up front and every mount
+    point prefix is formatted ahead of time, so route() is one hash, one index
+    lookup and one string concatenation. The module-level routing functions are
+    thin wrappers that reuse cached instances of this class.
     
-    try:
-        if os.path.exists(complete_path):
-            os.remove(complete_path)
-            logger.debug(f"Successfully deleted file: {complete_path}")
-            return True
+    Prefixes come from each entry's 'mount_point' (as returned by
+    mount_nfs_targets), so a target skipped during mounting never receives
+    traffic. Targets can be marked unhealthy; their keys then fail over to the
+    key's next candidate while keys of healthy targets stay where they are.
+    After health_retry_seconds the next request that would have used an
+    unhealthy target starts a background probe of its mount point, and its
+    keys return only once the probe succeeds.
+    """
+    
+    __slots__ = (
+        'mode', 'directory_depth', 'node_ids', 'weights', 'prefixes', 'cache',
+        'health_retry_seconds', '_hash', '_select', '_selector', '_unhealthy', '_retry_at', '_health_lock',
+        '_in_flight', '_latency_ewma', '_load_lock'
+    )
+    
+    def __init__(self, mount_targets, mode=None, virtual_nodes=None, hash_function=None, cache_size=None,
+                 directory_depth=None, health_retry_seconds=DEFAULT_HEALTH_RETRY_SECONDS):
+        """
+        Args:
+            mount_targets: List of mount target dictionaries (or successfully mounted
+                list); entries without a 'mount_point' use /mnt/efs-{position}
+            mode: Routing mode (default: mode selected with configure_routing())
+            virtual_nodes: Virtual nodes per mount target for ring mode
+                (default: value selected with configure_routing())
+            hash_function: Path hash function (default: function selected with
+                configure_hash_function())
+            cache_size: Resolved-path LRU cache size, 0 to disable
+                (default: size selected with configure_path_cache())
+            directory_depth: Route on the first N directories of each path, 0 for
+                the full path (default: depth selected with configure_routing())
+            health_retry_seconds: Seconds before an unhealthy mount point is
+                probed again (default: 30)
+            
+        Raises:
+            ValueError: If the list is empty, the mode is unknown or weights are invalid
+        """
+        if not mount_targets:
+            raise ValueError("No mount targets available")
+        
+        mode = mode or _routing_mode
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode: {mode} (available: {', '.join(ROUTING_MODES)})")
+        
+        num_mount_targets = len(mount_targets)
+        self.mode = mode
+        self.node_ids = get_mount_target_ids(mount_targets)
+        self.weights = get_mount_target_weights(mount_targets)
+        self.prefixes = tuple(mount_point.rstrip('/') + '/' for mount_point in get_mount_points(mount_targets))
+        hash_function = hash_function or _active_hash_function
+        self._hash = hash_function
+        self.health_retry_seconds = health_retry_seconds
+        self._unhealthy = frozenset()
+        self._retry_at = {}
+        self._health_lock = threading.Lock()
+        self._in_flight = [0] * num_mount_targets
+        self._latency_ewma = [0.0] * num_mount_targets
+        self._load_lock = threading.Lock()
+        
+        cache_size = _path_cache_size if cache_size is None else cache_size
+        self.cache = PathCache(cache_size) if cache_size > 0 else None
+        
+        self._selector = None
+        if mode == 'ring':
+            self._selector = HashRing(self.node_ids, virtual_nodes or _ring_virtual_nodes, self._hash)
+            self._select = self._selector.lookup_hash
+        elif mode == 'rendezvous':
+            self._selector = RendezvousRouter(self.node_ids, self.weights, self._hash)
+            self._select = self._selector.lookup_hash
+        elif mode == 'jump':
+            self._select = lambda hash_value: jump_consistent_hash(hash_value, num_mount_targets)
+        else:
+            self._select = lambda hash_value: hash_value % num_mount_targets
+        
+        # Directory affinity swaps the path for its directory prefix before hashing
+        self.directory_depth = _routing_directory_depth if directory_depth is None else directory_depth
+        if self.directory_depth > 0:
+            depth = self.directory_depth
+            self._hash = lambda file_path: hash_function(directory_routing_key(file_path, depth))
+    
+    def select(self, file_path):
+        """
+        Return the index of the mount target a file path routes to
+        
+        Args:
+            file_path: File path string
+            
+        Returns:
+            int: Selected mount target index
+        """
+        hash_value = self._hash(file_path)
+        index = self._select(hash_value)
+        if self._unhealthy and index in self._unhealthy:
+            index = self._failover(hash_value, index)
+        return index
+    
+    def _candidates(self, hash_value):
+        # Failover order for a key, starting with its primary target
+        if self.mode == 'ring':
+            yield from self._selector.walk_hash(hash_value)
+        elif self.mode == 'rendezvous':
+            yield from self._selector.rank_hash(hash_value)
+        else:
+            # Positional modes: re-select with a remixed key, then fall back to a scan
+            key = hash_value & _MASK64
+            for attempt in range(1, 2 * len(self.prefixes) + 1):
+                yield self._select(_mix64(key ^ attempt))
+            yield from range(len(self.prefixes))
+    
+    def _failover(self, hash_value, index):
+        self._probe_due()
+        unhealthy = self._unhealthy
+        for candidate in self._candidates(hash_value):
+            if candidate not in unhealthy:
+                return candidate
+        # Nothing healthy left: keep the primary and let the I/O report the error
+        return index
+    
+    def mark_unhealthy(self, index):
+        """
+        Stop routing to a mount target until it is marked healthy again
+        
+        Args:
+            index: Position of the mount target in this router
+            
+        Returns:
+            bool: True if the state changed
+        """
+        return self._set_health(index, healthy=False)
+    
+    def mark_healthy(self, index):
+        """
+        Resume routing to a mount target
+        
+        Args:
+            index: Position of the mount target in this router
+            
+        Returns:
+            bool: True if the state changed
+        """
+        return self._set_health(index, healthy=True)
+    
+    def _set_health(self, index, healthy):
+        if not 0 <= index < len(self.prefixes):
+            raise ValueError(f"Mount target index out of range: {index}")
+        
+        with self._health_lock:
+            if (index not in self._unhealthy) == healthy:
+                return False
+            # Copy-on-write so route() reads the set without taking the lock
+            retry_at = dict(self._retry_at)
+            if healthy:
+                self._unhealthy = self._unhealthy - {index}
+                retry_at.pop(index, None)
+            else:
+                self._unhealthy = self._unhealthy | {index}
+                retry_at[index] = time.monotonic() + self.health_retry_seconds
+            self._retry_at = retry_at
+        
+        if self.cache is not None:
+            self.cache.clear()
+        logger.warning(
+            f"Mount target {self.node_ids[index]} ({self.prefixes[index][:-1]}) marked "
+            f"{'healthy' if healthy else 'unhealthy'}"
+        )
+        return True
+    
+    def _probe_due(self):
+        # Start one background probe per unhealthy target whose probation ended
+        now = time.monotonic()
+        if not any(retry_at <= now for retry_at in self._retry_at.values()):
+            return
+        with self._health_lock:
+            due = [index for index, retry_at in self._retry_at.items() if retry_at <= now]
+            # No new probe until this one reports back
+            self._retry_at = {**self._retry_at, **{index: math.inf for index in due}}
+        for index in due:
+            threading.Thread(
+                target=self._probe, args=(index,), name=f"health-{self.node_ids[index]}", daemon=True
+            ).start()
+    
+    def _probe(self, index):
+        try:
+            os.statvfs(self.prefixes[index][:-1])
+        except OSError as e:
+            logger.warning(f"Mount target {self.node_ids[index]} still unhealthy: {str(e)}")
+            with self._health_lock:
+                if index in self._retry_at:
+                    self._retry_at = {**self._retry_at, index: time.monotonic() + self.health_retry_seconds}
+        else:
+            self.mark_healthy(index)
+    
+    def index_of_path(self, complete_path):
+        """
+        Return the index of the mount point a routed path lives on
+        
+        Args:
+            complete_path: Path returned by route()
+            
+        Returns:
+            int: Mount target index, or None if the path is not under any mount point
+        """
+        for index, prefix in enumerate(self.prefixes):
+            if complete_path.startswith(prefix):
+                return index
+        return None
+    
+    def health(self):
+        """
+        Return the health state of every mount target
+        
+        Returns:
+            dict: mount_target_id -> True if healthy
+        """
+        unhealthy = self._unhealthy
+        return {node_id: index not in unhealthy for index, node_id in enumerate(self.node_ids)}
+    
+    def check_health(self, probe=None):
+        """
+        Probe every mount point and update health states
+        
+        Args:
+            probe: Callable taking a mount point and raising OSError when it is
+                unusable (default: os.statvfs)
+            
+        Returns:
+            dict: mount_target_id -> True if healthy
+        """
+        probe = probe or os.statvfs
+        for index, prefix in enumerate(self.prefixes):
+            try:
+                probe(prefix[:-1])
+            except OSError:
+                self.mark_unhealthy(index)
+            else:
+                self.mark_healthy(index)
+        return self.health()
+    
+    def select_read(self, file_path):
+        """
+        Return the mount target index to read a file path through
+        
+        Compares the path's hash-selected target with its next healthy
+        candidate and picks the one with the lower (in-flight + 1) * latency
+        EWMA, preferring the hash-selected target on ties.
+        
+        Args:
+            file_path: File path string
+            
+        Returns:
+            int: Selected mount target index
+        """
+        hash_value = self._hash(file_path)
+        primary = self._select(hash_value)
+        unhealthy = self._unhealthy
+        if unhealthy and primary in unhealthy:
+            primary = self._failover(hash_value, primary)
+        
+        for candidate in self._candidates(hash_value):
+            if candidate != primary and candidate not in unhealthy:
+                break
+        else:
+            return primary
+        
+        if self._load_cost(candidate) < self._load_cost(primary):
+            return candidate
+        return primary
+    
+    def route_read(self, file_path):
+        """
+        Return the complete file path to read through (see select_read)
+        
+        Args:
+            file_path: Original file path (relative or absolute)
+            
+        Returns:
+            str: Complete file path with mount point prefix
+        """
+        return self.prefixes[self.select_read(file_path)] + file_path.lstrip('/')
+    
+    def _load_cost(self, index):
+        # Unsampled targets count as 0.1 ms so in-flight operations still separate them
+        return (self._in_flight[index] + 1) * max(self._latency_ewma[index], 0.0001)
+    
+    @contextmanager
+    def track(self, index):
+        """
+        Count an operation as in flight on a mount target and record its latency
+        
+        Args:
+            index: Mount target index the operation runs against
+        """
+        with self._load_lock:
+            self._in_flight[index] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._load_lock:
+                self._in_flight[index] -= 1
+                previous = self._latency_ewma[index]
+                self._latency_ewma[index] = elapsed if previous == 0.0 else (
+                    LATENCY_EWMA_ALPHA * elapsed + (1 - LATENCY_EWMA_ALPHA) * previous
+                )
+    
+    def load(self):
+        """
+        Return the load state of every mount target
+        
+        Returns:
+            dict: mount_target_id -> {'in_flight': int, 'latency_ewma_ms': float}
+        """
+        with self._load_lock:
+            return {
+                node_id: {
+                    'in_flight': self._in_flight[index],
+                    'latency_ewma_ms': self._latency_ewma[index] * 1000
+                }
+                for index, node_id in enumerate(self.node_ids)
+            }
+    
+    def route(self, file_path):
+        """
+        Return the complete file path on the selected mount point
+        
+        Args:
+            file_path: Original file path (relative or absolute)
+            
+        Returns:
+            str: Complete file path with mount point prefix
+        """
+        cache = self.cache
+        if cache is not None:
+            if self._unhealthy:
+                # Cached failed-over paths skip _failover, so check for due probes here
+                self._probe_due()
+            complete_path = cache.get(file_path)
+            if complete_path is None:
+                complete_path = self.prefixes[self.select(file_path)] + file_path.lstrip('/')
+                cache.put(file_path, complete_path)
+            return complete_path
+        
+        if self._unhealthy:
+            return self.prefixes[self.select(file_path)] + file_path.lstrip('/')
+        return self.prefixes[self._select(self._hash(file_path))] + file_path.lstrip('/')
+    
+    def route_many(self, file_paths):
+        """
+        Route several file paths
+        
+        Args:
+            file_paths: Iterable of original file paths
+            
+        Returns:
+            list: Complete file paths, in input order
+        """
+        if self.cache is not None or self._unhealthy:
+            return [self.route(path) for path in file_paths]
+        
+        prefixes = self.prefixes
+        select = self._select
+        hash_function = self._hash
+        return [prefixes[select(hash_function(path))] + path.lstrip('/') for path in file_paths]
+    
+    def select_batch(self, hash_values):
+        """
+        Return the mount target index for each of several path hashes
+        
+        Uses NumPy when it is installed and the mode can be evaluated exactly on
+        64-bit integers, and a per-hash loop otherwise. Both give the same
+        indices as select().
+        
+        Args:
+            hash_values: List of path hashes
+            
+        Returns:
+            list: Mount target index of each hash, in input order
+        """
+        indices = None
+        if np is not None and hash_values:
+            indices = _select_batch_numpy(self, hash_values)
+        if indices is not None:
+            indices = indices.tolist()
+        else:
+            select = self._select
+            indices = [select(hash_value) for hash_value in hash_values]
+        
+        unhealthy = self._unhealthy
+        if unhealthy:
+            indices = [
+                self._failover(hash_value, index) if index in unhealthy else index
+                for hash_value, index in zip(hash_values, indices)
+            ]
+        return indices
+    
+    def route_batch(self, file_paths):
+        """
+        Route many file paths and group them per mount point
+        
+        Hashes every path in one pass and computes all indices together (see
+        select_batch), so callers can issue their I/O per mount in bulk. The
+        path cache is bypassed.
+        
+        Args:
+            file_paths: Iterable of original file paths
+            
+        Returns:
+            dict: Mount point -> complete file paths routed to it, in input order
+                (mount points that receive no paths are omitted)
+        """
+        file_paths = list(file_paths)
+        hash_function = self._hash
+        indices = self.select_batch([hash_function(path) for path in file_paths])
+        
+        groups = [[] for _ in self.prefixes]
+        for path, index in zip(file_paths, indices):
+            groups[index].append(path.lstrip('/'))
+        
+        return {
+            prefix[:-1]: [prefix + path for path in paths]
+            for prefix, paths in zip(self.prefixes, groups)
+            if paths
+        }
+    
+    def cache_stats(self):
+        """
+        Return resolved-path cache counters
+        
+        Returns:
+            dict: PathCache.stats(), or None if the cache is disabled
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+
+# Router most recently returned by get_mount_router, reported by get_path_cache_stats
+_current_router = None
+
+# id(list) -> (list, its entries, routing configuration, router) for recent get_mount_router
+# calls. The entries are kept by reference, so a dictionary edited in place still compares
+# equal to itself: edit a mount target by replacing its dictionary.
+_router_memo = {}
+_router_memo_lock = threading.Lock()
+ROUTER_MEMO_SIZE = 16
+
+
+@functools.lru_cache(maxsize=ROUTER_MEMO_SIZE)
+def _get_mount_router(mode, virtual_nodes, hash_function, cache_size, directory_depth, node_ids, weights,
+                      mount_points):
+    # Routers are rebuilt only when the routing configuration or mount target set changes
+    mount_targets = [
+        {'mount_target_id': node_id, 'weight': weight, 'mount_point': mount_point}
+        for node_id, weight, mount_point in zip(node_ids, weights, mount_points)
+    ]
+    return MountRouter(mount_targets, mode, virtual_nodes, hash_function, cache_size, directory_depth)
+
+
+def get_mount_router(mount_targets):
+    """
+    Return a MountRouter for a mount target list under the current configuration
+    
+    Callers that route many paths against the same list should keep the
+    returned router and call route() directly instead of get_file_path().
+    Repeated calls with one of the last 16 lists return the router without
+    rebuilding its key, as long as no entry was added, removed or replaced; a
+    dictionary edited in place is not noticed. Every router keeps its own path
+    cache, so alternating between lists does not flush it.
+    
+    Args:
+        mount_targets: List of mount target dictionaries, or a MountRouter
+        
+    Returns:
+        MountRouter: Router for the list (shared between calls)
+        
+    Raises:
+        ValueError: If no mount targets are available
+    """
+    if isinstance(mount_targets, MountRouter):
+        return mount_targets
+    
+    global _current_router
+    
+    # Fast path: a recent list, holding the same entries, under the same configuration
+    config = (_routing_mode, _ring_virtual_nodes, _active_hash_function, _path_cache_size, _routing_directory_depth)
+    memo = _router_memo.get(id(mount_targets))
+    if memo is not None and memo[0] is mount_targets and memo[2] == config and memo[1] == tuple(mount_targets):
+        _current_router = memo[3]
+        return memo[3]
+    
+    if not mount_targets:
+        raise ValueError("No mount targets available")
+    
+    node_ids = None if _routing_mode in ('modulo', 'jump') else get_mount_target_ids(mount_targets)
+    weights = get_mount_target_weights(mount_targets) if _routing_mode == 'rendezvous' else None
+    router = _get_configured_router(len(mount_targets), node_ids, weights, get_mount_points(mount_targets))
+    
+    # Each router keeps its own path cache: its mappings stay valid for its
+    # mount set and configuration, so switching between lists loses nothing
+    _current_router = router
+    
+    with _router_memo_lock:
+        if len(_router_memo) >= ROUTER_MEMO_SIZE:
+            del _router_memo[next(iter(_router_memo))]
+        _router_memo[id(mount_targets)] = (mount_targets, tuple(mount_targets), config, router)
+    return router
+
+
+def get_path_cache_stats():
+    """
+    Return resolved-path cache counters of the router used by get_file_path
+    
+    Returns:
+        dict: PathCache.stats(), or None if no router is in use or the cache is disabled
+    """
+    return _current_router.cache_stats() if _current_router is not None else None
+
+
+def _to_uint64_array(values):
+    # None when a value does not fit in 64 bits (e.g. full SHA-256 hashes)
+    try:
+        return np.array(values, dtype=np.uint64)
+    except OverflowError:
+        return None
+
+
+def _mix64_array(values):
+    # Vectorized _mix64; uint64 arithmetic wraps like the & _MASK64 in the scalar version
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def _jump_consistent_hash_array(keys, num_buckets):
+    # Vectorized jump_consistent_hash: every key advances until its next jump leaves the range
+    keys = keys.copy()
+    buckets = np.full(len(keys), -1, dtype=np.int64)
+    jumps = np.zeros(len(keys), dtype=np.int64)
+    active = np.ones(len(keys), dtype=bool)
+    while active.any():
+        buckets[active] = jumps[active]
+        keys[active] = keys[active] * np.uint64(2862933555777941757) + np.uint64(1)
+        divisor = ((keys[active] >> np.uint64(33)) + np.uint64(1)).astype(np.float64)
+        jumps[active] = ((buckets[active] + 1) * (2147483648.0 / divisor)).astype(np.int64)
+        active = jumps < num_buckets
+    return buckets
+
+
+def _select_batch_numpy(router, hash_values):
+    """
+    Compute mount target indices with NumPy
+    
+    Returns:
+        numpy.ndarray: Indices, or None if the mode cannot be evaluated exactly
+            on 64-bit integers (modulo/ring over wider hashes, weighted rendezvous)
+    """
+    num_mount_targets = len(router.prefixes)
+    
+    if router.mode == 'jump':
+        keys = np.array([hash_value & _MASK64 for hash_value in hash_values], dtype=np.uint64)
+        return _jump_consistent_hash_array(keys, num_mount_targets)
+    
+    if router.mode == 'rendezvous':
+        if router._selector._weighted:
+            return None
+        keys = np.array([hash_value & _MASK64 for hash_value in hash_values], dtype=np.uint64)
+        seeds = np.array(router._selector._seeds, dtype=np.uint64)
+        scores = _mix64_array(keys[:, None] ^ seeds[None, :])
+        return scores.argmax(axis=1)
+    
+    keys = _to_uint64_array(hash_values)
+    if keys is None:
+        return None
+    
+    if router.mode == 'ring':
+        points = _to_uint64_array(router._selector._points)
+        if points is None:
+            return None
+        positions = np.searchsorted(points, keys, side='right')
+        positions[positions == len(points)] = 0
+        return np.array(router._selector._owners)[positions]
+    
+    return keys % np.uint64(num_mount_targets)
+
+
+def route_batch(file_paths, mount_targets):
+    """
+    Route many file paths and group them per mount point
+    
+    Args:
+        file_paths: Iterable of original file paths
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        
+    Returns:
+        dict: Mount point -> complete file paths routed to it (see MountRouter.route_batch)
+        
+    Raises:
+        ValueError: If no mount targets are available
+    """
+    return get_mount_router(mount_targets).route_batch(file_paths)
+
+
+@functools.lru_cache(maxsize=16)
+def _positional_ids(num_mount_targets):
+    return tuple(f"index-{index}" for index in range(num_mount_targets))
+
+
+@functools.lru_cache(maxsize=16)
+def _positional_mount_points(num_mount_targets):
+    return tuple(mount_point_for_index(index) for index in range(num_mount_targets))
+
+
+def _get_configured_router(num_mount_targets, node_ids=None, weights=None, mount_points=None):
+    # Positional modes only depend on the list length, so their IDs are never built per call
+    if node_ids is None or _routing_mode in ('modulo', 'jump'):
+        node_ids = _positional_ids(num_mount_targets)
+    if weights is None or _routing_mode != 'rendezvous':
+        weights = (1.0,) * num_mount_targets
+    if mount_points is None:
+        mount_points = _positional_mount_points(num_mount_targets)
+    return _get_mount_router(
+        _routing_mode, _ring_virtual_nodes, _active_hash_function, _path_cache_size, _routing_directory_depth,
+        tuple(node_ids), tuple(weights), mount_points
+    )
+
+
+def select_mount_target_index(file_path, num_mount_targets, mount_target_ids=None, weights=None):
+    """
+    Select mount target index using hash-based routing
+    
+    Args:
+        file_path: File path string
+        num_mount_targets: Number of available mount targets
+        mount_target_ids: Mount target IDs, used by ring and rendezvous modes so
+            that routing is keyed by ID rather than list position
+        weights: Per-target weights for rendezvous mode (default: equal weights)
+        
+    Returns:
+        int: Selected mount target index (0 to num_mount_targets-1)
+        
+    Requirements: 3.1, 3.2
+    """
+    if num_mount_targets <= 0:
+        raise ValueError("Number of mount targets must be greater than 0")
+    
+    return _get_configured_router(num_mount_targets, mount_target_ids, weights).select(file_path)
+
+
+def resolve_file_path(original_path, mount_target_index):
+    """
+    Construct complete file path from original path and mount target index
+    
+    Args:
+        original_path: Original file path (relative or absolute)
+        mount_target_index: Selected mount target index
+        
+    Returns:
+        str: Complete file path with mount point prefix
+        
+    Requirements: 3.3
+    """
+    # Leading slashes are stripped from the original path to avoid double slashes
+    return mount_point_for_index(mount_target_index) + '/' + original_path.lstrip('/')
+
+
+def get_file_path(original_path, mount_targets):
+    """
+    Calculate hash-based routing for file access and return complete file path
+    
+    This function implements the hash-based routing algorithm:
+    1. Calculate hash value from file path
+    2. Select mount target using the configured routing mode (modulo, ring, rendezvous or jump)
+    3. Construct complete file path with selected mount point
+    
+    Args:
+        original_path: Original file path
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        
+    Returns:
+        str: Complete file path with selected mount point
+        
+    Requirements: 3.1, 3.2, 3.3, 3.4
+    """
+    return get_mount_router(mount_targets).route(original_path)
+
+
+# Directories remembered as existing so writes can skip os.makedirs; 0 disables
+DEFAULT_KNOWN_DIRECTORIES_SIZE = 4096
+
+# NFS round trips os.makedirs(exist_ok=True) makes for a directory that exists:
+# stat of the parent, MKDIR failing with EEXIST, stat of the directory
+MAKEDIRS_EXISTING_METADATA_OPS = 3
+
+_known_directories = PathCache(DEFAULT_KNOWN_DIRECTORIES_SIZE)
+_directory_stats = {'makedirs_calls': 0, 'makedirs_skipped': 0, 'enoent_retries': 0}
+_directory_stats_lock = threading.Lock()
+
+
+def configure_known_directories(size=None):
+    """
+    Set the size of the known-directory cache used by writes
+    
+    Args:
+        size: Maximum remembered directories, 0 to always call os.makedirs
+            (default: KNOWN_DIRECTORIES_SIZE environment variable, or 4096)
+        
+    Returns:
+        int: Selected cache size
+        
+    Raises:
+        ValueError: If the size is invalid
+    """
+    global _known_directories
+    
+    if size is None:
+        size_str = os.environ.get('KNOWN_DIRECTORIES_SIZE', str(DEFAULT_KNOWN_DIRECTORIES_SIZE))
+        try:
+            size = int(size_str)
+        except ValueError:
+            raise ValueError(f"KNOWN_DIRECTORIES_SIZE must be a valid integer, got: {size_str}")
+    if size < 0:
+        raise ValueError("Known directory cache size must not be negative")
+    
+    _known_directories = PathCache(size) if size > 0 else None
+    logger.info(f"Using known directory cache size: {size}" + (" (disabled)" if size == 0 else ""))
+    return size
+
+
+def get_known_directory_stats():
+    """
+    Return known-directory cache counters
+    
+    Returns:
+        dict: makedirs_calls, makedirs_skipped, enoent_retries, metadata_ops_saved
+            (estimated NFS round trips avoided) and the cache's own stats()
+    """
+    with _directory_stats_lock:
+        stats = dict(_directory_stats)
+    stats['metadata_ops_saved'] = stats['makedirs_skipped'] * MAKEDIRS_EXISTING_METADATA_OPS
+    stats['cache'] = _known_directories.stats() if _known_directories is not None else None
+    return stats
+
+
+def _count_directory_stat(name):
+    with _directory_stats_lock:
+        _directory_stats[name] += 1
+
+
+def _open_for_write(complete_path, mode, **kwargs):
+    """
+    Open a file for writing, creating its parent directory only when needed
+    
+    Parent directories that are known to exist skip os.makedirs. If the open
+    then fails with ENOENT (the directory was removed behind our back), the
+    directory is forgotten, created and the open retried once.
+    
+    Returns:
+        file object: Opened file
+    """
+    parent_dir = os.path.dirname(complete_path)
+    known = _known_directories
+    skipped = False
+    
+    if parent_dir:
+        if known is not None and known.get(parent_dir):
+            skipped = True
+            _count_directory_stat('makedirs_skipped')
+        else:
+            os.makedirs(parent_dir, exist_ok=True)
+            _count_directory_stat('makedirs_calls')
+    
+    try:
+        f = open(complete_path, mode, **kwargs)
+    except FileNotFoundError:
+        if not skipped:
+            raise
+        known.discard(parent_dir)
+        _count_directory_stat('enoent_retries')
+        os.makedirs(parent_dir, exist_ok=True)
+        _count_directory_stat('makedirs_calls')
+        f = open(complete_path, mode, **kwargs)
+    
+    if parent_dir and known is not None and not skipped:
+        known.put(parent_dir, True)
+    return f
+
+
+# Minimum NFS attribute cache timeout (acregmin) of our mounts: the Linux
+# default, as the mount options leave actimeo unset. The kernel itself may
+# answer stat() from attributes this old, so metadata cache TTLs stay below it.
+NFS_ACREGMIN = 3
+
+# Existence TTL for file_exists in seconds; 0 disables the metadata cache
+DEFAULT_METADATA_CACHE_TTL = 0
+DEFAULT_METADATA_CACHE_SIZE = 65536
+
+_metadata_cache = None
+_metadata_cache_ttl = DEFAULT_METADATA_CACHE_TTL
+_metadata_stats = {'hits': 0, 'misses': 0, 'expired': 0, 'updates': 0}
+_metadata_stats_lock = threading.Lock()
+
+
+def configure_metadata_cache(ttl=None, size=DEFAULT_METADATA_CACHE_SIZE):
+    """
+    Set the TTL and size of the existence cache used by file_exists
+    
+    Positive and negative answers are both cached. Writes and deletes made
+    through this module update the cache immediately, so only changes made by
+    other clients can be missed, and for no longer than the NFS client's own
+    attribute cache could miss them.
+    
+    Args:
+        ttl: Seconds an answer is reused, 0 to disable, at most NFS_ACREGMIN
+            (default: METADATA_CACHE_TTL environment variable, or 0)
+        size: Maximum cached paths (default: 65536)
+        
+    Returns:
+        float: Selected TTL
+        
+    Raises:
+        ValueError: If the TTL or size is invalid
+    """
+    global _metadata_cache, _metadata_cache_ttl
+    
+    if ttl is None:
+        ttl_str = os.environ.get('METADATA_CACHE_TTL', str(DEFAULT_METADATA_CACHE_TTL))
+        try:
+            ttl = float(ttl_str)
+        except ValueError:
+            raise ValueError(f"METADATA_CACHE_TTL must be a valid number, got: {ttl_str}")
+    if ttl < 0:
+        raise ValueError("Metadata cache TTL must not be negative")
+    if ttl > NFS_ACREGMIN:
+        raise ValueError(f"Metadata cache TTL must not exceed the NFS acregmin of {NFS_ACREGMIN} seconds")
+    
+    _metadata_cache_ttl = ttl
+    _metadata_cache = PathCache(size) if ttl > 0 else None
+    logger.info(f"Using metadata cache TTL: {ttl:g}s" + (" (disabled)" if ttl == 0 else ""))
+    return ttl
+
+
+def get_metadata_cache_stats():
+    """
+    Return existence cache counters
+    
+    Returns:
+        dict: hits (NFS lookups avoided), misses, expired, updates made by
+            our own writes and deletes, hit_rate and the cache's own stats()
+    """
+    with _metadata_stats_lock:
+        stats = dict(_metadata_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    stats['cache'] = _metadata_cache.stats() if _metadata_cache is not None else None
+    return stats
+
+
+def _count_metadata_stat(name):
+    with _metadata_stats_lock:
+        _metadata_stats[name] += 1
+
+
+def _cached_existence(complete_path):
+    # Returns True/False from the cache, or None when the path must be checked
+    cache = _metadata_cache
+    if cache is None:
+        return None
+    entry = cache.get(complete_path)
+    if entry is None:
+        _count_metadata_stat('misses')
+        return None
+    exists, expires_at = entry
+    if time.monotonic() >= expires_at:
+        cache.discard(complete_path)
+        _count_metadata_stat('expired')
+        _count_metadata_stat('misses')
+        return None
+    _count_metadata_stat('hits')
+    return exists
+
+
+def _remember_existence(complete_path, exists, update=False):
+    """
+    Record whether a path exists; None forgets it (state unknown)
+    """
+    cache = _metadata_cache
+    if cache is None:
+        return
+    if exists is None:
+        cache.discard(complete_path)
+    else:
+        cache.put(complete_path, (exists, time.monotonic() + _metadata_cache_ttl))
+    if update:
+        _count_metadata_stat('updates')
+
+
+# Read cache budgets in bytes; both 0 disables the read cache
+DEFAULT_READ_CACHE_MEMORY_BYTES = 0
+DEFAULT_READ_CACHE_DISK_BYTES = 0
+
+# Larger objects skip the memory tier and are spilled to local disk
+READ_CACHE_MEMORY_OBJECT_LIMIT = 262144
+
+_read_cache = None
+
+
+class ReadCache:
+    """
+    Two-tier read-through cache of file contents: memory, then local disk
+    
+    Objects up to memory_object_limit bytes are kept in memory. Larger ones are
+    spilled to a private directory on the task's ephemeral storage. Each tier
+    evicts its least recently used entries to stay within its byte budget.
+    Entries are keyed by the path below the mount point, so one copy serves
+    reads routed through any mount target (they all expose the same file
+    system). Each is stored with the file's mtime and size, which get()
+    compares against the current values, so a changed file is read again.
+    """
+    
+    def __init__(self, memory_bytes, disk_bytes, directory=None,
+                 memory_object_limit=READ_CACHE_MEMORY_OBJECT_LIMIT):
+        """
+        Args:
+            memory_bytes: Byte budget of the memory tier, 0 to disable it
+            disk_bytes: Byte budget of the disk tier, 0 to disable it
+            directory: Parent of the cache's private directory (default: system temp directory)
+            memory_object_limit: Largest object kept in memory
+            
+        Raises:
+            ValueError: If a budget is negative
+        """
+        if memory_bytes < 0 or disk_bytes < 0:
+            raise ValueError("Read cache budgets must not be negative")
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory_object_limit = memory_object_limit
+        self.directory = tempfile.mkdtemp(prefix='efs-read-cache-', dir=directory) if disk_bytes > 0 else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = 0
+        self._files = itertools.count()
+        self._lock = threading.Lock()
+    
+    def read(self, path, key=None):
+        """
+        Return a file's content as bytes, from the cache when it is current
+        
+        Paths that are not cached cost no extra round trip: their version is
+        taken from the open file. Cached paths are validated with one stat().
+        
+        Args:
+            path: Routed file path to stat and read
+            key: Cache key (default: path)
+            
+        Raises:
+            FileNotFoundError: If file does not exist
+            IOError: If file cannot be read
+        """
+        if key is None:
+            key = path
+        if key in self._memory or key in self._disk:
+            stat = os.stat(path)
+            data = self.get(key, (stat.st_mtime_ns, stat.st_size))
+            if data is not None:
+                return data
+        else:
+            with self._lock:
+                self.misses += 1
+        
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+        if len(data) == stat.st_size:
+            self.put(key, (stat.st_mtime_ns, stat.st_size), data)
+        return data
+    
+    def get(self, path, version):
+        """
+        Return cached content for a key if it is still current, or None
+        
+        Args:
+            path: Cache key
+            version: (st_mtime_ns, st_size) of the file now
+        """
+        with self._lock:
+            entry = self._memory.get(path)
+            if entry is not None:
+                if entry[0] == version:
+                    self._memory.move_to_end(path)
+                    self.memory_hits += 1
+                    self.bytes_saved += len(entry[1])
+                    return entry[1]
+                self._pop_memory(path)
+                self.stale += 1
+            
+            entry = self._disk.get(path)
+            if entry is not None and entry[0] != version:
+                self._remove_files([self._pop_disk(path)])
+                self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._disk.move_to_end(path)
+            cache_file = entry[1]
+        
+        try:
+            with open(cache_file, 'rb') as f:
+                data = f.read()
+        except OSError:
+            # Evicted by another thread since the lookup
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        with self._lock:
+            self.disk_hits += 1
+            self.bytes_saved += len(data)
+        return data
+    
+    def put(self, path, version, data):
+        """
+        Store content read from a path, if it fits a tier
+        
+        Args:
+            path: Cache key
+            version: (st_mtime_ns, st_size) the content was read at
+            data: File content as bytes
+        """
+        size = len(data)
+        if size <= self.memory_object_limit and size <= self.memory_bytes:
+            with self._lock:
+                self._pop_memory(path)
+                removed = [self._pop_disk(path)]
+                self._memory[path] = (version, data)
+                self._memory_used += size
+                while self._memory_used > self.memory_bytes:
+                    _, (_, evicted) = self._memory.popitem(last=False)
+                    self._memory_used -= len(evicted)
+                    self.evictions += 1
+            self._remove_files(removed)
+            return
+        
+        if size > self.disk_bytes:
+            return
+        
+        # A fresh file name per entry, so evicting an old entry never removes a newer one
+        cache_file = os.path.join(self.directory, f"{next(self._files)}.bin")
+        try:
+            with open(cache_file, 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning(f"Failed to spill {path} to the read cache: {str(e)}")
+            self._remove_files([cache_file])
+            return
+        
+        with self._lock:
+            self._pop_memory(path)
+            removed = [self._pop_disk(path)]
+            self._disk[path] = (version, cache_file, size)
+            self._disk_used += size
+            while self._disk_used > self.disk_bytes:
+                _, (_, evicted, evicted_size) = self._disk.popitem(last=False)
+                self._disk_used -= evicted_size
+                removed.append(evicted)
+                self.evictions += 1
+        self._remove_files(removed)
+    
+    def invalidate(self, path):
+        """
+        Drop a path from both tiers
+        """
+        with self._lock:
+            self._pop_memory(path)
+            removed = self._pop_disk(path)
+        self._remove_files([removed])
+    
+    def clear(self):
+        """
+        Drop every entry and remove the cache directory (counters are kept)
+        """
+        with self._lock:
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_used = 0
+            self._disk_used = 0
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+            self.disk_bytes = 0
+    
+    def _pop_memory(self, path):
+        entry = self._memory.pop(path, None)
+        if entry is not None:
+            self._memory_used -= len(entry[1])
+    
+    def _pop_disk(self, path):
+        entry = self._disk.pop(path, None)
+        if entry is None:
+            return None
+        self._disk_used -= entry[2]
+        return entry[1]
+    
+    @staticmethod
+    def _remove_files(cache_files):
+        for cache_file in cache_files:
+            if cache_file is not None:
+                try:
+                    os.remove(cache_file)
+                except OSError:
+                    pass
+    
+    def stats(self):
+        """
+        Return read cache counters
+        
+        Returns:
+            dict: memory_hits, disk_hits, misses, stale (entries dropped because
+                the file changed), evictions, bytes_saved (EFS reads avoided),
+                hit_ratio, and entries and bytes used per tier
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'bytes_saved': self.bytes_saved,
+                'hit_ratio': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_used': self._memory_used,
+                'disk_entries': len(self._disk),
+                'disk_used': self._disk_used
+            }
+
+
+def configure_read_cache(memory_bytes=None, disk_bytes=None, directory=None):
+    """
+    Enable, resize or disable the read cache in front of read_file
+    
+    The previous cache, if any, is cleared. Files changed by other clients are
+    detected through stat(), which the NFS client may answer from its
+    attribute cache, so they can be served stale for up to NFS_ACREGMIN
+    seconds. Writes and deletes made through this module invalidate at once.
+    
+    Args:
+        memory_bytes: Memory tier budget
+            (default: READ_CACHE_MEMORY_BYTES environment variable, or 0)
+        disk_bytes: Disk tier budget
+            (default: READ_CACHE_DISK_BYTES environment variable, or 0)
+        directory: Parent directory for spilled objects
+            (default: READ_CACHE_DIR environment variable, or the system temp directory)
+        
+    Returns:
+        tuple: (memory_bytes, disk_bytes)
+        
+    Raises:
+        ValueError: If a budget is invalid
+    """
+    global _read_cache
+    
+    budgets = []
+    for value, name, default in ((memory_bytes, 'READ_CACHE_MEMORY_BYTES', DEFAULT_READ_CACHE_MEMORY_BYTES),
+                                 (disk_bytes, 'READ_CACHE_DISK_BYTES', DEFAULT_READ_CACHE_DISK_BYTES)):
+        if value is None:
+            value_str = os.environ.get(name, str(default))
+            try:
+                value = int(value_str)
+            except ValueError:
+                raise ValueError(f"{name} must be a valid integer, got: {value_str}")
+        if value < 0:
+            raise ValueError("Read cache budgets must not be negative")
+        budgets.append(value)
+    memory_bytes, disk_bytes = budgets
+    if directory is None:
+        directory = os.environ.get('READ_CACHE_DIR') or None
+    
+    previous = _read_cache
+    _read_cache = ReadCache(memory_bytes, disk_bytes, directory) if memory_bytes or disk_bytes else None
+    if previous is not None:
+        previous.clear()
+    
+    logger.info(
+        f"Using read cache: {memory_bytes} bytes in memory, {disk_bytes} bytes on disk"
+        + (" (disabled)" if _read_cache is None else "")
+    )
+    return memory_bytes, disk_bytes
+
+
+def get_read_cache_stats():
+    """
+    Return read cache counters
+    
+    Returns:
+        dict: ReadCache.stats(), or None if the read cache is disabled
+    """
+    cache = _read_cache
+    return cache.stats() if cache is not None else None
+
+
+# Open files kept by the file handle cache; 0 disables it
+DEFAULT_FILE_HANDLE_CACHE_SIZE = 0
+
+# Share of the RLIMIT_NOFILE soft limit the file handle cache may use; the
+# rest stays free for sockets, thread pools and uncached opens
+FILE_HANDLE_RLIMIT_SHARE = 0.5
+
+# write_file/read_file modes served from the file handle cache, by handle kind
+_HANDLE_KINDS = {'r': 'r', 'rb': 'r', 'w': 'w', 'wb': 'w', 'a': 'a', 'ab': 'a'}
+
+_handle_cache = None
+
+
+class _Handle:
+    __slots__ = ('file', 'name', 'version', 'refs', 'evicted')
+    
+    def __init__(self, file, name, version):
+        self.file = file
+        self.name = name
+        self.version = version
+        self.refs = 1
+        self.evicted = False
+
+
+def _handle_version(stat, kind):
+    # Read handles are reused only while the file is unchanged; write and
+    # append handles change the file themselves, so only its identity counts
+    if kind == 'r':
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    return (stat.st_ino,)
+
+
+class FileHandleCache:
+    """
+    Bounded, thread-safe LRU cache of open files keyed by routed path and kind
+    
+    Reusing an open file saves the NFSv4.1 OPEN and CLOSE round trips of each
+    call. Files are opened unbuffered and used with positional I/O (pread,
+    pwrite) or O_APPEND writes, so threads can share one handle. Each use first
+    stats the path: a file replaced or removed by another client is reopened,
+    and a read handle is also reopened when the file's mtime or size changed.
+    This stands in for NFS close-to-open revalidation, but stat() may be
+    answered from the attribute cache, so a change by another client can go
+    unnoticed for up to the attribute cache timeout (NFS_ACREGMIN and up).
+    Evicted handles are closed once the last thread using them is done.
+    """
+    
+    def __init__(self, maxsize):
+        if maxsize <= 0:
+            raise ValueError("File handle cache size must be greater than 0")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._names = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def use(self, path, kind, opener, name=None):
+        """
+        Check out the open file for a path, opening it on a miss
+        
+        Args:
+            path: Routed file path
+            kind: 'r' (read), 'w' (write from offset 0) or 'a' (append)
+            opener: Callable taking the path and returning an unbuffered file object
+            name: Name invalidate() closes the handle by (default: path); the
+                path below the mount point, so one call covers every mount
+            
+        Yields:
+            int: File descriptor, valid until the block exits
+            
+        Raises:
+            FileNotFoundError: If a file to read does not exist
+            IOError: If the file cannot be opened
+        """
+        key = (path, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.refs += 1
+        
+        if entry is not None:
+            try:
+                current = _handle_version(os.stat(path), kind)
+            except FileNotFoundError:
+                current = None
+            if current == entry.version:
+                with self._lock:
+                    self.hits += 1
+            else:
+                self._drop(key, entry)
+                self._release(entry)
+                entry = None
+                with self._lock:
+                    self.stale += 1
+        
+        if entry is None:
+            f = opener(path)
+            entry = _Handle(f, name if name is not None else path, _handle_version(os.fstat(f.fileno()), kind))
+            with self._lock:
+                self.misses += 1
+                replaced = self._pop(key)
+                self._entries[key] = entry
+                self._names.setdefault(entry.name, set()).add(key)
+                evicted = [replaced] if replaced is not None else []
+                while len(self._entries) > self.maxsize:
+                    evicted.append(self._pop(next(iter(self._entries))))
+                    self.evictions += 1
+                closing = self._mark_evicted(evicted)
+            self._close(closing)
+        
+        try:
+            yield entry.file.fileno()
+        except OSError:
+            # ESTALE and friends: never hand this descriptor out again
+            self._drop(key, entry)
+            raise
+        finally:
+            self._release(entry)
+    
+    def _pop(self, key):
+        # Called with the lock held
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._names[entry.name]
+            keys.discard(key)
+            if not keys:
+                del self._names[entry.name]
+        return entry
+    
+    def _mark_evicted(self, entries):
+        # Called with the lock held; returns handles no thread is using
+        for entry in entries:
+            entry.evicted = True
+        return [entry for entry in entries if entry.refs == 0]
+    
+    def _drop(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                self._pop(key)
+            closing = self._mark_evicted([entry])
+        self._close(closing)
+    
+    def _release(self, entry):
+        with self._lock:
+            entry.refs -= 1
+            close = entry.evicted and entry.refs == 0
+        if close:
+            self._close([entry])
+    
+    @staticmethod
+    def _close(entries):
+        for entry in entries:
+            try:
+                entry.file.close()
+            except OSError as e:
+                logger.warning(f"Failed to close cached file handle: {str(e)}")
+    
+    def invalidate(self, name):
+        """
+        Drop every handle opened under a name, through any mount point
+        """
+        with self._lock:
+            entries = [self._pop(key) for key in list(self._names.get(name, ()))]
+            closing = self._mark_evicted(entries)
+        self._close(closing)
+    
+    def close(self):
+        """
+        Drop every handle (handles in use are closed when released)
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._names.clear()
+            closing = self._mark_evicted(entries)
+        self._close(closing)
+    
+    def stats(self):
+        """
+        Return file handle cache counters
+        
+        Returns:
+            dict: hits (opens saved), misses, stale (handles reopened because
+                the file was replaced, removed or, for reads, changed),
+                evictions, size, maxsize and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def configure_file_handle_cache(size=None):
+    """
+    Set the number of open files kept for read_file, write_file and append_file
+    
+    The size is capped at FILE_HANDLE_RLIMIT_SHARE of the RLIMIT_NOFILE soft
+    limit. The previous cache, if any, is closed.
+    
+    Args:
+        size: Maximum open files, 0 to open and close on every call
+            (default: FILE_HANDLE_CACHE_SIZE environment variable, or 0)
+        
+    Returns:
+        int: Selected cache size, after the RLIMIT_NOFILE cap
+        
+    Raises:
+        ValueError: If the size is invalid
+    """
+    global _handle_cache
+    
+    if size is None:
+        size_str = os.environ.get('FILE_HANDLE_CACHE_SIZE', str(DEFAULT_FILE_HANDLE_CACHE_SIZE))
+        try:
+            size = int(size_str)
+        except ValueError:
+            raise ValueError(f"FILE_HANDLE_CACHE_SIZE must be a valid integer, got: {size_str}")
+    if size < 0:
+        raise ValueError("File handle cache size must not be negative")
+    
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft_limit != resource.RLIM_INFINITY:
+        limit = int(soft_limit * FILE_HANDLE_RLIMIT_SHARE)
+        if size > limit:
+            logger.warning(f"File handle cache size {size} capped at {limit} (RLIMIT_NOFILE {soft_limit})")
+            size = limit
+    
+    previous = _handle_cache
+    _handle_cache = FileHandleCache(size) if size > 0 else None
+    if previous is not None:
+        previous.close()
+    
+    logger.info(f"Using file handle cache size: {size}" + (" (disabled)" if size == 0 else ""))
+    return size
+
+
+def get_file_handle_cache_stats():
+    """
+    Return file handle cache counters
+    
+    Returns:
+        dict: FileHandleCache.stats(), or None if the cache is disabled
+    """
+    cache = _handle_cache
+    return cache.stats() if cache is not None else None
+
+
+def _pread_all(fd):
+    chunks = []
+    offset = 0
+    while True:
+        chunk = os.pread(fd, NFS_IO_SIZE, offset)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+        offset += len(chunk)
+
+
+def _write_all(fd, data, offset=None):
+    # pwrite from offset, or write() at the end of an O_APPEND descriptor
+    view = memoryview(data)
+    while view:
+        if offset is None:
+            written = os.write(fd, view)
+        else:
+            written = os.pwrite(fd, view, offset)
+            offset += written
+        view = view[written:]
+
+
+def _read_with_handle(cache, original_path, complete_path):
+    opener = lambda path: open(path, 'rb', buffering=0)
+    with cache.use(complete_path, 'r', opener, _shared_cache_key(original_path)) as fd:
+        return _pread_all(fd)
+
+
+def _write_with_handle(cache, original_path, complete_path, data, kind):
+    mode = 'ab' if kind == 'a' else 'wb'
+    opener = lambda path: _open_for_write(path, mode, buffering=0)
+    with cache.use(complete_path, kind, opener, _shared_cache_key(original_path)) as fd:
+        if kind == 'a':
+            _write_all(fd, data)
+        else:
+            os.ftruncate(fd, 0)
+            _write_all(fd, data, 0)
+
+
+def _shared_cache_key(original_path):
+    # The path below the mount point: the same for every mount target a read may use
+    return original_path.lstrip('/')
+
+
+def _record_own_change(original_path, complete_path, exists, replaced=False):
+    # A write or delete made through this module: update the metadata cache,
+    # drop cached content before anyone can be served the old version, and
+    # close handles on a file that was removed or replaced by a rename, through
+    # whichever mount point they were opened
+    _remember_existence(complete_path, exists, update=True)
+    cache = _read_cache
+    if cache is not None:
+        cache.invalidate(_shared_cache_key(original_path))
+    handles = _handle_cache
+    if handles is not None and (replaced or not exists):
+        handles.invalidate(_shared_cache_key(original_path))
+
+
+# Write modes: 'in_place' writes the target file directly; 'atomic' writes a
+# temporary file, makes it durable and renames it over the target
+WRITE_MODES = ('in_place', 'atomic')
+DEFAULT_WRITE_MODE = 'in_place'
+
+# How long the first writer of a batch waits for others to join its fsync
+DEFAULT_GROUP_COMMIT_WINDOW_MS = 2
+
+# Durability latencies kept per mount point for percentile reporting
+DURABILITY_LATENCY_SAMPLES = 1024
+
+_write_mode = DEFAULT_WRITE_MODE
+_group_commit_window = DEFAULT_GROUP_COMMIT_WINDOW_MS / 1000
+_group_committers = {}
+_group_committers_lock = threading.Lock()
+
+
+def _load_syncfs():
+    # syncfs(2) flushes one file system; it is Linux-only and not wrapped by os
+    try:
+        function = ctypes.CDLL(None, use_errno=True).syncfs
+    except (OSError, AttributeError):
+        return None
+    function.argtypes = [ctypes.c_int]
+    
+    def syncfs(fd):
+        if function(fd) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+    
+    return syncfs
+
+
+_syncfs = _load_syncfs()
+
+
+def configure_write_mode(mode=None, group_commit_window_ms=None):
+    """
+    Select how write_file replaces files and the group-commit window
+    
+    Args:
+        mode: One of WRITE_MODES (default: WRITE_MODE environment variable, or 'in_place')
+        group_commit_window_ms: Milliseconds an atomic write waits for concurrent
+            writers on the same mount to share its fsync, 0 to fsync immediately
+            (default: GROUP_COMMIT_WINDOW_MS environment variable, or 2)
+        
+    Returns:
+        str: Selected write mode
+        
+    Raises:
+        ValueError: If the mode or window is invalid
+    """
+    global _write_mode, _group_commit_window
+    
+    if mode is None:
+        mode = os.environ.get('WRITE_MODE', DEFAULT_WRITE_MODE)
+    mode = mode.lower()
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode: {mode} (available: {', '.join(WRITE_MODES)})")
+    
+    if group_commit_window_ms is None:
+        window_str = os.environ.get('GROUP_COMMIT_WINDOW_MS', str(DEFAULT_GROUP_COMMIT_WINDOW_MS))
+        try:
+            group_commit_window_ms = float(window_str)
+        except ValueError:
+            raise ValueError(f"GROUP_COMMIT_WINDOW_MS must be a valid number, got: {window_str}")
+    if group_commit_window_ms < 0:
+        raise ValueError("Group commit window must not be negative")
+    
+    _write_mode = mode
+    _group_commit_window = group_commit_window_ms / 1000
+    with _group_committers_lock:
+        _group_committers.clear()
+    logger.info(f"Using write mode: {mode} (group commit window: {group_commit_window_ms:g} ms)")
+    return mode
+
+
+class _CommitBatch:
+    __slots__ = ('fds', 'done', 'error')
+    
+    def __init__(self):
+        self.fds = []
+        self.done = threading.Event()
+        self.error = None
+
+
+class GroupCommitter:
+    """
+    Shares fsyncs between concurrent writers on one mount point (group commit)
+    
+    The first writer to call commit() opens a batch and waits window seconds
+    for others to join it. It then makes every file in the batch durable at
+    once: one syncfs() of the mount when the batch holds several files (fsync
+    of each file where syncfs is unavailable), a plain fsync for a single file.
+    Writers that joined wait for that flush instead of issuing their own.
+    """
+    
+    def __init__(self, window):
+        """
+        Args:
+            window: Seconds the first writer of a batch waits before flushing
+        """
+        self.window = window
+        self.commits = 0
+        self.batches = 0
+        self.syncs = 0
+        self._batch = None
+        self._latencies = deque(maxlen=DURABILITY_LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+    
+    def commit(self, fd):
+        """
+        Block until the data written to fd is durable
+        
+        The file must stay open until commit() returns.
+        
+        Args:
+            fd: File descriptor of a file written on this committer's mount point
+            
+        Returns:
+            float: Durability latency in seconds, from the call to the end of the flush
+            
+        Raises:
+            OSError: If the flush failed (raised to every writer in the batch)
+        """
+        start = time.monotonic()
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _CommitBatch()
+            batch.fds.append(fd)
+        
+        if leader:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._lock:
+                # Writers arriving from now on open the next batch
+                self._batch = None
+            try:
+                syncs = self._flush(batch.fds)
+            except OSError as e:
+                batch.error = e
+                syncs = 0
+            batch.done.set()
+            with self._lock:
+                self.batches += 1
+                self.syncs += syncs
+        else:
+            batch.done.wait()
+        
+        if batch.error is not None:
+            raise OSError(batch.error.errno, batch.error.strerror)
+        
+        latency = time.monotonic() - start
+        with self._lock:
+            self.commits += 1
+            self._latencies.append(latency)
+        return latency
+    
+    @staticmethod
+    def _flush(fds):
+        if len(fds) > 1 and _syncfs is not None:
+            _syncfs(fds[0])
+            return 1
+        for fd in fds:
+            os.fsync(fd)
+        return len(fds)
+    
+    def stats(self):
+        """
+        Return group-commit counters
+        
+        Returns:
+            dict: commits, batches, syncs (flush system calls issued),
+                syncs_saved, mean_batch_size and durability latency
+                percentiles in milliseconds over recent commits
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'commits': self.commits,
+                'batches': self.batches,
+                'syncs': self.syncs,
+                'syncs_saved': self.commits - self.syncs,
+                'mean_batch_size': self.commits / self.batches if self.batches else 0.0
+            }
+        
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+        
+        stats['latency_ms'] = {
+            'p50': percentile(0.5),
+            'p99': percentile(0.99),
+            'max': latencies[-1] * 1000 if latencies else 0.0
+        }
+        return stats
+
+
+def _group_committer_for(mount_point):
+    committer = _group_committers.get(mount_point)
+    if committer is None:
+        with _group_committers_lock:
+            committer = _group_committers.get(mount_point)
+            if committer is None:
+                committer = GroupCommitter(_group_commit_window)
+                _group_committers[mount_point] = committer
+    return committer
+
+
+def get_durability_stats():
+    """
+    Return group-commit counters of atomic writes per mount point
+    
+    Returns:
+        dict: Mount point -> GroupCommitter.stats()
+    """
+    with _group_committers_lock:
+        committers = dict(_group_committers)
+    return {mount_point: committer.stats() for mount_point, committer in committers.items()}
+
+
+def _write_atomic(complete_path, mount_point, content, mode, **kwargs):
+    """
+    Replace a file with new content so readers never see a partial write
+    
+    The content goes to a hidden temporary file in the same directory, is made
+    durable through the mount point's group committer and is then renamed over
+    the target. NFS renames are synchronous on the server, so once the rename
+    returns the new file is durable.
+    
+    Returns:
+        float: Durability latency in seconds
+    """
+    parent_dir, name = os.path.split(complete_path)
+    temp_path = os.path.join(parent_dir, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    
+    try:
+        with _open_for_write(temp_path, mode, **kwargs) as f:
+            f.write(content)
+            f.flush()
+            latency = _group_committer_for(mount_point).commit(f.fileno())
+        os.replace(temp_path, complete_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return latency
+
+
+# errno values that mean the mount point itself is unusable rather than the file
+MOUNT_FAILURE_ERRNOS = frozenset({
+    errno.ESTALE, errno.EIO, errno.ENOTCONN, errno.ETIMEDOUT, errno.EHOSTDOWN, errno.EHOSTUNREACH
+})
+
+
+def _run_with_failover(original_path, mount_targets, operation, read=False, index=None):
+    """
+    Run a file operation on the routed path, failing over once on a mount failure
+    
+    When the operation raises an OSError from MOUNT_FAILURE_ERRNOS, the mount
+    target is marked unhealthy and the operation is retried on the path's next
+    candidate. Every mount target serves the same file system, so the retry
+    sees the same data. Operations are tracked for least-loaded read routing.
+    
+    Args:
+        original_path: Original file path
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        operation: Callable taking the complete path
+        read: True for read-only operations, which follow the read routing mode
+        index: Mount target already chosen for this call (e.g. the one whose
+            worker pool runs it) instead of routing the path again
+        
+    Returns:
+        Result of operation
+    """
+    router = get_mount_router(mount_targets)
+    if index is not None:
+        complete_path = router.prefixes[index] + original_path.lstrip('/')
+    elif read and _read_routing == 'least_loaded':
+        complete_path = router.route_read(original_path)
+        index = router.index_of_path(complete_path)
+    else:
+        complete_path = router.route(original_path)
+        index = router.index_of_path(complete_path)
+    
+    try:
+        with router.track(index):
+            return operation(complete_path)
+    except OSError as e:
+        if e.errno not in MOUNT_FAILURE_ERRNOS or not router.mark_unhealthy(index):
+            raise
+        retry_path = router.route(original_path)
+        if retry_path == complete_path:
+            raise
+        logger.warning(f"Mount failure for {complete_path} ({e.strerror}), retrying on {retry_path}")
+        with router.track(router.index_of_path(retry_path)):
+            return operation(retry_path)
+
+
+def read_file(original_path, mount_targets, mode='r', encoding='utf-8'):
+    """
+    Read file content using hash-based routing
+    
+    Content is served from the read cache when it is enabled and current
+    (see configure_read_cache).
+    
+    Args:
+        original_path: Original file path
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        mode: File open mode (default: 'r' for text, 'rb' for binary)
+        encoding: Text encoding (default: 'utf-8', ignored for binary mode)
+        
+    Returns:
+        File content (str for text mode, bytes for binary mode)
+        
+    Raises:
+        ValueError: If no mount targets available
+        FileNotFoundError: If file does not exist
+        IOError: If file cannot be read
+        
+    Requirements: 3.1, 3.2, 3.3, 3.4
+    """
+    return _read_file(original_path, mount_targets, mode, encoding)
+
+
+def _read_file(original_path, mount_targets, mode='r', encoding='utf-8', index=None):
+    # read_file, optionally through a mount target chosen by the caller
+    def read(complete_path):
+        logger.debug(f"Reading file: {original_path} -> {complete_path}")
+        
+        cache = _read_cache
+        if cache is not None:
+            data = cache.read(complete_path, _shared_cache_key(original_path))
+            if 'b' in mode:
+                return data
+            # Decode like a text-mode open would, universal newlines included
+            return io.TextIOWrapper(io.BytesIO(data), encoding=encoding).read()
+        
+        handles = _handle_cache
+        if handles is not None and _HANDLE_KINDS.get(mode) == 'r':
+            data = _read_with_handle(handles, original_path, complete_path)
+            if 'b' in mode:
+                return data
+            return io.TextIOWrapper(io.BytesIO(data), encoding=encoding).read()
+        
+        if 'b' in mode:
+            # Binary mode
+            with open(complete_path, mode) as f:
+                return f.read()
+        else:
+            # Text mode
+            with open(complete_path, mode, encoding=encoding) as f:
+                return f.read()
+    
+    # Read the file using hash-based routing (with failover on mount failures)
+    try:
+        with _settled_appends(original_path, mount_targets):
+            return _run_with_failover(original_path, mount_targets, read, read=True, index=index)
+    except Exception as e:
+        logger.error(f"Failed to read file {original_path}: {str(e)}")
+        raise
+
+
+def write_file(original_path, content, mount_targets, mode='w', encoding='utf-8', atomic=None):
+    """
+    Write content to file using hash-based routing
+    
+    Args:
+        original_path: Original file path
+        content: Content to write (str for text mode, bytes for binary mode)
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        mode: File open mode (default: 'w' for text, 'wb' for binary)
+        encoding: Text encoding (default: 'utf-8', ignored for binary mode)
+        atomic: Replace the file through a durable temporary file and rename
+            (default: True when the write mode is 'atomic'; ignored for appends)
+        
+    Returns:
+        str: Complete file path where content was written
+        
+    Raises:
+        ValueError: If no mount targets available
+        IOError: If file cannot be written
+        
+    Requirements: 3.1, 3.2, 3.3, 3.4
+    """
+    with _settled_appends(original_path, mount_targets):
+        return _write_file(original_path, content, mount_targets, mode, encoding, atomic)
+
+
+def _write_file(original_path, content, mount_targets, mode='w', encoding='utf-8', atomic=None):
+    # write_file without settling queued appends; the append buffer flushes through it
+    if atomic is None:
+        atomic = _write_mode == 'atomic'
+    atomic = atomic and 'a' not in mode
+    
+    def write(complete_path):
+        logger.debug(f"Writing file: {original_path} -> {complete_path}")
+        
+        if atomic:
+            router = get_mount_router(mount_targets)
+            mount_point = router.prefixes[router.index_of_path(complete_path)][:-1]
+            kwargs = {} if 'b' in mode else {'encoding': encoding}
+            latency = _write_atomic(complete_path, mount_point, content, mode, **kwargs)
+            _record_own_change(original_path, complete_path, True, replaced=True)
+            logger.debug(f"Durably replaced file: {complete_path} ({latency * 1000:.1f} ms)")
+            return complete_path
+        
+        handles = _handle_cache
+        kind = _HANDLE_KINDS.get(mode)
+        if handles is not None and kind is not None:
+            data = content if 'b' in mode else content.encode(encoding)
+            _write_with_handle(handles, original_path, complete_path, data, kind)
+            _record_own_change(original_path, complete_path, True)
+            return complete_path
+        
+        # Parent directory is created unless it is already known to exist
+        if 'b' in mode:
+            # Binary mode
+            with _open_for_write(complete_path, mode) as f:
+                f.write(content)
         else:
+            # Text mode
+            with _open_for_write(complete_path, mode, encoding=encoding) as f:
+                f.write(content)
+        _record_own_change(original_path, complete_path, True)
+        
+        logger.debug(f"Successfully wrote file: {complete_path}")
+        return complete_path
+    
+    # Write the file using hash-based routing (with failover on mount failures)
+    try:
+        return _run_with_failover(original_path, mount_targets, write)
+    except Exception as e:
+        logger.error(f"Failed to write file {original_path}: {str(e)}")
+        raise
+
+
+def append_file(original_path, content, mount_targets, encoding='utf-8'):
+    """
+    Append content to file using hash-based routing
+    
+    When the append buffer is enabled (see configure_append_buffer), content
+    is queued and written with other appends to the same file later.
+    
+    Args:
+        original_path: Original file path
+        content: Content to append (str for text mode, bytes for binary mode)
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        encoding: Text encoding (default: 'utf-8', ignored for binary mode)
+        
+    Returns:
+        str: Complete file path where content was appended
+        
+    Raises:
+        ValueError: If no mount targets available
+        IOError: If file cannot be written
+        
+    Requirements: 3.1, 3.2, 3.3, 3.4
+    """
+    buffer = _append_buffer
+    if buffer is not None:
+        return buffer.append(original_path, content, mount_targets, encoding=encoding)
+    
+    # Determine mode based on content type
+    if isinstance(content, bytes):
+        mode = 'ab'
+    else:
+        mode = 'a'
+    
+    return write_file(original_path, content, mount_targets, mode=mode, encoding=encoding)
+
+
+def file_exists(original_path, mount_targets):
+    """
+    Check if file exists using hash-based routing
+    
+    Answers are reused for the metadata cache TTL when the cache is enabled
+    (see configure_metadata_cache).
+    
+    Args:
+        original_path: Original file path
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        
+    Returns:
+        bool: True if file exists, False otherwise
+        
+    Requirements: 3.1, 3.2, 3.3, 3.4
+    """
+    try:
+        complete_path = get_file_path(original_path, mount_targets)
+    except ValueError:
+        return False
+    
+    with _settled_appends(original_path, mount_targets):
+        exists = _cached_existence(complete_path)
+        if exists is None:
+            exists = os.path.exists(complete_path)
+            _remember_existence(complete_path, exists)
+    return exists
+
+
+def delete_file(original_path, mount_targets):
+    """
+    Delete file using hash-based routing
+    
+    Args:
+        original_path: Original file path
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        
+    Returns:
+        bool: True if file was deleted, False if file did not exist
+        
+    Raises:
+        ValueError: If no mount targets available
+        IOError: If file cannot be deleted
+        
+    Requirements: 3.1, 3.2, 3.3, 3.4
+    """
+    def delete(complete_path):
+        logger.debug(f"Deleting file: {original_path} -> {complete_path}")
+        
+        # A single REMOVE round trip; a missing file is reported by the server
+        try:
+            os.remove(complete_path)
+        except FileNotFoundError:
+            _record_own_change(original_path, complete_path, False)
             logger.debug(f"File does not exist: {complete_path}")
             return False
+        
+        _record_own_change(original_path, complete_path, False)
+        logger.debug(f"Successfully deleted file: {complete_path}")
+        return True
+    
+    try:
+        with _settled_appends(original_path, mount_targets):
+            return _run_with_failover(original_path, mount_targets, delete)
+    except Exception as e:
+        logger.error(f"Failed to delete file {original_path}: {str(e)}")
+        raise
+
+
+def read_chunks(original_path, mount_targets, chunk_size=NFS_IO_SIZE):
+    """
+    Stream a file in fixed-size binary chunks using hash-based routing
+    
+    Only one chunk is held in memory at a time, so memory use does not grow
+    with the object size. The default chunk size matches the NFS rsize, so
+    each chunk maps to a single READ.
+    
+    Args:
+        original_path: Original file path
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        chunk_size: Bytes per chunk (default: NFS_IO_SIZE, 1 MiB)
+        
+    Yields:
+        bytes: File content, chunk_size bytes per chunk (the last chunk may be shorter)
+        
+    Raises:
+        ValueError: If no mount targets are available or chunk_size is invalid
+        FileNotFoundError: If file does not exist
+        IOError: If file cannot be read
+    """
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be greater than 0")
+    
+    def open_for_read(complete_path):
+        logger.debug(f"Streaming file: {original_path} -> {complete_path}")
+        return open(complete_path, 'rb', buffering=chunk_size)
+    
+    try:
+        with _settled_appends(original_path, mount_targets):
+            f = _run_with_failover(original_path, mount_targets, open_for_read, read=True)
+    except Exception as e:
+        logger.error(f"Failed to read file {original_path}: {str(e)}")
+        raise
+    
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def write_stream(original_path, chunks, mount_targets, chunk_size=NFS_IO_SIZE, mode='wb'):
+    """
+    Write a file from an iterable of chunks using hash-based routing
+    
+    Chunks are written as they arrive through a chunk_size buffer (the NFS
+    wsize by default), so the whole object never has to be in memory.
+    
+    Args:
+        original_path: Original file path
+        chunks: Iterable of bytes-like chunks (str chunks are encoded as UTF-8)
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        chunk_size: Write buffer size in bytes (default: NFS_IO_SIZE, 1 MiB)
+        mode: 'wb' to replace the file or 'ab' to append (default: 'wb');
+            str chunks are encoded, so text modes are not accepted
+        
+    Returns:
+        str: Complete file path where content was written
+        
+    Raises:
+        ValueError: If no mount targets are available, or chunk_size or mode is invalid
+        IOError: If file cannot be written
+    """
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be greater than 0")
+    if mode not in ('wb', 'ab'):
+        raise ValueError(f"Stream write mode must be 'wb' or 'ab', got: {mode}")
+    
+    def open_for_write(complete_path):
+        logger.debug(f"Streaming to file: {original_path} -> {complete_path}")
+        return complete_path, _open_for_write(complete_path, mode, buffering=chunk_size)
+    
+    try:
+        with _settled_appends(original_path, mount_targets):
+            complete_path, f = _run_with_failover(original_path, mount_targets, open_for_write)
+            with f:
+                for chunk in chunks:
+                    f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            _record_own_change(original_path, complete_path, True)
+        
+        logger.debug(f"Successfully wrote file: {complete_path}")
+        return complete_path
+        
     except Exception as e:
-        logger.error(f"Failed to delete file {original_path}: {str(e)}")
+        logger.error(f"Failed to write file {original_path}: {str(e)}")
+        raise
+
+
+# Buffer sizes kept by BufferPool: a page, a small object and one NFS READ
+DEFAULT_BUFFER_SIZE_CLASSES = (4096, 65536, NFS_IO_SIZE)
+DEFAULT_BUFFERS_PER_CLASS = 8
+
+
+class BufferPool:
+    """
+    Thread-safe pool of preallocated bytearrays in a few size classes
+    
+    acquire() hands out the smallest class that fits, so high-rate small reads
+    reuse the same buffers instead of allocating a new bytes object per call.
+    Requests larger than the biggest class get a one-off bytearray that is not
+    pooled.
+    """
+    
+    def __init__(self, size_classes=DEFAULT_BUFFER_SIZE_CLASSES, buffers_per_class=DEFAULT_BUFFERS_PER_CLASS):
+        if not size_classes or any(size <= 0 for size in size_classes):
+            raise ValueError("Buffer size classes must be greater than 0")
+        
+        self.size_classes = tuple(sorted(size_classes))
+        self.buffers_per_class = buffers_per_class
+        self.hits = 0
+        self.misses = 0
+        self._free = {size: [bytearray(size) for _ in range(buffers_per_class)] for size in self.size_classes}
+        self._lock = threading.Lock()
+    
+    def acquire(self, min_size):
+        """
+        Return a buffer of at least min_size bytes
+        
+        Args:
+            min_size: Required capacity in bytes
+            
+        Returns:
+            bytearray: Pooled buffer (give it back with release())
+        """
+        position = bisect.bisect_left(self.size_classes, min_size)
+        if position == len(self.size_classes):
+            return bytearray(min_size)
+        
+        size = self.size_classes[position]
+        with self._lock:
+            free = self._free[size]
+            if free:
+                self.hits += 1
+                return free.pop()
+            self.misses += 1
+        return bytearray(size)
+    
+    def release(self, buffer):
+        """
+        Return a buffer to the pool (buffers of other sizes are dropped)
+        
+        Args:
+            buffer: bytearray obtained from acquire()
+        """
+        free = self._free.get(len(buffer))
+        if free is None:
+            return
+        with self._lock:
+            if len(free) < self.buffers_per_class:
+                free.append(buffer)
+    
+    def stats(self):
+        """
+        Return pool counters
+        
+        Returns:
+            dict: hits, misses and free buffers per size class
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'free': {size: len(free) for size, free in self._free.items()}
+            }
+
+
+# Shared pool used by pooled_read
+buffer_pool = BufferPool()
+
+
+def _readinto_full(f, view):
+    # readinto may return short counts (e.g. across NFS READs); loop until full or EOF
+    total = 0
+    while total < len(view):
+        count = f.readinto(view[total:])
+        if not count:
+            break
+        total += count
+    return total
+
+
+def read_into(original_path, buffer, mount_targets):
+    """
+    Read a file into a caller-supplied buffer using hash-based routing
+    
+    No bytes object is allocated for the content; the caller can reuse the
+    same buffer across calls.
+    
+    Args:
+        original_path: Original file path
+        buffer: Writable bytes-like object (bytearray, memoryview, ...)
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        
+    Returns:
+        int: Number of bytes read (less than len(buffer) if the file is shorter)
+        
+    Raises:
+        ValueError: If no mount targets are available
+        FileNotFoundError: If file does not exist
+        IOError: If file cannot be read
+    """
+    view = memoryview(buffer).cast('B')
+    
+    def read(complete_path):
+        logger.debug(f"Reading file into buffer: {original_path} -> {complete_path}")
+        with open(complete_path, 'rb', buffering=0) as f:
+            return _readinto_full(f, view)
+    
+    try:
+        with _settled_appends(original_path, mount_targets):
+            return _run_with_failover(original_path, mount_targets, read, read=True)
+    except Exception as e:
+        logger.error(f"Failed to read file {original_path}: {str(e)}")
+        raise
+
+
+@contextmanager
+def pooled_read(original_path, mount_targets, pool=None):
+    """
+    Read a whole file into a pooled buffer using hash-based routing
+    
+    Usage:
+        with pooled_read(path, mount_targets) as data:
+            process(data)
+    
+    The memoryview is only valid inside the with block; the buffer goes back
+    to the pool on exit.
+    
+    Args:
+        original_path: Original file path
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        pool: BufferPool to draw from (default: the shared buffer_pool)
+        
+    Yields:
+        memoryview: File content
+        
+    Raises:
+        ValueError: If no mount targets are available
+        FileNotFoundError: If file does not exist
+        IOError: If file cannot be read
+    """
+    pool = pool or buffer_pool
+    
+    def read(complete_path):
+        logger.debug(f"Reading file into pooled buffer: {original_path} -> {complete_path}")
+        with open(complete_path, 'rb', buffering=0) as f:
+            buffer = pool.acquire(os.fstat(f.fileno()).st_size)
+            try:
+                return buffer, _readinto_full(f, memoryview(buffer))
+            except BaseException:
+                pool.release(buffer)
+                raise
+    
+    try:
+        with _settled_appends(original_path, mount_targets):
+            buffer, count = _run_with_failover(original_path, mount_targets, read, read=True)
+    except Exception as e:
+        logger.error(f"Failed to read file {original_path}: {str(e)}")
         raise
+    
+    view = memoryview(buffer)[:count]
+    try:
+        yield view
+    finally:
+        view.release()
+        pool.release(buffer)
+
+
+@contextmanager
+def map_file(original_path, mount_targets):
+    """
+    Map a file read-only into memory using hash-based routing
+    
+    Usage:
+        with map_file(path, mount_targets) as data:
+            header = data[:16]
+    
+    Pages are read on access and shared with the page cache, so no copy of the
+    content is made. The memoryview is only valid inside the with block.
+    
+    Args:
+        original_path: Original file path
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        
+    Yields:
+        memoryview: Read-only view of the file content
+        
+    Raises:
+        ValueError: If no mount targets are available
+        FileNotFoundError: If file does not exist
+        IOError: If file cannot be read
+    """
+    def open_mapping(complete_path):
+        logger.debug(f"Mapping file: {original_path} -> {complete_path}")
+        with open(complete_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap rejects empty files
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    try:
+        with _settled_appends(original_path, mount_targets):
+            mapping = _run_with_failover(original_path, mount_targets, open_mapping, read=True)
+    except Exception as e:
+        logger.error(f"Failed to read file {original_path}: {str(e)}")
+        raise
+    
+    if mapping is None:
+        yield memoryview(b'')
+        return
+    
+    view = memoryview(mapping)
+    try:
+        yield view
+    finally:
+        view.release()
+        mapping.close()
+
+
+# Per-item outcome of bulk_read / bulk_write: exactly one of result and error is set
+BulkResult = namedtuple('BulkResult', ['path', 'result', 'error'])
+
+# Concurrent operations per mount target for bulk_read / bulk_write
+DEFAULT_BULK_CONCURRENCY_PER_MOUNT = 8
+
+# Operations in flight per worker before bulk submission waits for results
+BULK_WINDOW_PER_WORKER = 2
+
+
+def _run_bulk(router, items, operation, concurrency, read=False):
+    """
+    Fan (path, payload) items out to one worker pool per routed mount target
+    
+    Arguments are validated here, before the caller starts iterating.
+    operation is called with the path, its payload and the index of the mount
+    target whose pool runs it.
+    
+    Returns:
+        generator: BulkResult per item, in completion order
+        
+    Raises:
+        ValueError: If concurrency is not greater than 0
+    """
+    if concurrency is None:
+        concurrency = DEFAULT_BULK_CONCURRENCY_PER_MOUNT
+    if concurrency <= 0:
+        raise ValueError("Bulk concurrency per mount must be greater than 0")
+    
+    least_loaded = read and _read_routing == 'least_loaded'
+    window = BULK_WINDOW_PER_WORKER * concurrency * len(router.prefixes)
+    return _bulk_results(router, items, operation, concurrency, least_loaded, window)
+
+
+def _bulk_result(path, future):
+    try:
+        return BulkResult(path, future.result(), None)
+    except Exception as e:
+        return BulkResult(path, None, e)
+
+
+def _bulk_results(router, items, operation, concurrency, least_loaded, window):
+    # Items are drawn lazily and at most `window` are in flight, so a huge or
+    # endless iterable never turns into a huge backlog of queued futures
+    executors = {}
+    futures = {}
+    try:
+        for path, payload in items:
+            index = router.select_read(path) if least_loaded else router.select(path)
+            executor = executors.get(index)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=concurrency,
+                    thread_name_prefix=f"bulk-{os.path.basename(router.prefixes[index][:-1])}"
+                )
+                executors[index] = executor
+            futures[executor.submit(operation, path, payload, index)] = path
+            
+            if len(futures) >= window:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield _bulk_result(futures.pop(future), future)
+        
+        for future in as_completed(futures):
+            yield _bulk_result(futures[future], future)
+    finally:
+        # Also reached when the caller stops iterating early: drop work not yet started
+        for executor in executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def bulk_read(file_paths, mount_targets, mode='r', encoding='utf-8', concurrency=None):
+    """
+    Read many files in parallel, fanned out per mount target
+    
+    Args:
+        file_paths: Iterable of original file paths
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        mode: File open mode (default: 'r' for text, 'rb' for binary)
+        encoding: Text encoding (default: 'utf-8', ignored for binary mode)
+        concurrency: Concurrent reads per mount target (default: 8)
+        
+    Yields:
+        BulkResult: (path, content, None) or (path, None, exception), in completion order
+        
+    Raises:
+        ValueError: If no mount targets are available or concurrency is invalid
+    """
+    router = get_mount_router(mount_targets)
+    return _run_bulk(
+        router,
+        ((path, None) for path in file_paths),
+        # Read through the mount whose pool runs the call, so least_loaded
+        # routing is not decided twice and the per-mount limit holds
+        lambda path, _, index: _read_file(path, router, mode, encoding, index=index),
+        concurrency,
+        read=True
+    )
+
+
+def bulk_write(items, mount_targets, mode='w', encoding='utf-8', concurrency=None):
+    """
+    Write many files in parallel, fanned out per mount target
+    
+    Args:
+        items: Iterable of (original file path, content) pairs, e.g. dict.items()
+        mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+        mode: File open mode (default: 'w' for text, 'wb' for binary)
+        encoding: Text encoding (default: 'utf-8', ignored for binary mode)
+        concurrency: Concurrent writes per mount target (default: 8)
+        
+    Yields:
+        BulkResult: (path, complete path, None) or (path, None, exception), in completion order
+        
+    Raises:
+        ValueError: If no mount targets are available or concurrency is invalid
+    """
+    router = get_mount_router(mount_targets)
+    return _run_bulk(
+        router,
+        items,
+        lambda path, content, _: write_file(path, content, router, mode=mode, encoding=encoding),
+        concurrency
+    )
+
+
+# Write-behind append buffer: per-path flush threshold in bytes (0 disables
+# buffering), flush age and total memory budget
+DEFAULT_APPEND_BUFFER_BYTES = 0
+DEFAULT_APPEND_BUFFER_MAX_AGE_MS = 200
+DEFAULT_APPEND_BUFFER_MEMORY_BYTES = 64 * 1024 * 1024
+
+_append_buffer = None
+
+
+class _PendingAppends:
+    __slots__ = ('original_path', 'router', 'chunks', 'size', 'since', 'flush_lock')
+    
+    def __init__(self, original_path, router):
+        self.original_path = original_path
+        self.router = router
+        self.chunks = []
+        self.size = 0
+        self.since = None
+        self.flush_lock = threading.Lock()
+
+
+class AppendBuffer:
+    """
+    Write-behind buffer that coalesces appends per file
+    
+    append() queues content in memory and returns at once. Each file's queued
+    appends are written with a single append_file-style write when they reach
+    flush_bytes, when the oldest is max_age seconds old (checked by a
+    background thread), or on flush(). Appends to one file are written in
+    order. When the total queued bytes reach memory_bytes, the appending
+    thread flushes before queuing more (backpressure), so memory stays bounded.
+    
+    Reading, replacing or deleting a file through this module first flushes
+    its queued appends (see settled). Readers that bypass the module see
+    them only once flushed. A failed flush
+    keeps its content queued and raises to whoever flushed; the background
+    thread logs the error and retries on its next pass.
+    """
+    
+    def __init__(self, flush_bytes, max_age, memory_bytes=DEFAULT_APPEND_BUFFER_MEMORY_BYTES):
+        """
+        Args:
+            flush_bytes: Queued bytes per file that trigger a flush
+            max_age: Seconds after which a file's queued appends are flushed
+            memory_bytes: Total queued bytes before appenders must flush
+            
+        Raises:
+            ValueError: If a limit is invalid
+        """
+        if flush_bytes <= 0 or max_age <= 0 or memory_bytes <= 0:
+            raise ValueError("Append buffer limits must be greater than 0")
+        self.flush_bytes = flush_bytes
+        self.max_age = max_age
+        self.memory_bytes = memory_bytes
+        self.appends = 0
+        self.flushes = 0
+        self.flushed_bytes = 0
+        self.flush_reasons = {'size': 0, 'age': 0, 'explicit': 0, 'backpressure': 0, 'access': 0}
+        self._entries = {}
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher = None
+    
+    def append(self, original_path, content, mount_targets, encoding='utf-8'):
+        """
+        Queue content to append to a file (see append_file)
+        
+        Returns:
+            str: Complete file path the content will be appended to
+            
+        Raises:
+            ValueError: If no mount targets available or the buffer is closed
+        """
+        if self._stopped.is_set():
+            raise ValueError("Append buffer is closed")
+        router = get_mount_router(mount_targets)
+        complete_path = router.route(original_path)
+        data = content if isinstance(content, bytes) else content.encode(encoding)
+        
+        if self._pending_bytes + len(data) > self.memory_bytes:
+            self.flush(reason='backpressure')
+        
+        with self._lock:
+            entry = self._entries.get(complete_path)
+            if entry is None:
+                entry = self._entries[complete_path] = _PendingAppends(original_path, router)
+            if not entry.chunks:
+                entry.since = time.monotonic()
+            entry.chunks.append(data)
+            entry.size += len(data)
+            self._pending_bytes += len(data)
+            self.appends += 1
+            full = entry.size >= self.flush_bytes
+        
+        if self._flusher is None:
+            self._start_flusher()
+        if full:
+            self._flush_entry(complete_path, entry, 'size')
+        return complete_path
+    
+    def flush(self, original_path=None, mount_targets=None, reason='explicit'):
+        """
+        Write queued appends now
+        
+        Args:
+            original_path: Only flush this file (default: every file)
+            mount_targets: Mount targets used to route original_path
+            
+        Raises:
+            IOError: If a file cannot be written (its content stays queued)
+        """
+        if original_path is not None:
+            complete_path = get_mount_router(mount_targets).route(original_path)
+            with self._lock:
+                entry = self._entries.get(complete_path)
+            if entry is not None:
+                self._flush_entry(complete_path, entry, reason)
+            return
+        
+        with self._lock:
+            entries = list(self._entries.items())
+        errors = []
+        for complete_path, entry in entries:
+            try:
+                self._flush_entry(complete_path, entry, reason)
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+    
+    @contextmanager
+    def settled(self, original_path, mount_targets):
+        """
+        Flush a file's queued appends and hold back later flushes of it
+        
+        Every file operation other than append_file (including the streaming
+        and zero-copy APIs) runs inside this block, so it sees every append
+        queued before it and no queued append is written after a replace or
+        delete.
+        
+        Args:
+            original_path: Original file path
+            mount_targets: List of mount targets (or successfully mounted list), or a MountRouter
+            
+        Raises:
+            IOError: If the queued appends cannot be written (they stay queued)
+        """
+        entry = None
+        if self._entries:
+            complete_path = get_mount_router(mount_targets).route(original_path)
+            with self._lock:
+                entry = self._entries.get(complete_path)
+        if entry is None:
+            yield
+            return
+        
+        with entry.flush_lock:
+            self._write_pending(complete_path, entry, 'access')
+            yield
+    
+    def _flush_entry(self, complete_path, entry, reason):
+        # The per-file lock keeps flushes of one file, and so its appends, in order
+        with entry.flush_lock:
+            self._write_pending(complete_path, entry, reason)
+    
+    def _write_pending(self, complete_path, entry, reason):
+        # Called with entry.flush_lock held
+        with self._lock:
+            chunks = entry.chunks
+            size = entry.size
+            entry.chunks = []
+            entry.size = 0
+        if not chunks:
+            return
+        
+        try:
+            _write_file(entry.original_path, b''.join(chunks), entry.router, mode='ab')
+        except Exception:
+            with self._lock:
+                entry.chunks = chunks + entry.chunks
+                entry.size += size
+            raise
+        
+        with self._lock:
+            self._pending_bytes -= size
+            self.flushes += 1
+            self.flushed_bytes += size
+            self.flush_reasons[reason] += 1
+            if not entry.chunks and self._entries.get(complete_path) is entry:
+                del self._entries[complete_path]
+    
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_aged, name='append-flusher', daemon=True)
+        self._flusher.start()
+    
+    def _flush_aged(self):
+        while not self._stopped.wait(self.max_age / 2):
+            now = time.monotonic()
+            with self._lock:
+                due = [
+                    (complete_path, entry) for complete_path, entry in self._entries.items()
+                    if entry.chunks and now - entry.since >= self.max_age
+                ]
+            for complete_path, entry in due:
+                try:
+                    self._flush_entry(complete_path, entry, 'age')
+                except Exception as e:
+                    logger.error(f"Failed to flush appends to {entry.original_path}: {str(e)}")
+    
+    def close(self):
+        """
+        Stop the background flusher and flush everything still queued
+        
+        Raises:
+            IOError: If queued content cannot be written
+        """
+        self._stopped.set()
+        flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        self.flush()
+    
+    def stats(self):
+        """
+        Return append buffer counters
+        
+        Returns:
+            dict: appends, flushes, flushed_bytes, appends_per_flush, flushes by
+                reason, pending_bytes and pending_files
+        """
+        with self._lock:
+            return {
+                'appends': self.appends,
+                'flushes': self.flushes,
+                'flushed_bytes': self.flushed_bytes,
+                'appends_per_flush': self.appends / self.flushes if self.flushes else 0.0,
+                'flush_reasons': dict(self.flush_reasons),
+                'pending_bytes': self._pending_bytes,
+                'pending_files': sum(1 for entry in self._entries.values() if entry.chunks)
+            }
+
+
+def configure_append_buffer(flush_bytes=None, max_age_ms=None, memory_bytes=None):
+    """
+    Enable, resize or disable write-behind buffering of append_file
+    
+    The previous buffer, if any, is flushed and closed first.
+    
+    Args:
+        flush_bytes: Queued bytes per file that trigger a flush, 0 to disable buffering
+            (default: APPEND_BUFFER_BYTES environment variable, or 0)
+        max_age_ms: Milliseconds before queued appends are flushed
+            (default: APPEND_BUFFER_MAX_AGE_MS environment variable, or 200)
+        memory_bytes: Total queued bytes before appenders must flush
+            (default: APPEND_BUFFER_MEMORY_BYTES environment variable, or 64 MiB)
+        
+    Returns:
+        int: Selected flush threshold
+        
+    Raises:
+        ValueError: If a setting is invalid
+    """
+    global _append_buffer
+    
+    settings = []
+    for value, name, default in ((flush_bytes, 'APPEND_BUFFER_BYTES', DEFAULT_APPEND_BUFFER_BYTES),
+                                 (max_age_ms, 'APPEND_BUFFER_MAX_AGE_MS', DEFAULT_APPEND_BUFFER_MAX_AGE_MS),
+                                 (memory_bytes, 'APPEND_BUFFER_MEMORY_BYTES', DEFAULT_APPEND_BUFFER_MEMORY_BYTES)):
+        if value is None:
+            value_str = os.environ.get(name, str(default))
+            try:
+                value = int(value_str)
+            except ValueError:
+                raise ValueError(f"{name} must be a valid integer, got: {value_str}")
+        settings.append(value)
+    flush_bytes, max_age_ms, memory_bytes = settings
+    if flush_bytes < 0:
+        raise ValueError("Append buffer size must not be negative")
+    
+    buffer = AppendBuffer(flush_bytes, max_age_ms / 1000, memory_bytes) if flush_bytes > 0 else None
+    previous = _append_buffer
+    _append_buffer = buffer
+    if previous is not None:
+        previous.close()
+    
+    logger.info(
+        f"Using append buffer: flush at {flush_bytes} bytes or {max_age_ms} ms"
+        + (" (disabled)" if buffer is None else "")
+    )
+    return flush_bytes
+
+
+def flush_appends(original_path=None, mount_targets=None):
+    """
+    Write appends queued by the append buffer now (no-op when it is disabled)
+    
+    Args:
+        original_path: Only flush this file (default: every file)
+        mount_targets: Mount targets used to route original_path
+    """
+    buffer = _append_buffer
+    if buffer is not None:
+        buffer.flush(original_path, mount_targets)
+
+
+def get_append_buffer_stats():
+    """
+    Return append buffer counters
+    
+    Returns:
+        dict: AppendBuffer.stats(), or None if append buffering is disabled
+    """
+    buffer = _append_buffer
+    return buffer.stats() if buffer is not None else None
+
+
+def _settled_appends(original_path, mount_targets):
+    # Context for an operation that must not overtake or be overtaken by queued appends
+    buffer = _append_buffer
+    return buffer.settled(original_path, mount_targets) if buffer is not None else nullcontext()
+
+
+@atexit.register
+def _close_append_buffer():
+    # Queued appends must reach EFS before the task exits
+    buffer = _append_buffer
+    if buffer is not None:
+        try:
+            buffer.close()
+        except Exception as e:
+            logger.error(f"Failed to flush queued appends on shutdown: {str(e)}")
+
+
+# Worker threads per mount point for the asyncio API
+DEFAULT_AIO_WORKERS_PER_MOUNT = 4
+
+
+class AsyncFileAPI:
+    """
+    asyncio wrappers around the hash-routed file helpers
+    
+    Each call is routed exactly like its blocking counterpart and then run on
+    a bounded thread pool owned by the selected mount point, so a slow or hung
+    mount target can only tie up its own workers. Cancelling the awaiting task
+    (or hitting its timeout) drops the call if it is still queued; a call that
+    already started runs to completion in its worker, as blocking file I/O
+    cannot be interrupted.
+    """
+    
+    def __init__(self, max_workers_per_mount=DEFAULT_AIO_WORKERS_PER_MOUNT):
+        """
+        Args:
+            max_workers_per_mount: Worker threads per mount point (default: 4)
+        """
+        self._executors = {}
+        self._lock = threading.Lock()
+        self.configure(max_workers_per_mount)
+    
+    def configure(self, max_workers_per_mount=None):
+        """
+        Set the number of worker threads per mount point
+        
+        Pools that already exist keep their size; shut them down to apply a new
+        size to them.
+        
+        Args:
+            max_workers_per_mount: Worker threads per mount point
+                (default: AIO_WORKERS_PER_MOUNT environment variable, or 4)
+            
+        Returns:
+            int: Selected worker count
+            
+        Raises:
+            ValueError: If the worker count is invalid
+        """
+        if max_workers_per_mount is None:
+            workers_str = os.environ.get('AIO_WORKERS_PER_MOUNT', str(DEFAULT_AIO_WORKERS_PER_MOUNT))
+            try:
+                max_workers_per_mount = int(workers_str)
+            except ValueError:
+                raise ValueError(f"AIO_WORKERS_PER_MOUNT must be a valid integer, got: {workers_str}")
+        if max_workers_per_mount <= 0:
+            raise ValueError("Number of workers per mount must be greater than 0")
+        
+        self.max_workers_per_mount = max_workers_per_mount
+        return max_workers_per_mount
+    
+    def _executor_for(self, mount_point):
+        executor = self._executors.get(mount_point)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(mount_point)
+                if executor is None:
+                    executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers_per_mount,
+                        thread_name_prefix=f"aio-{os.path.basename(mount_point)}"
+                    )
+                    self._executors[mount_point] = executor
+        return executor
+    
+    async def _run(self, original_path, mount_targets, function, timeout, read=False):
+        router = get_mount_router(mount_targets)
+        if read and _read_routing == 'least_loaded':
+            index = router.select_read(original_path)
+        else:
+            index = router.select(original_path)
+        executor = self._executor_for(router.prefixes[index][:-1])
+        
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, function, original_path, router)
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+    
+    async def read_file(self, original_path, mount_targets, mode='r', encoding='utf-8', timeout=None):
+        """
+        Read file content (see read_file)
+        
+        Args:
+            timeout: Seconds to wait before raising asyncio.TimeoutError (default: no limit)
+        """
+        return await self._run(
+            original_path, mount_targets,
+            lambda path, router: read_file(path, router, mode=mode, encoding=encoding),
+            timeout, read=True
+        )
+    
+    async def write_file(self, original_path, content, mount_targets, mode='w', encoding='utf-8', timeout=None):
+        """
+        Write content to a file (see write_file)
+        
+        Args:
+            timeout: Seconds to wait before raising asyncio.TimeoutError (default: no limit)
+        """
+        return await self._run(
+            original_path, mount_targets,
+            lambda path, router: write_file(path, content, router, mode=mode, encoding=encoding),
+            timeout
+        )
+    
+    async def append_file(self, original_path, content, mount_targets, encoding='utf-8', timeout=None):
+        """
+        Append content to a file (see append_file)
+        
+        Args:
+            timeout: Seconds to wait before raising asyncio.TimeoutError (default: no limit)
+        """
+        return await self._run(
+            original_path, mount_targets,
+            lambda path, router: append_file(path, content, router, encoding=encoding),
+            timeout
+        )
+    
+    async def file_exists(self, original_path, mount_targets, timeout=None):
+        """
+        Check if a file exists (see file_exists)
+        
+        Args:
+            timeout: Seconds to wait before raising asyncio.TimeoutError (default: no limit)
+        """
+        if not mount_targets:
+            return False
+        return await self._run(original_path, mount_targets, file_exists, timeout, read=True)
+    
+    async def delete_file(self, original_path, mount_targets, timeout=None):
+        """
+        Delete a file (see delete_file)
+        
+        Args:
+            timeout: Seconds to wait before raising asyncio.TimeoutError (default: no limit)
+        """
+        return await self._run(original_path, mount_targets, delete_file, timeout)
+    
+    def shutdown(self, wait=True):
+        """
+        Shut down every per-mount thread pool
+        
+        Args:
+            wait: Wait for running calls to finish
+        """
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# Shared asyncio API, e.g. await aio.read_file(path, successfully_mounted)
+aio = AsyncFileAPI()
+
+
+@atexit.register
+def _shutdown_aio():
+    # Registered after _close_append_buffer, so it runs first: appends still
+    # running on aio workers are queued before the buffer is drained
+    aio.shutdown(wait=True)
+
+
+# Signals that stop the task: ECS sends SIGTERM, Ctrl-C sends SIGINT
+SHUTDOWN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+def _handle_shutdown_signal(signum, frame):
+    # The default SIGTERM action kills the process without running atexit
+    # handlers, so queued appends would be lost. Exiting through SystemExit
+    # unwinds the main thread (releasing any lock it holds) and then runs
+    # _shutdown_aio and _close_append_buffer.
+    logger.info(f"Received {signal.Signals(signum).name}, flushing queued work before exit")
+    raise SystemExit(0)
+
+
+def install_signal_handlers():
+    """
+    Exit cleanly on SIGTERM and SIGINT so that queued appends reach EFS
+    
+    Returns:
+        bool: True if the handlers were installed, False if not called from the
+            main thread (Python only delivers signals there)
+    """
+    if threading.current_thread() is not threading.main_thread():
+        logger.warning("Signal handlers can only be installed from the main thread")
+        return False
+    for signum in SHUTDOWN_SIGNALS:
+        signal.signal(signum, _handle_shutdown_signal)
+    return True
 
 
 if __name__ == "__main__":
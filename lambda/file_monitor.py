@@ -2,10 +2,17 @@
 # This function monitors file count and creates new mount targets when threshold is exceeded
 
 import os
+import sys
 import json
+import time
 import logging
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -16,6 +23,272 @@ ec2_client = boto3.client('ec2')
 ssm_client = boto3.client('ssm')
 ecs_client = boto3.client('ecs')
 
+# CloudWatch Embedded Metric Format defaults
+DEFAULT_METRICS_NAMESPACE = 'EFSMountTargetAutoscaling'
+
+# Mount target lifecycle states that mean a creation is still in progress
+IN_FLIGHT_LIFECYCLE_STATES = ('creating', 'updating')
+
+# Subnet tag that marks a subnet as eligible for mount targets in the subnet inventory
+SUBNET_ELIGIBILITY_TAG = 'EfsMountTargetEligible'
+
+# Subnet inventory cache, keyed by SSM parameter name (lives for the execution environment)
+_subnet_inventory_cache = {}
+_subnet_inventory_lock = threading.Lock()
+
+# Invocation lock lease; must outlive the Lambda timeout so a slow run keeps its lease
+DEFAULT_LOCK_TTL_SECONDS = 360
+
+# Thread pool for independent control-plane calls (created on first use)
+CONTROL_PLANE_MAX_WORKERS = 4
+_control_plane_executor = None
+_control_plane_executor_lock = threading.Lock()
+
+# Running count of AWS API calls made by this execution environment, keyed by operation name
+_api_call_counts = Counter()
+_api_call_lock = threading.Lock()
+
+
+def _count_api_call(model, **kwargs):
+    """
+    botocore event hook that counts every AWS API operation issued by the module clients
+
+    Registered on 'before-parameter-build' so that calls are counted even when the
+    client is stubbed, and before any retry handling takes place.
+    """
+    with _api_call_lock:
+        _api_call_counts[model.name] += 1
+
+
+for _client in (efs_client, ec2_client, ssm_client, ecs_client):
+    _client.meta.events.register('before-parameter-build', _count_api_call)
+
+
+def get_api_call_counts():
+    """
+    Return a snapshot of the API call counters
+
+    Returns:
+        Counter: Number of calls per AWS API operation name
+    """
+    with _api_call_lock:
+        return Counter(_api_call_counts)
+
+
+class InvocationMetrics:
+    """
+    Per-invocation latency and API call instrumentation
+
+    Each handler step is wrapped in step(), which records its wall-clock duration
+    and the number of AWS API calls issued while it was running. finish() closes
+    any step that is still open (e.g. when the handler returns from inside a step)
+    and returns the summary that is attached to execution_result.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._start = clock()
+        self._api_calls_at_start = get_api_call_counts()
+        self._open_steps = {}
+        self.step_durations_ms = {}
+        self.step_api_calls = {}
+        self.call_durations_ms = {}
+
+    @contextmanager
+    def step(self, name):
+        """
+        Time a handler step
+
+        Args:
+            name (str): Step name used as the metric name prefix
+        """
+        self._open_steps[name] = (self._clock(), sum(get_api_call_counts().values()))
+        try:
+            yield
+        finally:
+            self._close_step(name)
+
+    def _close_step(self, name):
+        started = self._open_steps.pop(name, None)
+        if started is None:
+            return
+        start_time, api_calls_before = started
+        self.step_durations_ms[name] = round((self._clock() - start_time) * 1000, 3)
+        self.step_api_calls[name] = sum(get_api_call_counts().values()) - api_calls_before
+
+    def record_call(self, name, duration_ms):
+        """
+        Record the latency of an individual control-plane call
+
+        Args:
+            name (str): Call name
+            duration_ms (float): Call duration in milliseconds
+        """
+        self.call_durations_ms[name] = round(duration_ms, 3)
+
+    def finish(self):
+        """
+        Close any open steps and summarize the invocation
+
+        Returns:
+            dict: Summary with the following keys:
+                - total_duration_ms: Wall-clock duration of the invocation
+                - step_durations_ms: Duration per step
+                - step_api_calls: AWS API calls issued per step
+                - call_durations_ms: Duration per concurrently issued control-plane call
+                - api_calls: AWS API calls issued per operation name
+                - total_api_calls: Total AWS API calls issued
+        """
+        for name in list(self._open_steps):
+            self._close_step(name)
+
+        api_calls = get_api_call_counts()
+        api_calls.subtract(self._api_calls_at_start)
+        api_calls = {operation: count for operation, count in api_calls.items() if count > 0}
+
+        return {
+            'total_duration_ms': round((self._clock() - self._start) * 1000, 3),
+            'step_durations_ms': dict(self.step_durations_ms),
+            'step_api_calls': dict(self.step_api_calls),
+            'call_durations_ms': dict(self.call_durations_ms),
+            'api_calls': api_calls,
+            'total_api_calls': sum(api_calls.values())
+        }
+
+
+def build_emf_document(metrics_summary, execution_result, namespace, dimensions, timestamp_ms=None):
+    """
+    Build a CloudWatch Embedded Metric Format document for one invocation
+
+    Args:
+        metrics_summary (dict): Output of InvocationMetrics.finish()
+        execution_result (dict): Handler execution result
+        namespace (str): CloudWatch metric namespace
+        dimensions (dict): Dimension name to value mapping
+        timestamp_ms (int, optional): Metric timestamp in epoch milliseconds
+
+    Returns:
+        dict: EMF document ready to be serialized as a single JSON log line
+    """
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+
+    values = {
+        'TotalDuration': metrics_summary['total_duration_ms'],
+        'TotalApiCalls': metrics_summary['total_api_calls'],
+        'FileCount': execution_result.get('file_count', 0),
+        'MountTargetCreated': 1 if execution_result.get('new_mount_target_created') else 0,
+        'MountTargetResumed': 1 if execution_result.get('mount_target_resumed') else 0,
+        'Error': 1 if execution_result.get('error') else 0
+    }
+    units = {
+        'TotalDuration': 'Milliseconds',
+        'TotalApiCalls': 'Count',
+        'FileCount': 'Count',
+        'MountTargetCreated': 'Count',
+        'MountTargetResumed': 'Count',
+        'Error': 'Count'
+    }
+
+    for step_name, duration_ms in metrics_summary['step_durations_ms'].items():
+        metric_name = f"{step_name}.Duration"
+        values[metric_name] = duration_ms
+        units[metric_name] = 'Milliseconds'
+
+    for step_name, api_calls in metrics_summary['step_api_calls'].items():
+        metric_name = f"{step_name}.ApiCalls"
+        values[metric_name] = api_calls
+        units[metric_name] = 'Count'
+
+    for call_name, duration_ms in metrics_summary.get('call_durations_ms', {}).items():
+        metric_name = f"{call_name}.CallDuration"
+        values[metric_name] = duration_ms
+        units[metric_name] = 'Milliseconds'
+
+    document = {
+        '_aws': {
+            'Timestamp': timestamp_ms,
+            'CloudWatchMetrics': [
+                {
+                    'Namespace': namespace,
+                    'Dimensions': [list(dimensions.keys())],
+                    'Metrics': [{'Name': name, 'Unit': units[name]} for name in values]
+                }
+            ]
+        }
+    }
+    document.update(dimensions)
+    document.update(values)
+    return document
+
+
+def emit_emf_metrics(metrics_summary, execution_result, stream=None):
+    """
+    Write the invocation metrics to stdout in CloudWatch Embedded Metric Format
+
+    CloudWatch Logs extracts the metrics from the JSON line asynchronously, so
+    no PutMetricData calls are made from the handler.
+
+    Args:
+        metrics_summary (dict): Output of InvocationMetrics.finish()
+        execution_result (dict): Handler execution result
+        stream (file, optional): Output stream (default: sys.stdout)
+    """
+    namespace = os.environ.get('METRICS_NAMESPACE', DEFAULT_METRICS_NAMESPACE)
+    dimensions = {
+        'FunctionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'file-monitor')
+    }
+
+    document = build_emf_document(metrics_summary, execution_result, namespace, dimensions)
+
+    try:
+        print(json.dumps(document), file=stream or sys.stdout, flush=True)
+    except Exception as e:
+        # Metrics must never fail the invocation
+        logger.error(f"Failed to emit EMF metrics: {str(e)}")
+
+
+def _get_control_plane_executor():
+    """
+    Return the thread pool used for concurrent control-plane calls
+
+    The pool is created lazily and reused across warm invocations. boto3 clients
+    are thread-safe, so the module clients are shared by all workers.
+    """
+    global _control_plane_executor
+    with _control_plane_executor_lock:
+        if _control_plane_executor is None:
+            _control_plane_executor = ThreadPoolExecutor(
+                max_workers=CONTROL_PLANE_MAX_WORKERS,
+                thread_name_prefix='control-plane'
+            )
+        return _control_plane_executor
+
+
+def run_concurrently(calls, metrics=None):
+    """
+    Issue independent control-plane calls in parallel
+
+    Args:
+        calls (dict): Call name to zero-argument callable
+        metrics (InvocationMetrics, optional): Recorder for per-call latency
+
+    Returns:
+        dict: Call name to Future. Callers read each result with .result() inside
+            their own error handling, so a failing call does not hide the others.
+    """
+    executor = _get_control_plane_executor()
+
+    def timed(name, fn):
+        start_time = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            if metrics is not None:
+                metrics.record_call(name, (time.perf_counter() - start_time) * 1000)
+
+    return {name: executor.submit(timed, name, fn) for name, fn in calls.items()}
+
 
 def get_config_from_env():
     """
@@ -28,6 +301,10 @@ def get_config_from_env():
             - efs_file_system_id: EFS file system ID
             - vpc_id: VPC ID
             - security_group_id: Security group ID (optional)
+            - lock_parameter_name: SSM parameter used as invocation lock (optional)
+            - lock_file_path: Local file used as invocation lock (optional)
+            - lock_ttl_seconds: Invocation lock lease duration in seconds
+            - subnet_inventory_parameter_name: SSM parameter with the subnet inventory (optional)
     
     Raises:
         ValueError: If required environment variables are missing
@@ -67,6 +344,19 @@ def get_config_from_env():
     if not ecs_service_name:
         raise ValueError("ECS_SERVICE_NAME environment variable is required")
     
+    # Optional invocation lock (SSM parameter in AWS, local file for tests and local runs)
+    lock_parameter_name = os.environ.get('LOCK_PARAMETER_NAME')
+    lock_file_path = os.environ.get('LOCK_FILE_PATH')
+    
+    lock_ttl_str = os.environ.get('LOCK_TTL_SECONDS', str(DEFAULT_LOCK_TTL_SECONDS))
+    try:
+        lock_ttl_seconds = int(lock_ttl_str)
+    except ValueError:
+        raise ValueError(f"LOCK_TTL_SECONDS must be a valid integer, got: {lock_ttl_str}")
+    
+    # Optional deploy-time subnet inventory
+    subnet_inventory_parameter_name = os.environ.get('SUBNET_INVENTORY_PARAMETER_NAME')
+    
     config = {
         'target_directory': target_directory,
         'file_count_threshold': file_count_threshold,
@@ -74,12 +364,22 @@ def get_config_from_env():
         'vpc_id': vpc_id,
         'ssm_parameter_name': ssm_parameter_name,
         'ecs_cluster_name': ecs_cluster_name,
-        'ecs_service_name': ecs_service_name
+        'ecs_service_name': ecs_service_name,
+        'lock_ttl_seconds': lock_ttl_seconds
     }
     
     if security_group_id:
         config['security_group_id'] = security_group_id
     
+    if lock_parameter_name:
+        config['lock_parameter_name'] = lock_parameter_name
+    
+    if lock_file_path:
+        config['lock_file_path'] = lock_file_path
+    
+    if subnet_inventory_parameter_name:
+        config['subnet_inventory_parameter_name'] = subnet_inventory_parameter_name
+    
     return config
 
 
@@ -171,13 +471,179 @@ def get_existing_mount_targets(file_system_id):
         raise
 
 
-def find_available_subnet(vpc_id, existing_mount_targets):
+def list_vpc_subnets(vpc_id, eligible_only=False):
+    """
+    List all subnets in the VPC
+    
+    Args:
+        vpc_id (str): VPC ID
+        eligible_only (bool): Only list subnets whose EfsMountTargetEligible
+            tag is "true", as the subnet inventory does
+    
+    Returns:
+        list: Subnet dictionaries as returned by DescribeSubnets
+    
+    Raises:
+        ClientError: If AWS API call fails
+    """
+    filters = [
+        {
+            'Name': 'vpc-id',
+            'Values': [vpc_id]
+        }
+    ]
+    if eligible_only:
+        filters.append({
+            'Name': f"tag:{SUBNET_ELIGIBILITY_TAG}",
+            'Values': ['true']
+        })
+    response = ec2_client.describe_subnets(Filters=filters)
+    return response.get('Subnets', [])
+
+
+def validate_subnet_inventory(inventory, vpc_id):
+    """
+    Validate a subnet inventory document published at deploy time
+    
+    Args:
+        inventory (dict): Inventory document with the following keys:
+            - vpc_id: VPC ID the inventory was generated for
+            - availability_zones: AZ name to list of subnet entries, each with
+              subnet_id and tags
+        vpc_id (str): VPC ID this function is configured for
+    
+    Raises:
+        ValueError: If the inventory is malformed or belongs to another VPC
+    """
+    if not isinstance(inventory, dict):
+        raise ValueError("Subnet inventory must be a JSON object")
+    
+    if inventory.get('vpc_id') != vpc_id:
+        raise ValueError(f"Subnet inventory is for VPC {inventory.get('vpc_id')}, expected {vpc_id}")
+    
+    availability_zones = inventory.get('availability_zones')
+    if not isinstance(availability_zones, dict) or not availability_zones:
+        raise ValueError("Subnet inventory has no availability_zones")
+    
+    for availability_zone, subnets in availability_zones.items():
+        if not isinstance(subnets, list):
+            raise ValueError(f"Subnet inventory entry for {availability_zone} must be a list")
+        for subnet in subnets:
+            if not isinstance(subnet, dict) or not str(subnet.get('subnet_id', '')).startswith('subnet-'):
+                raise ValueError(f"Invalid subnet entry in {availability_zone}: {subnet}")
+
+
+def inventory_to_subnets(inventory):
+    """
+    Convert a subnet inventory to DescribeSubnets-style entries for eligible subnets
+    
+    A subnet is eligible when its EfsMountTargetEligible tag is "true".
+    
+    Args:
+        inventory (dict): Validated inventory document
+    
+    Returns:
+        list: Subnet dictionaries with SubnetId and AvailabilityZone keys
+    """
+    subnets = []
+    for availability_zone in sorted(inventory['availability_zones']):
+        for subnet in inventory['availability_zones'][availability_zone]:
+            if subnet.get('tags', {}).get(SUBNET_ELIGIBILITY_TAG) == 'true':
+                subnets.append({
+                    'SubnetId': subnet['subnet_id'],
+                    'AvailabilityZone': availability_zone
+                })
+    return subnets
+
+
+def get_inventory_subnets(parameter_name, vpc_id):
+    """
+    Lazily load the eligible subnets from the subnet inventory
+    
+    The inventory is read from SSM Parameter Store once per execution environment
+    and cached; warm invocations make no API call.
+    
+    Args:
+        parameter_name (str): SSM parameter holding the inventory document
+        vpc_id (str): VPC ID used to validate the inventory
+    
+    Returns:
+        list or None: Eligible subnets, or None if the inventory cannot be read or
+            fails validation
+    """
+    with _subnet_inventory_lock:
+        if parameter_name in _subnet_inventory_cache:
+            return _subnet_inventory_cache[parameter_name]
+    
+    try:
+        response = ssm_client.get_parameter(Name=parameter_name)
+        inventory = json.loads(response['Parameter']['Value'])
+        validate_subnet_inventory(inventory, vpc_id)
+    except (ClientError, BotoCoreError) as e:
+        logger.warning(f"Failed to read subnet inventory {parameter_name}: {e}")
+        return None
+    except ValueError as e:
+        logger.warning(f"Subnet inventory {parameter_name} failed validation: {str(e)}")
+        return None
+    
+    subnets = inventory_to_subnets(inventory)
+    with _subnet_inventory_lock:
+        _subnet_inventory_cache[parameter_name] = subnets
+    logger.info(f"Loaded subnet inventory with {len(subnets)} eligible subnets")
+    return subnets
+
+
+def invalidate_subnet_inventory(parameter_name):
+    """
+    Drop the cached subnet inventory so that it is reloaded on next use
+    
+    Args:
+        parameter_name (str): SSM parameter holding the inventory document
+    """
+    with _subnet_inventory_lock:
+        _subnet_inventory_cache.pop(parameter_name, None)
+
+
+# Default of find_available_subnet's inventory_subnets: the inventory has not been loaded yet
+_INVENTORY_NOT_LOADED = object()
+
+
+def _first_available_subnet(subnets, existing_mount_targets):
+    # EFS allows one mount target per AZ, so both used subnets and used AZs are skipped
+    used_subnet_ids = {mt['subnet_id'] for mt in existing_mount_targets}
+    used_availability_zones = {mt.get('availability_zone') for mt in existing_mount_targets}
+    
+    for subnet in subnets:
+        subnet_id = subnet['SubnetId']
+        if subnet_id not in used_subnet_ids and subnet['AvailabilityZone'] not in used_availability_zones:
+            return {
+                'subnet_id': subnet_id,
+                'availability_zone': subnet['AvailabilityZone']
+            }
+    return None
+
+
+def find_available_subnet(vpc_id, existing_mount_targets, subnets=None, inventory_parameter_name=None,
+                          inventory_subnets=_INVENTORY_NOT_LOADED):
     """
     Find an available subnet in the VPC that doesn't have a mount target
     
+    When a subnet inventory is configured and no subnets are passed in, the
+    inventory is the source of truth: if it has no free subnet, None is
+    returned without an API call. DescribeSubnets is only called when the
+    inventory cannot be read or fails validation, and then lists only the
+    subnets tagged as eligible.
+    
     Args:
         vpc_id (str): VPC ID
         existing_mount_targets (list): List of existing mount target dictionaries
+        subnets (list, optional): Subnets already fetched with list_vpc_subnets().
+            When omitted, the subnets are described here.
+        inventory_parameter_name (str, optional): SSM parameter holding the
+            deploy-time subnet inventory
+        inventory_subnets (list or None, optional): Result of a
+            get_inventory_subnets() call already made for this invocation; None
+            means the inventory is unavailable. When omitted, it is loaded here.
     
     Returns:
         dict or None: Subnet information with the following keys if available:
@@ -191,29 +657,30 @@ def find_available_subnet(vpc_id, existing_mount_targets):
     try:
         logger.info(f"Finding available subnets in VPC: {vpc_id}")
         
-        # Get all subnets in the VPC
-        response = ec2_client.describe_subnets(
-            Filters=[
-                {
-                    'Name': 'vpc-id',
-                    'Values': [vpc_id]
-                }
-            ]
-        )
+        # Try the deploy-time inventory first
+        if subnets is None and inventory_parameter_name:
+            if inventory_subnets is _INVENTORY_NOT_LOADED:
+                inventory_subnets = get_inventory_subnets(inventory_parameter_name, vpc_id)
+            if inventory_subnets is not None:
+                available_subnet = _first_available_subnet(inventory_subnets, existing_mount_targets)
+                if available_subnet:
+                    logger.info(f"Found available subnet in inventory: {available_subnet['subnet_id']} "
+                                f"in AZ: {available_subnet['availability_zone']}")
+                else:
+                    logger.warning("No available subnets found in subnet inventory")
+                return available_subnet
+            logger.info("Subnet inventory unavailable, falling back to DescribeSubnets")
+            subnets = list_vpc_subnets(vpc_id, eligible_only=True)
         
-        # Extract subnet IDs that already have mount targets
-        used_subnet_ids = {mt['subnet_id'] for mt in existing_mount_targets}
+        # Get all subnets in the VPC
+        if subnets is None:
+            subnets = list_vpc_subnets(vpc_id)
         
         # Find first available subnet
-        for subnet in response.get('Subnets', []):
-            subnet_id = subnet['SubnetId']
-            if subnet_id not in used_subnet_ids:
-                available_subnet = {
-                    'subnet_id': subnet_id,
-                    'availability_zone': subnet['AvailabilityZone']
-                }
-                logger.info(f"Found available subnet: {subnet_id} in AZ: {subnet['AvailabilityZone']}")
-                return available_subnet
+        available_subnet = _first_available_subnet(subnets, existing_mount_targets)
+        if available_subnet:
+            logger.info(f"Found available subnet: {available_subnet['subnet_id']} in AZ: {available_subnet['availability_zone']}")
+            return available_subnet
         
         logger.warning("No available subnets found in VPC")
         return None
@@ -223,7 +690,67 @@ def find_available_subnet(vpc_id, existing_mount_targets):
         raise
 
 
-def create_mount_target(file_system_id, subnet_id, security_group_id=None):
+def wait_for_mount_target_available(mount_target_id, max_wait_time=300, poll_interval=10):
+    """
+    Wait for a mount target to reach the 'available' lifecycle state
+    
+    Args:
+        mount_target_id (str): Mount target ID
+        max_wait_time (int): Maximum time to wait in seconds (default: 300)
+        poll_interval (int): Polling interval in seconds (default: 10)
+    
+    Returns:
+        dict: Mount target information with the following keys:
+            - mount_target_id: Mount target ID
+            - ip_address: IP address
+            - availability_zone: Availability zone
+            - subnet_id: Subnet ID
+            - lifecycle_state: Lifecycle state
+        Returns None if the mount target fails or does not become available in time
+    """
+    elapsed_time = 0
+    
+    while elapsed_time < max_wait_time:
+        try:
+            # Check mount target status
+            mt_response = efs_client.describe_mount_targets(
+                MountTargetId=mount_target_id
+            )
+            
+            if mt_response['MountTargets']:
+                mt = mt_response['MountTargets'][0]
+                lifecycle_state = mt['LifeCycleState']
+                
+                logger.info(f"Mount target {mount_target_id} state: {lifecycle_state}")
+                
+                if lifecycle_state == 'available':
+                    logger.info(f"Mount target {mount_target_id} is now available")
+                    return {
+                        'mount_target_id': mt['MountTargetId'],
+                        'ip_address': mt['IpAddress'],
+                        'availability_zone': mt['AvailabilityZoneName'],
+                        'subnet_id': mt['SubnetId'],
+                        'lifecycle_state': mt['LifeCycleState']
+                    }
+                elif lifecycle_state in ['creating', 'updating']:
+                    # Still in progress, continue waiting
+                    time.sleep(poll_interval)
+                    elapsed_time += poll_interval
+                else:
+                    # Failed state
+                    logger.error(f"Mount target creation failed with state: {lifecycle_state}")
+                    return None
+                    
+        except ClientError as e:
+            logger.error(f"Error checking mount target status: {e}")
+            time.sleep(poll_interval)
+            elapsed_time += poll_interval
+    
+    logger.error(f"Mount target creation timed out after {max_wait_time} seconds")
+    return None
+
+
+def create_mount_target(file_system_id, subnet_id, security_group_id=None, wait=True):
     """
     Create a new mount target for the EFS file system
     
@@ -231,6 +758,8 @@ def create_mount_target(file_system_id, subnet_id, security_group_id=None):
         file_system_id (str): EFS file system ID
         subnet_id (str): Subnet ID where the mount target will be created
         security_group_id (str, optional): Security group ID for the mount target
+        wait (bool): Wait for the mount target to become available (default: True).
+            When False, the mount target is returned in its initial lifecycle state.
     
     Returns:
         dict: Mount target information with the following keys:
@@ -244,8 +773,6 @@ def create_mount_target(file_system_id, subnet_id, security_group_id=None):
     Raises:
         ClientError: If AWS API call fails
     """
-    import time
-    
     try:
         logger.info(f"Creating mount target in subnet: {subnet_id}")
         
@@ -265,61 +792,149 @@ def create_mount_target(file_system_id, subnet_id, security_group_id=None):
         mount_target_id = response['MountTargetId']
         logger.info(f"Mount target creation initiated: {mount_target_id}")
         
-        # Wait for mount target to become available
-        max_wait_time = 300  # 5 minutes
-        poll_interval = 10  # 10 seconds
-        elapsed_time = 0
-        
-        while elapsed_time < max_wait_time:
-            try:
-                # Check mount target status
-                mt_response = efs_client.describe_mount_targets(
-                    MountTargetId=mount_target_id
-                )
-                
-                if mt_response['MountTargets']:
-                    mt = mt_response['MountTargets'][0]
-                    lifecycle_state = mt['LifeCycleState']
-                    
-                    logger.info(f"Mount target {mount_target_id} state: {lifecycle_state}")
-                    
-                    if lifecycle_state == 'available':
-                        logger.info(f"Mount target {mount_target_id} is now available")
-                        return {
-                            'mount_target_id': mt['MountTargetId'],
-                            'ip_address': mt['IpAddress'],
-                            'availability_zone': mt['AvailabilityZoneName'],
-                            'subnet_id': mt['SubnetId'],
-                            'lifecycle_state': mt['LifeCycleState']
-                        }
-                    elif lifecycle_state in ['creating', 'updating']:
-                        # Still in progress, continue waiting
-                        time.sleep(poll_interval)
-                        elapsed_time += poll_interval
-                    else:
-                        # Failed state
-                        logger.error(f"Mount target creation failed with state: {lifecycle_state}")
-                        return None
-                        
-            except ClientError as e:
-                logger.error(f"Error checking mount target status: {e}")
-                time.sleep(poll_interval)
-                elapsed_time += poll_interval
+        if not wait:
+            return {
+                'mount_target_id': mount_target_id,
+                'ip_address': response.get('IpAddress'),
+                'availability_zone': response.get('AvailabilityZoneName'),
+                'subnet_id': response.get('SubnetId', subnet_id),
+                'lifecycle_state': response.get('LifeCycleState', 'creating')
+            }
         
-        logger.error(f"Mount target creation timed out after {max_wait_time} seconds")
-        return None
+        # Wait for mount target to become available
+        return wait_for_mount_target_available(mount_target_id)
     
     except ClientError as e:
         error_code = e.response.get('Error', {}).get('Code', '')
         
         if error_code == 'MountTargetConflict':
             logger.warning(f"Mount target already exists in subnet: {subnet_id}")
+            
+            # CreateMountTarget takes no client token; EFS allows one mount target per
+            # subnet/AZ, so the subnet is the idempotency key. A retry resolves to the
+            # target created by the earlier attempt instead of failing.
+            for mt in get_existing_mount_targets(file_system_id):
+                if mt['subnet_id'] == subnet_id:
+                    logger.info(f"Resuming existing mount target {mt['mount_target_id']} in subnet: {subnet_id}")
+                    if wait and mt['lifecycle_state'] != 'available':
+                        return wait_for_mount_target_available(mt['mount_target_id'])
+                    return mt
             return None
         else:
             logger.error(f"Failed to create mount target: {e}")
             raise
 
 
+def find_in_flight_mount_target(mount_targets):
+    """
+    Find a mount target whose creation is still in progress
+    
+    Args:
+        mount_targets (list): List of mount target dictionaries
+    
+    Returns:
+        dict or None: First mount target in an in-flight lifecycle state
+    """
+    for mt in mount_targets:
+        if mt.get('lifecycle_state') in IN_FLIGHT_LIFECYCLE_STATES:
+            return mt
+    return None
+
+
+def get_published_mount_targets(parameter_name):
+    """
+    Read the mount target list currently published in SSM Parameter Store
+    
+    Args:
+        parameter_name (str): SSM Parameter Store parameter name
+    
+    Returns:
+        list or None: Published mount target dictionaries, or None if the
+            parameter cannot be read
+    """
+    try:
+        response = ssm_client.get_parameter(Name=parameter_name)
+        data = json.loads(response['Parameter']['Value'])
+        mount_targets = data.get('mount_targets', [])
+        if not all('mount_target_id' in mt for mt in mount_targets):
+            raise KeyError('mount_target_id')
+        return mount_targets
+    except (ClientError, BotoCoreError) as e:
+        logger.warning(f"Failed to read published mount targets: {e}")
+        return None
+    except (TypeError, ValueError, KeyError, AttributeError) as e:
+        logger.warning(f"Published mount target list is not valid JSON: {str(e)}")
+        return None
+
+
+def get_published_mount_target_ids(parameter_name):
+    """
+    Read the mount target IDs currently published in SSM Parameter Store
+    
+    Args:
+        parameter_name (str): SSM Parameter Store parameter name
+    
+    Returns:
+        set or None: Published mount target IDs, or None if the parameter cannot be read
+    """
+    published = get_published_mount_targets(parameter_name)
+    if published is None:
+        return None
+    return {mt['mount_target_id'] for mt in published}
+
+
+def carry_over_published_weights(mount_targets, published_mount_targets):
+    """
+    Copy operator-set routing weights from the published list onto a fresh list
+    
+    Weights are not part of the EFS API, so they only live in the SSM document;
+    without this they would be dropped every time the list is republished.
+    
+    Args:
+        mount_targets (list): Mount target dictionaries from DescribeMountTargets
+        published_mount_targets (list or None): Currently published mount targets
+    
+    Returns:
+        list: mount_targets, with 'weight' set where the published entry had one
+    """
+    weights = {
+        mt['mount_target_id']: mt['weight']
+        for mt in published_mount_targets or []
+        if 'weight' in mt
+    }
+    for mt in mount_targets:
+        if mt['mount_target_id'] in weights:
+            mt['weight'] = weights[mt['mount_target_id']]
+    return mount_targets
+
+
+def find_unpublished_mount_target(mount_targets, parameter_name, published_ids=None):
+    """
+    Find an available mount target that was never published to SSM Parameter Store
+    
+    This is the footprint of an earlier run that created a mount target but timed
+    out before updating SSM; finishing that run is cheaper than creating another.
+    
+    Args:
+        mount_targets (list): List of mount target dictionaries
+        parameter_name (str): SSM Parameter Store parameter name
+        published_ids (set, optional): Published IDs already fetched with
+            get_published_mount_target_ids(). When omitted, SSM is read here.
+    
+    Returns:
+        dict or None: First available mount target missing from the published list
+    """
+    if published_ids is None:
+        published_ids = get_published_mount_target_ids(parameter_name)
+    if published_ids is None:
+        return None
+    
+    for mt in mount_targets:
+        if mt.get('lifecycle_state') == 'available' and mt['mount_target_id'] not in published_ids:
+            return mt
+    return None
+
+
 def convert_mount_targets_to_json(mount_targets):
     """
     Convert mount target list to JSON format for SSM Parameter Store
@@ -331,6 +946,7 @@ def convert_mount_targets_to_json(mount_targets):
             - availability_zone: Availability zone
             - subnet_id: Subnet ID
             - lifecycle_state: Lifecycle state (optional, will be excluded from output)
+            - weight: Routing weight (optional, included when present)
     
     Returns:
         str: JSON string representation of mount targets in the format:
@@ -355,6 +971,8 @@ def convert_mount_targets_to_json(mount_targets):
             'availability_zone': mt['availability_zone'],
             'subnet_id': mt['subnet_id']
         }
+        if 'weight' in mt:
+            filtered_mt['weight'] = mt['weight']
         filtered_targets.append(filtered_mt)
     
     # Create the data structure according to the design document
@@ -406,6 +1024,30 @@ def update_ssm_parameter(parameter_name, mount_targets_json):
         return False
 
 
+def describe_ecs_service(cluster_name, service_name):
+    """
+    Look up the ECS service that will be redeployed
+    
+    Args:
+        cluster_name (str): ECS cluster name
+        service_name (str): ECS service name
+    
+    Returns:
+        dict or None: Service description, or None if the lookup fails or the
+            service does not exist
+    """
+    try:
+        response = ecs_client.describe_services(
+            cluster=cluster_name,
+            services=[service_name]
+        )
+        services = response.get('services', [])
+        return services[0] if services else None
+    except (ClientError, BotoCoreError) as e:
+        logger.warning(f"Failed to describe ECS service {service_name}: {e}")
+        return None
+
+
 def trigger_ecs_service_deployment(cluster_name, service_name):
     """
     Trigger a forced deployment of the ECS service
@@ -460,6 +1102,267 @@ def trigger_ecs_service_deployment(cluster_name, service_name):
         return False
 
 
+class SsmLockBackend:
+    """
+    Invocation lock storage in SSM Parameter Store
+    
+    The parameter version returned by PutParameter increases monotonically and is
+    used as the fencing token. The parameter is never deleted, so tokens are never reused.
+    """
+    
+    def __init__(self, parameter_name, client=None):
+        self.parameter_name = parameter_name
+        self.client = client or ssm_client
+    
+    def get(self):
+        """
+        Read the current lock record
+        
+        Returns:
+            tuple: (record dict or None, version int)
+        """
+        try:
+            response = self.client.get_parameter(Name=self.parameter_name)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code', '') == 'ParameterNotFound':
+                return None, 0
+            raise
+        
+        parameter = response['Parameter']
+        try:
+            record = json.loads(parameter['Value'])
+        except (TypeError, ValueError):
+            record = None
+        return record, parameter['Version']
+    
+    def put(self, record):
+        """
+        Write a lock record
+        
+        Returns:
+            int: New version of the lock record
+        """
+        response = self.client.put_parameter(
+            Name=self.parameter_name,
+            Value=json.dumps(record),
+            Type='String',
+            Overwrite=True
+        )
+        return response['Version']
+
+
+class LocalFileLockBackend:
+    """
+    Invocation lock storage in a local JSON file, for tests and local runs
+    
+    Records are replaced atomically with os.replace and carry their own version counter.
+    """
+    
+    _file_lock = threading.Lock()
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None, 0
+        return data.get('record'), data.get('version', 0)
+    
+    def get(self):
+        """
+        Read the current lock record
+        
+        Returns:
+            tuple: (record dict or None, version int)
+        """
+        with self._file_lock:
+            return self._read()
+    
+    def put(self, record):
+        """
+        Write a lock record
+        
+        Returns:
+            int: New version of the lock record
+        """
+        with self._file_lock:
+            _, version = self._read()
+            version += 1
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'record': record, 'version': version}, f)
+            os.replace(tmp_path, self.path)
+            return version
+
+
+class InvocationLock:
+    """
+    Lease-based lock that prevents overlapping handler invocations
+    
+    acquire() writes a lease record and reads it back; the invocation only holds
+    the lock if its own write is still the latest version. That version is kept
+    as the fencing token, and validate() must be called before each side effect
+    (see ensure_lock_held()) so that an invocation whose lease was taken over
+    never acts on stale state.
+    
+    Neither backend offers compare-and-swap, so this narrows races rather than
+    excluding them: two invocations whose read-backs both precede the other's
+    write can each believe they hold the lease, and a lease can be taken over
+    between validate() and the call it guards. The loser's token is superseded
+    by then, so it stops at its next check, and at most one side effect per step
+    can overlap. Those are tolerable: EFS rejects a second mount target in the
+    same AZ, and PutParameter and UpdateService converge on the same state.
+    """
+    
+    def __init__(self, backend, owner_id, ttl_seconds=DEFAULT_LOCK_TTL_SECONDS, clock=time.time):
+        self.backend = backend
+        self.owner_id = owner_id
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.fencing_token = None
+        self.holder = None
+    
+    def acquire(self):
+        """
+        Try to acquire the lease
+        
+        Returns:
+            bool: True if the lease was acquired, False if another invocation holds it
+        """
+        record, _ = self.backend.get()
+        now = self.clock()
+        
+        if record and record.get('owner') not in (None, self.owner_id) and record.get('expires_at', 0) > now:
+            self.holder = record.get('owner')
+            logger.info(f"Invocation lock held by {self.holder} until {record['expires_at']}")
+            return False
+        
+        if record and record.get('owner') and record.get('owner') != self.owner_id:
+            logger.warning(f"Taking over expired invocation lock from {record['owner']}")
+        
+        version = self.backend.put({
+            'owner': self.owner_id,
+            'acquired_at': now,
+            'expires_at': now + self.ttl_seconds
+        })
+        
+        # Read back: a concurrent writer that came after us wins the lease
+        current, current_version = self.backend.get()
+        if current_version != version or not current or current.get('owner') != self.owner_id:
+            self.holder = current.get('owner') if current else None
+            logger.info(f"Lost invocation lock race to {self.holder}")
+            return False
+        
+        self.fencing_token = version
+        logger.info(f"Acquired invocation lock (fencing token: {version})")
+        return True
+    
+    def validate(self):
+        """
+        Check that the lease is still held and has not been superseded
+        
+        Returns:
+            bool: True if the fencing token is still current and the lease has not expired
+        """
+        if self.fencing_token is None:
+            return False
+        record, version = self.backend.get()
+        return (
+            version == self.fencing_token
+            and record is not None
+            and record.get('owner') == self.owner_id
+            and record.get('expires_at', 0) > self.clock()
+        )
+    
+    def release(self):
+        """
+        Release the lease if it is still held
+        
+        Returns:
+            bool: True if the lease was released
+        """
+        if not self.validate():
+            self.fencing_token = None
+            return False
+        try:
+            self.backend.put({'owner': None, 'released_by': self.owner_id, 'expires_at': 0})
+            logger.info("Released invocation lock")
+            return True
+        except ClientError as e:
+            # The lease expires on its own; never fail the invocation on release
+            logger.error(f"Failed to release invocation lock: {e}")
+            return False
+        finally:
+            self.fencing_token = None
+
+
+def create_invocation_lock(config, owner_id):
+    """
+    Create the invocation lock configured for this function
+    
+    Args:
+        config (dict): Configuration from get_config_from_env()
+        owner_id (str): Unique ID of this invocation
+    
+    Returns:
+        InvocationLock or None: None if no lock storage is configured
+    """
+    if config.get('lock_parameter_name'):
+        backend = SsmLockBackend(config['lock_parameter_name'])
+    elif config.get('lock_file_path'):
+        backend = LocalFileLockBackend(config['lock_file_path'])
+    else:
+        return None
+    
+    return InvocationLock(backend, owner_id, ttl_seconds=config['lock_ttl_seconds'])
+
+
+def ensure_lock_held(invocation_lock, action):
+    """
+    Re-check the fencing token right before a side effect
+    
+    Args:
+        invocation_lock (InvocationLock or None): Lock held by this invocation,
+            or None if no lock is configured
+        action (str): Description of the side effect, for logging
+    
+    Returns:
+        bool: True if the side effect may proceed
+    """
+    if invocation_lock is None or invocation_lock.validate():
+        return True
+    logger.error(f"Invocation lock lost before {action}")
+    return False
+
+
+def build_handler_response(status_code, execution_result, metrics):
+    """
+    Finalize invocation metrics and build the Lambda handler response
+    
+    The metrics summary is attached to execution_result and emitted as a
+    CloudWatch Embedded Metric Format log line before the response is built.
+    
+    Args:
+        status_code (int): HTTP-style status code
+        execution_result (dict): Handler execution result
+        metrics (InvocationMetrics): Invocation metrics recorder
+    
+    Returns:
+        dict: Response with statusCode and JSON body
+    """
+    metrics_summary = metrics.finish()
+    execution_result['metrics'] = metrics_summary
+    emit_emf_metrics(metrics_summary, execution_result)
+    
+    return {
+        'statusCode': status_code,
+        'body': json.dumps(execution_result)
+    }
+
+
 def lambda_handler(event, context):
     """
     Main Lambda handler function that orchestrates the entire EFS mount target auto-scaling process
@@ -475,6 +1378,13 @@ def lambda_handler(event, context):
        d. Update SSM Parameter Store
        e. Trigger ECS service deployment
     
+    When an invocation lock is configured, the run exits early if another
+    invocation holds the lease, and the lease is re-validated before any
+    mount target is created.
+    
+    Every step is timed and the durations and AWS API call counts are attached to
+    the execution result and emitted in CloudWatch Embedded Metric Format.
+    
     Args:
         event: Lambda event object (from EventBridge)
         context: Lambda context object
@@ -484,15 +1394,18 @@ def lambda_handler(event, context):
     
     Requirements: 1.1, 1.2, 1.3, 1.4, 1.5, 2.3, 5.1, 5.2, 5.3, 5.4, 6.1, 6.2, 6.3
     """
+    metrics = InvocationMetrics()
     execution_result = {
         'timestamp': context.request_id if context else 'unknown',
         'file_count': 0,
         'threshold': 0,
         'threshold_exceeded': False,
         'new_mount_target_created': False,
+        'mount_target_resumed': False,
         'deployment_triggered': False,
         'error': None
     }
+    invocation_lock = None
     
     try:
         # Log execution start (Requirement 5.1)
@@ -504,46 +1417,54 @@ def lambda_handler(event, context):
         
         # Step 1: Read configuration from environment variables (Requirement 7.1, 7.2, 7.3)
         logger.info("Step 1: Reading configuration from environment variables")
-        try:
-            config = get_config_from_env()
-            logger.info(f"Configuration loaded successfully:")
-            logger.info(f"  - Target Directory: {config['target_directory']}")
-            logger.info(f"  - File Count Threshold: {config['file_count_threshold']}")
-            logger.info(f"  - EFS File System ID: {config['efs_file_system_id']}")
-            logger.info(f"  - VPC ID: {config['vpc_id']}")
-            logger.info(f"  - SSM Parameter Name: {config['ssm_parameter_name']}")
-            logger.info(f"  - ECS Cluster: {config['ecs_cluster_name']}")
-            logger.info(f"  - ECS Service: {config['ecs_service_name']}")
-            
-            execution_result['threshold'] = config['file_count_threshold']
-        except ValueError as e:
-            error_msg = f"Configuration error: {str(e)}"
-            logger.error(error_msg)
-            execution_result['error'] = error_msg
-            return {
-                'statusCode': 400,
-                'body': json.dumps(execution_result)
-            }
+        with metrics.step('config'):
+            try:
+                config = get_config_from_env()
+                logger.info(f"Configuration loaded successfully:")
+                logger.info(f"  - Target Directory: {config['target_directory']}")
+                logger.info(f"  - File Count Threshold: {config['file_count_threshold']}")
+                logger.info(f"  - EFS File System ID: {config['efs_file_system_id']}")
+                logger.info(f"  - VPC ID: {config['vpc_id']}")
+                logger.info(f"  - SSM Parameter Name: {config['ssm_parameter_name']}")
+                logger.info(f"  - ECS Cluster: {config['ecs_cluster_name']}")
+                logger.info(f"  - ECS Service: {config['ecs_service_name']}")
+                
+                execution_result['threshold'] = config['file_count_threshold']
+            except ValueError as e:
+                error_msg = f"Configuration error: {str(e)}"
+                logger.error(error_msg)
+                execution_result['error'] = error_msg
+                return build_handler_response(400, execution_result, metrics)
+        
+        # Acquire the invocation lock so overlapping runs never scan or provision twice
+        with metrics.step('lock_acquire'):
+            owner_id = context.request_id if context else str(uuid.uuid4())
+            invocation_lock = create_invocation_lock(config, owner_id)
+            if invocation_lock and not invocation_lock.acquire():
+                logger.info(f"Another invocation ({invocation_lock.holder}) is in progress - skipping this run")
+                invocation_lock = None
+                execution_result['skipped'] = 'invocation_in_progress'
+                return build_handler_response(200, execution_result, metrics)
+            if invocation_lock:
+                execution_result['fencing_token'] = invocation_lock.fencing_token
         
         # Step 2: Count files in target directory (Requirement 1.2)
         logger.info(f"Step 2: Counting files in directory: {config['target_directory']}")
-        try:
-            file_count = count_files_in_directory(config['target_directory'])
-            execution_result['file_count'] = file_count
-            
-            # Log file count result (Requirement 5.2)
-            logger.info(f"File count result: {file_count} files")
-            logger.info(f"Threshold: {config['file_count_threshold']} files")
-        except (FileNotFoundError, NotADirectoryError, PermissionError) as e:
-            # Error accessing EFS (Requirement 6.1)
-            error_msg = f"Failed to access EFS directory: {str(e)}"
-            logger.error(error_msg)
-            logger.error("Aborting execution due to EFS access failure")
-            execution_result['error'] = error_msg
-            return {
-                'statusCode': 500,
-                'body': json.dumps(execution_result)
-            }
+        with metrics.step('count_files'):
+            try:
+                file_count = count_files_in_directory(config['target_directory'])
+                execution_result['file_count'] = file_count
+                
+                # Log file count result (Requirement 5.2)
+                logger.info(f"File count result: {file_count} files")
+                logger.info(f"Threshold: {config['file_count_threshold']} files")
+            except (FileNotFoundError, NotADirectoryError, PermissionError) as e:
+                # Error accessing EFS (Requirement 6.1)
+                error_msg = f"Failed to access EFS directory: {str(e)}"
+                logger.error(error_msg)
+                logger.error("Aborting execution due to EFS access failure")
+                execution_result['error'] = error_msg
+                return build_handler_response(500, execution_result, metrics)
         
         # Step 3: Check if threshold is exceeded (Requirement 1.3)
         logger.info("Step 3: Checking if threshold is exceeded")
@@ -559,67 +1480,122 @@ def lambda_handler(event, context):
             logger.info("=" * 80)
             logger.info("Lambda function execution completed successfully")
             logger.info("=" * 80)
-            return {
-                'statusCode': 200,
-                'body': json.dumps(execution_result)
-            }
+            return build_handler_response(200, execution_result, metrics)
         
         # Step 4: Get existing mount targets (Requirement 1.4)
+        # Mount targets, candidate subnets and the published list are independent, so
+        # they are fetched concurrently and consumed by steps 4, 4b and 5. With a subnet
+        # inventory configured, the inventory is loaded instead of describing the VPC.
         logger.info("Step 4: Retrieving existing mount targets")
-        try:
-            existing_mount_targets = get_existing_mount_targets(config['efs_file_system_id'])
-            logger.info(f"Found {len(existing_mount_targets)} existing mount targets:")
-            for mt in existing_mount_targets:
-                logger.info(f"  - {mt['mount_target_id']} in {mt['availability_zone']} (subnet: {mt['subnet_id']})")
-        except ClientError as e:
-            error_msg = f"Failed to retrieve existing mount targets: {str(e)}"
-            logger.error(error_msg)
-            execution_result['error'] = error_msg
-            return {
-                'statusCode': 500,
-                'body': json.dumps(execution_result)
+        inventory_parameter_name = config.get('subnet_inventory_parameter_name')
+        with metrics.step('describe_mount_targets'):
+            prefetch_calls = {
+                'describe_mount_targets': lambda: get_existing_mount_targets(config['efs_file_system_id']),
+                'get_published_mount_targets': lambda: get_published_mount_targets(config['ssm_parameter_name'])
             }
+            if inventory_parameter_name:
+                prefetch_calls['load_subnet_inventory'] = lambda: get_inventory_subnets(
+                    inventory_parameter_name,
+                    config['vpc_id']
+                )
+            else:
+                prefetch_calls['describe_subnets'] = lambda: list_vpc_subnets(config['vpc_id'])
+            prefetch = run_concurrently(prefetch_calls, metrics)
+            try:
+                existing_mount_targets = prefetch['describe_mount_targets'].result()
+                logger.info(f"Found {len(existing_mount_targets)} existing mount targets:")
+                for mt in existing_mount_targets:
+                    logger.info(f"  - {mt['mount_target_id']} in {mt['availability_zone']} (subnet: {mt['subnet_id']})")
+            except ClientError as e:
+                error_msg = f"Failed to retrieve existing mount targets: {str(e)}"
+                logger.error(error_msg)
+                execution_result['error'] = error_msg
+                return build_handler_response(500, execution_result, metrics)
         
-        # Step 5: Find available subnet (Requirement 1.4)
-        logger.info("Step 5: Finding available subnet for new mount target")
-        try:
-            available_subnet = find_available_subnet(config['vpc_id'], existing_mount_targets)
-            
-            if not available_subnet:
-                # No available subnets (Requirement 6.2)
-                warning_msg = "No available subnets found - all AZs already have mount targets"
-                logger.warning(warning_msg)
-                logger.info("Skipping mount target creation")
-                logger.info("=" * 80)
-                logger.info("Lambda function execution completed (no action taken)")
-                logger.info("=" * 80)
-                execution_result['error'] = warning_msg
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps(execution_result)
-                }
-            
-            logger.info(f"Available subnet found: {available_subnet['subnet_id']} in {available_subnet['availability_zone']}")
-        except ClientError as e:
-            error_msg = f"Failed to find available subnet: {str(e)}"
-            logger.error(error_msg)
-            execution_result['error'] = error_msg
-            return {
-                'statusCode': 500,
-                'body': json.dumps(execution_result)
-            }
+        # Step 4b: Resume in-flight work from an earlier or overlapping run
+        logger.info("Checking for in-flight or unpublished mount targets")
+        with metrics.step('resume_check'):
+            published_mount_targets = prefetch['get_published_mount_targets'].result()
+            published_ids = None
+            if published_mount_targets is not None:
+                published_ids = {mt['mount_target_id'] for mt in published_mount_targets}
+            resumable_mount_target = find_in_flight_mount_target(existing_mount_targets)
+            if not resumable_mount_target:
+                resumable_mount_target = find_unpublished_mount_target(
+                    existing_mount_targets,
+                    config['ssm_parameter_name'],
+                    published_ids=published_ids
+                )
         
-        # Step 6: Create new mount target (Requirement 1.4, 5.3)
+        if resumable_mount_target:
+            logger.info(f"Resuming mount target {resumable_mount_target['mount_target_id']} "
+                        f"({resumable_mount_target['lifecycle_state']}) instead of creating a new one")
+            execution_result['resumed_mount_target_id'] = resumable_mount_target['mount_target_id']
+            execution_result['mount_target_resumed'] = True
+        else:
+            # Step 5: Find available subnet (Requirement 1.4)
+            logger.info("Step 5: Finding available subnet for new mount target")
+            with metrics.step('find_subnet'):
+                try:
+                    # A failed inventory load is not retried: find_available_subnet falls back
+                    if inventory_parameter_name:
+                        prefetched_subnets = None
+                        inventory_subnets = prefetch['load_subnet_inventory'].result()
+                    else:
+                        prefetched_subnets = prefetch['describe_subnets'].result()
+                        inventory_subnets = None
+                    
+                    available_subnet = find_available_subnet(
+                        config['vpc_id'],
+                        existing_mount_targets,
+                        subnets=prefetched_subnets,
+                        inventory_parameter_name=inventory_parameter_name,
+                        inventory_subnets=inventory_subnets
+                    )
+                    
+                    if not available_subnet:
+                        # No available subnets (Requirement 6.2)
+                        warning_msg = "No available subnets found - all AZs already have mount targets"
+                        logger.warning(warning_msg)
+                        logger.info("Skipping mount target creation")
+                        logger.info("=" * 80)
+                        logger.info("Lambda function execution completed (no action taken)")
+                        logger.info("=" * 80)
+                        execution_result['error'] = warning_msg
+                        return build_handler_response(200, execution_result, metrics)
+                    
+                    logger.info(f"Available subnet found: {available_subnet['subnet_id']} in {available_subnet['availability_zone']}")
+                except ClientError as e:
+                    error_msg = f"Failed to find available subnet: {str(e)}"
+                    logger.error(error_msg)
+                    execution_result['error'] = error_msg
+                    return build_handler_response(500, execution_result, metrics)
+        
+        # Step 6: Create new mount target, or wait on the resumed one (Requirement 1.4, 5.3)
         logger.info("Step 6: Creating new mount target")
-        logger.info(f"Mount target creation started for subnet: {available_subnet['subnet_id']}")
+        
+        if not ensure_lock_held(invocation_lock, "mount target creation"):
+            execution_result['error'] = "Invocation lock lost before mount target creation"
+            invocation_lock = None
+            return build_handler_response(500, execution_result, metrics)
         
         try:
-            security_group_id = config.get('security_group_id')
-            new_mount_target = create_mount_target(
-                config['efs_file_system_id'],
-                available_subnet['subnet_id'],
-                security_group_id
-            )
+            if resumable_mount_target:
+                new_mount_target = resumable_mount_target
+            else:
+                logger.info(f"Mount target creation started for subnet: {available_subnet['subnet_id']}")
+                security_group_id = config.get('security_group_id')
+                with metrics.step('create_mount_target'):
+                    new_mount_target = create_mount_target(
+                        config['efs_file_system_id'],
+                        available_subnet['subnet_id'],
+                        security_group_id,
+                        wait=False
+                    )
+            
+            if new_mount_target and new_mount_target['lifecycle_state'] != 'available':
+                with metrics.step('wait_available'):
+                    new_mount_target = wait_for_mount_target_available(new_mount_target['mount_target_id'])
             
             if not new_mount_target:
                 # Mount target creation failed (Requirement 6.3)
@@ -627,19 +1603,20 @@ def lambda_handler(event, context):
                 logger.error(error_msg)
                 logger.error("Skipping SSM Parameter Store update and ECS deployment")
                 execution_result['error'] = error_msg
-                return {
-                    'statusCode': 500,
-                    'body': json.dumps(execution_result)
-                }
+                return build_handler_response(500, execution_result, metrics)
             
             # Log mount target creation completion (Requirement 5.3)
-            logger.info(f"✓ Mount target created successfully: {new_mount_target['mount_target_id']}")
+            if resumable_mount_target:
+                logger.info(f"✓ Resumed mount target is available: {new_mount_target['mount_target_id']}")
+            else:
+                logger.info(f"✓ Mount target created successfully: {new_mount_target['mount_target_id']}")
             logger.info(f"  - IP Address: {new_mount_target['ip_address']}")
             logger.info(f"  - Availability Zone: {new_mount_target['availability_zone']}")
             logger.info(f"  - Subnet ID: {new_mount_target['subnet_id']}")
             logger.info(f"  - Lifecycle State: {new_mount_target['lifecycle_state']}")
             
-            execution_result['new_mount_target_created'] = True
+            # A resumed target was created by an earlier run, which already counted it
+            execution_result['new_mount_target_created'] = not resumable_mount_target
             execution_result['new_mount_target_id'] = new_mount_target['mount_target_id']
             
         except ClientError as e:
@@ -648,35 +1625,44 @@ def lambda_handler(event, context):
             logger.error(error_msg)
             logger.error("Skipping SSM Parameter Store update and ECS deployment")
             execution_result['error'] = error_msg
-            return {
-                'statusCode': 500,
-                'body': json.dumps(execution_result)
-            }
+            return build_handler_response(500, execution_result, metrics)
         
         # Step 7: Update SSM Parameter Store (Requirement 1.5)
         logger.info("Step 7: Updating SSM Parameter Store with new mount target list")
         
-        # Get updated list of all mount targets
-        try:
-            all_mount_targets = get_existing_mount_targets(config['efs_file_system_id'])
-            logger.info(f"Total mount targets after creation: {len(all_mount_targets)}")
-        except ClientError as e:
-            error_msg = f"Failed to retrieve updated mount target list: {str(e)}"
-            logger.error(error_msg)
-            execution_result['error'] = error_msg
-            return {
-                'statusCode': 500,
-                'body': json.dumps(execution_result)
-            }
+        # Get updated list of all mount targets, looking up the ECS service in parallel
+        with metrics.step('refresh_mount_targets'):
+            refresh = run_concurrently({
+                'refresh_mount_targets': lambda: get_existing_mount_targets(config['efs_file_system_id']),
+                'describe_ecs_service': lambda: describe_ecs_service(
+                    config['ecs_cluster_name'],
+                    config['ecs_service_name']
+                )
+            }, metrics)
+            try:
+                all_mount_targets = refresh['refresh_mount_targets'].result()
+                logger.info(f"Total mount targets after creation: {len(all_mount_targets)}")
+            except ClientError as e:
+                error_msg = f"Failed to retrieve updated mount target list: {str(e)}"
+                logger.error(error_msg)
+                execution_result['error'] = error_msg
+                return build_handler_response(500, execution_result, metrics)
         
-        # Convert to JSON and update SSM
+        # Convert to JSON and update SSM, keeping any routing weights set by operators
+        carry_over_published_weights(all_mount_targets, published_mount_targets)
         mount_targets_json = convert_mount_targets_to_json(all_mount_targets)
         logger.info(f"Mount target list JSON: {mount_targets_json}")
         
-        ssm_update_success = update_ssm_parameter(
-            config['ssm_parameter_name'],
-            mount_targets_json
-        )
+        if not ensure_lock_held(invocation_lock, "SSM Parameter Store update"):
+            execution_result['error'] = "Invocation lock lost before SSM Parameter Store update"
+            invocation_lock = None
+            return build_handler_response(500, execution_result, metrics)
+        
+        with metrics.step('ssm_put'):
+            ssm_update_success = update_ssm_parameter(
+                config['ssm_parameter_name'],
+                mount_targets_json
+            )
         
         if not ssm_update_success:
             # SSM update failed - log but continue (Requirement 6.3)
@@ -684,20 +1670,27 @@ def lambda_handler(event, context):
             logger.warning("Configuration will be updated on next successful execution")
             logger.info("Skipping ECS deployment due to SSM update failure")
             execution_result['error'] = "SSM Parameter Store update failed"
-            return {
-                'statusCode': 500,
-                'body': json.dumps(execution_result)
-            }
+            return build_handler_response(500, execution_result, metrics)
         
         logger.info("✓ SSM Parameter Store updated successfully")
         
         # Step 8: Trigger ECS service deployment (Requirement 2.3)
         logger.info("Step 8: Triggering ECS service deployment")
         
-        deployment_success = trigger_ecs_service_deployment(
-            config['ecs_cluster_name'],
-            config['ecs_service_name']
-        )
+        ecs_service = refresh['describe_ecs_service'].result()
+        if ecs_service and ecs_service.get('status') != 'ACTIVE':
+            logger.warning(f"ECS service {config['ecs_service_name']} is {ecs_service.get('status')} - skipping deployment")
+            deployment_success = False
+        elif not ensure_lock_held(invocation_lock, "ECS service deployment"):
+            execution_result['error'] = "Invocation lock lost before ECS service deployment"
+            invocation_lock = None
+            return build_handler_response(500, execution_result, metrics)
+        else:
+            with metrics.step('ecs_update'):
+                deployment_success = trigger_ecs_service_deployment(
+                    config['ecs_cluster_name'],
+                    config['ecs_service_name']
+                )
         
         if deployment_success:
             logger.info("✓ ECS service deployment triggered successfully")
@@ -715,15 +1708,13 @@ def lambda_handler(event, context):
         logger.info(f"  - Threshold: {execution_result['threshold']}")
         logger.info(f"  - Threshold exceeded: {execution_result['threshold_exceeded']}")
         logger.info(f"  - New mount target created: {execution_result['new_mount_target_created']}")
-        if execution_result['new_mount_target_created']:
+        logger.info(f"  - Mount target resumed: {execution_result['mount_target_resumed']}")
+        if execution_result['new_mount_target_created'] or execution_result['mount_target_resumed']:
             logger.info(f"  - Mount target ID: {execution_result.get('new_mount_target_id', 'N/A')}")
         logger.info(f"  - Deployment triggered: {execution_result['deployment_triggered']}")
         logger.info("=" * 80)
         
-        return {
-            'statusCode': 200,
-            'body': json.dumps(execution_result)
-        }
+        return build_handler_response(200, execution_result, metrics)
     
     except Exception as e:
         # Catch-all for unexpected errors (Requirement 5.4, 6.1)
@@ -736,7 +1727,8 @@ def lambda_handler(event, context):
         
         execution_result['error'] = error_msg
         
-        return {
-            'statusCode': 500,
-            'body': json.dumps(execution_result)
-        }
+        return build_handler_response(500, execution_result, metrics)
+    
+    finally:
+        if invocation_lock:
+            invocation_lock.release()
@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+# Microbenchmarks for the Fargate application's hash-based routing
+#
+# Usage:
+#   python scripts/benchmark_fargate.py [benchmark ...] [--paths N]
+#
+# Runs every benchmark when none is named. Local directories stand in for
+# EFS mount points, so no AWS resources or NFS mounts are needed.
+
+import os
+import sys
+import time
+import asyncio
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from fargate import app  # noqa: E402
+
+
+def generate_paths(count):
+    """Generate a deterministic set of paths shaped like the production workload"""
+    return [f"data/{i % 997:03d}/{i % 13}/file-{i:08d}.bin" for i in range(count)]
+
+
+def measure(fn, repeat=3):
+    """Return the best wall-clock time of fn() over several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def distribution_quality(counts):
+    """
+    Summarize how evenly paths were spread over buckets
+
+    Returns:
+        tuple: (chi-square statistic / degrees of freedom, max deviation from the mean in %)
+            A uniform hash gives a normalized chi-square close to 1.0.
+    """
+    total = sum(counts)
+    expected = total / len(counts)
+    chi_square = sum((c - expected) ** 2 / expected for c in counts)
+    max_deviation = max(abs(c - expected) for c in counts) / expected * 100
+    return chi_square / max(len(counts) - 1, 1), max_deviation
+
+
+def legacy_sha256_hash(file_path):
+    """Original implementation (hex digest parsed back into a 256-bit int), kept as a baseline"""
+    return int(hashlib.sha256(file_path.encode('utf-8')).hexdigest(), 16)
+
+
+def bench_hash(paths):
+    """Throughput and distribution quality of each registered hash function"""
+    candidates = dict(app.HASH_FUNCTIONS, **{'sha256-hex': legacy_sha256_hash})
+
+    print(f"{'hash':<10} {'paths/sec':>14} {'chi2/df (N=3)':>14} {'max dev (N=3)':>14} {'chi2/df (N=6)':>14}")
+    for name in sorted(candidates):
+        hash_function = candidates[name]
+        elapsed = measure(lambda: [hash_function(p) for p in paths])
+
+        results = []
+        for buckets in (3, 6):
+            counts = [0] * buckets
+            for p in paths:
+                counts[hash_function(p) % buckets] += 1
+            results.append(distribution_quality(counts))
+
+        print(f"{name:<10} {len(paths) / elapsed:>14,.0f} {results[0][0]:>14.2f} "
+              f"{results[0][1]:>13.2f}% {results[1][0]:>14.2f}")
+
+
+def _mount_targets(count):
+    return [{'mount_target_id': f"fsmt-{i:08x}", 'ip_address': f"10.0.{i}.100"} for i in range(count)]
+
+
+def bench_routing(paths):
+    """Lookup throughput and remapping when a mount target is appended, per routing mode"""
+    print(f"{'mode':<10} {'lookups/sec':>14} {'moved 3->4':>12} {'ideal':>8}")
+    for mode in app.ROUTING_MODES:
+        app.configure_routing(mode)
+        three = _mount_targets(3)
+        four = _mount_targets(4)
+
+        elapsed = measure(lambda: [app.get_file_path(p, four) for p in paths])
+        moved = sum(app.get_file_path(p, three) != app.get_file_path(p, four) for p in paths)
+
+        print(f"{mode:<10} {len(paths) / elapsed:>14,.0f} {moved / len(paths):>11.1%} {1 / 4:>7.1%}")
+    app.configure_routing(app.DEFAULT_ROUTING_MODE)
+
+
+def legacy_get_file_path(original_path, mount_targets):
+    """Original per-call pipeline (validate, hash % N, f-string, os.path.join), kept as a baseline"""
+    if not mount_targets:
+        raise ValueError("No mount targets available")
+    index = app.calculate_file_path_hash(original_path) % len(mount_targets)
+    return os.path.join(f"/mnt/efs-{index}", original_path.lstrip('/'))
+
+
+def bench_router(paths):
+    """Per-call overhead of the routing entry points (modulo mode)"""
+    app.configure_routing('modulo')
+    mount_targets = _mount_targets(3)
+    router = app.MountRouter(mount_targets)
+    cached_router = app.MountRouter(mount_targets, cache_size=len(paths))
+
+    candidates = [
+        ('legacy get_file_path', lambda: [legacy_get_file_path(p, mount_targets) for p in paths]),
+        ('get_file_path', lambda: [app.get_file_path(p, mount_targets) for p in paths]),
+        ('MountRouter.route', lambda: [router.route(p) for p in paths]),
+        ('MountRouter.route_many', lambda: router.route_many(paths)),
+        ('MountRouter.route cached', lambda: [cached_router.route(p) for p in paths])
+    ]
+
+    print(f"{'entry point':<26} {'paths/sec':>14} {'ns/path':>10}")
+    for name, fn in candidates:
+        elapsed = measure(fn)
+        print(f"{name:<26} {len(paths) / elapsed:>14,.0f} {elapsed / len(paths) * 1e9:>10,.0f}")
+    print(f"cache after warm-up: {cached_router.cache_stats()}")
+    app.configure_routing(app.DEFAULT_ROUTING_MODE)
+
+
+def bench_batch(paths):
+    """Batch routing with route_batch versus a get_file_path loop"""
+    mount_targets = _mount_targets(6)
+    numpy_module = app.np
+
+    print(f"NumPy: {'available' if numpy_module is not None else 'not installed'}")
+    print(f"{'hash':<8} {'mode':<11} {'loop paths/sec':>15} {'batch (py)':>12} {'batch (np)':>12} {'speedup':>8}")
+    for hash_name in ('sha256', 'blake2b'):
+        app.configure_hash_function(hash_name)
+        for mode in app.ROUTING_MODES:
+            app.configure_routing(mode)
+            router = app.MountRouter(mount_targets)
+
+            loop = measure(lambda: [app.get_file_path(p, mount_targets) for p in paths])
+            try:
+                app.np = None
+                batch_python = measure(lambda: router.route_batch(paths))
+            finally:
+                app.np = numpy_module
+            batch = measure(lambda: router.route_batch(paths))
+
+            numpy_column = f"{len(paths) / batch:>12,.0f}" if numpy_module is not None else f"{'-':>12}"
+            print(f"{hash_name:<8} {mode:<11} {len(paths) / loop:>15,.0f} {len(paths) / batch_python:>12,.0f} "
+                  f"{numpy_column} {loop / batch:>7.1f}x")
+
+    app.configure_hash_function(app.DEFAULT_HASH_FUNCTION)
+    app.configure_routing(app.DEFAULT_ROUTING_MODE)
+
+
+def _local_mounts(root, count):
+    """Create local directories standing in for EFS mount points"""
+    mounted = []
+    for index in range(count):
+        mount_point = os.path.join(root, f"efs-{index}")
+        os.makedirs(mount_point)
+        mounted.append({'index': index, 'mount_point': mount_point, 'mount_target_id': f"fsmt-{index:08x}"})
+    return mounted
+
+
+def bench_reads(paths):
+    """Skewed (Zipf) concurrent reads with hash-pinned versus least-loaded read routing"""
+    files = paths[:1000]
+    popularity = [1 / (rank + 1) ** 1.1 for rank in range(len(files))]
+    requests = random.Random(42).choices(files, weights=popularity, k=min(len(paths), 20000))
+
+    with tempfile.TemporaryDirectory() as root:
+        mounted = _local_mounts(root, 4)
+        # Every mount point exposes the same root, as with EFS
+        for mount in mounted:
+            for path in files:
+                os.makedirs(os.path.dirname(os.path.join(mount['mount_point'], path)), exist_ok=True)
+                with open(os.path.join(mount['mount_point'], path), 'w') as f:
+                    f.write('x' * 256)
+
+        # Queueing stand-in: each read on a mount waits 0.5 ms per read running there
+        active = [0] * len(mounted)
+        served = [0] * len(mounted)
+        lock = threading.Lock()
+
+        def slow_open(file, *args, **kwargs):
+            index = int(file[len(root) + len('/efs-'):].split('/', 1)[0])
+            with lock:
+                active[index] += 1
+                served[index] += 1
+                queued = active[index]
+            try:
+                time.sleep(0.0005 * queued)
+                return open(file, *args, **kwargs)
+            finally:
+                with lock:
+                    active[index] -= 1
+
+        print(f"{'read routing':<14} {'reads/sec':>12} {'per-target share':>36} {'max/mean':>9}")
+        app.open = slow_open
+        try:
+            for mode in app.READ_ROUTING_MODES:
+                app.configure_read_routing(mode)
+                router = app.MountRouter(mounted, mode='modulo')
+                served[:] = [0] * len(mounted)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=16) as executor:
+                    list(executor.map(lambda path: app.read_file(path, router), requests))
+                elapsed = time.perf_counter() - start
+
+                share = ' '.join(f"{c / len(requests):>7.1%}" for c in served)
+                print(f"{mode:<14} {len(requests) / elapsed:>12,.0f} {share:>36} "
+                      f"{max(served) / (sum(served) / len(served)):>9.2f}")
+        finally:
+            del app.open
+            app.configure_read_routing(app.DEFAULT_READ_ROUTING)
+
+
+def bench_affinity(paths):
+    """NFS attribute-cache locality of full-path versus directory-affinity routing"""
+    # Stand-in for each NFS client's attribute/lookup cache: an LRU of directories
+    cache_capacity = 512
+    files = [f"tenant-{i % 64:02d}/batch-{i // 64 % 16:02d}/part-{i:07d}.bin" for i in range(len(paths))]
+    accesses = random.Random(7).choices(files, k=len(paths))
+
+    print(f"{'routing key':<16} {'dir misses':>11} {'dirs/mount':>11} {'load max/mean':>14} {'route/sec':>12}")
+    for depth in (0, 1, 2):
+        router = app.MountRouter(_mount_targets(4), mode='rendezvous', directory_depth=depth)
+        caches = [OrderedDict() for _ in router.prefixes]
+        seen = [set() for _ in router.prefixes]
+        counts = [0] * len(router.prefixes)
+        lookups = misses = 0
+
+        for path in accesses:
+            index = router.select(path)
+            counts[index] += 1
+            cache = caches[index]
+            directory = ''
+            for component in path.split('/')[:-1]:
+                directory = f"{directory}/{component}"
+                lookups += 1
+                seen[index].add(directory)
+                if directory in cache:
+                    cache.move_to_end(directory)
+                else:
+                    misses += 1
+                    cache[directory] = True
+                    if len(cache) > cache_capacity:
+                        cache.popitem(last=False)
+
+        elapsed = measure(lambda: router.route_many(accesses))
+        label = 'full path' if depth == 0 else f"depth {depth}"
+        mean = sum(counts) / len(counts)
+        print(f"{label:<16} {misses / lookups:>10.1%} {sum(len(s) for s in seen) / len(seen):>11,.0f} "
+              f"{max(counts) / mean:>14.2f} {len(accesses) / elapsed:>12,.0f}")
+
+
+def bench_aio(paths):
+    """Small-file reads through the blocking helpers versus the aio API"""
+    files = paths[:2000]
+
+    with tempfile.TemporaryDirectory() as root:
+        mounted = _local_mounts(root, 4)
+        router = app.MountRouter(mounted)
+        for path in files:
+            app.write_file(path, 'x' * 1024, router)
+
+        real_open = open
+
+        def nfs_open(file, *args, **kwargs):
+            # Stand-in for a 1 ms NFS round trip per open
+            time.sleep(0.001)
+            return real_open(file, *args, **kwargs)
+
+        async def read_all(api):
+            return await asyncio.gather(*(api.read_file(path, router) for path in files))
+
+        print(f"{'api':<28} {'reads/sec':>12}")
+        for latency, label in ((False, 'local disk'), (True, '1 ms round trip')):
+            if latency:
+                app.open = nfs_open
+            try:
+                elapsed = measure(lambda: [app.read_file(path, router) for path in files], repeat=1)
+                print(f"{'sync loop (' + label + ')':<28} {len(files) / elapsed:>12,.0f}")
+                for workers in (1, 4, 16):
+                    api = app.AsyncFileAPI(workers)
+                    elapsed = measure(lambda: asyncio.run(read_all(api)), repeat=1)
+                    api.shutdown()
+                    name = f"aio x{workers}/mount ({label})"
+                    print(f"{name:<28} {len(files) / elapsed:>12,.0f}")
+            finally:
+                if latency:
+                    del app.open
+
+
+def bench_bulk(paths):
+    """bulk_read / bulk_write versus one-at-a-time helpers with a 1 ms round trip per open"""
+    files = paths[:2000]
+    payload = 'x' * 4096
+
+    with tempfile.TemporaryDirectory() as root:
+        router = app.MountRouter(_local_mounts(root, 4))
+        for path in files:
+            app.write_file(path, payload, router)
+
+        real_open = open
+
+        def nfs_open(file, *args, **kwargs):
+            time.sleep(0.001)
+            return real_open(file, *args, **kwargs)
+
+        app.open = nfs_open
+        try:
+            print(f"{'operation':<28} {'files/sec':>12}")
+            elapsed = measure(lambda: [app.read_file(path, router) for path in files], repeat=1)
+            print(f"{'read_file loop':<28} {len(files) / elapsed:>12,.0f}")
+            elapsed = measure(lambda: [app.write_file(path, payload, router) for path in files], repeat=1)
+            print(f"{'write_file loop':<28} {len(files) / elapsed:>12,.0f}")
+            for concurrency in (1, 4, 16):
+                elapsed = measure(lambda: list(app.bulk_read(files, router, concurrency=concurrency)), repeat=1)
+                print(f"{f'bulk_read x{concurrency}/mount':<28} {len(files) / elapsed:>12,.0f}")
+                items = [(path, payload) for path in files]
+                elapsed = measure(lambda: list(app.bulk_write(items, router, concurrency=concurrency)), repeat=1)
+                print(f"{f'bulk_write x{concurrency}/mount':<28} {len(files) / elapsed:>12,.0f}")
+        finally:
+            del app.open
+
+
+def _traced(fn):
+    """Run fn() and return (seconds, peak traced allocation in bytes)"""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        return elapsed, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_stream(paths):
+    """Whole-object versus chunked read/write of one large object: throughput and peak memory"""
+    size = 128 * 1024 * 1024
+    chunk = os.urandom(app.NFS_IO_SIZE)
+
+    def chunks():
+        for _ in range(size // len(chunk)):
+            yield chunk
+
+    def drain(iterator):
+        for _ in iterator:
+            pass
+
+    with tempfile.TemporaryDirectory() as root:
+        router = app.MountRouter(_local_mounts(root, 2))
+        candidates = [
+            ('write_file', lambda: app.write_file('big.bin', b''.join(chunks()), router, mode='wb')),
+            ('write_stream', lambda: app.write_stream('big.bin', chunks(), router)),
+            ('read_file', lambda: app.read_file('big.bin', router, mode='rb')),
+            ('read_chunks', lambda: drain(app.read_chunks('big.bin', router)))
+        ]
+
+        print(f"{'api (128 MiB)':<16} {'MiB/sec':>10} {'peak MiB':>10}")
+        for name, fn in candidates:
+            elapsed, peak = _traced(fn)
+            print(f"{name:<16} {size / elapsed / 2 ** 20:>10,.0f} {peak / 2 ** 20:>10.1f}")
+
+
+def bench_zerocopy(paths):
+    """Small binary reads: read_file versus readinto, pooled buffers and mmap"""
+    files = paths[:500]
+    reads = files * 20
+    size = 16 * 1024
+
+    with tempfile.TemporaryDirectory() as root:
+        router = app.MountRouter(_local_mounts(root, 2))
+        for path in files:
+            app.write_file(path, os.urandom(size), router, mode='wb')
+
+        buffer = bytearray(size)
+
+        def with_pool(path):
+            with app.pooled_read(path, router) as data:
+                return data[0]
+
+        def with_mmap(path):
+            with app.map_file(path, router) as data:
+                return data[0]
+
+        candidates = [
+            ('read_file rb', lambda path: app.read_file(path, router, mode='rb')),
+            ('read_into', lambda path: app.read_into(path, buffer, router)),
+            ('pooled_read', with_pool),
+            ('map_file', with_mmap)
+        ]
+
+        print(f"{'api (16 KiB)':<14} {'reads/sec':>12} {'alloc KiB/read':>15}")
+        for name, read in candidates:
+            elapsed = measure(lambda: [read(path) for path in reads])
+
+            # Peak traced allocation above the baseline while a single read runs
+            tracemalloc.start()
+            try:
+                total = 0
+                for path in files:
+                    before = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    read(path)
+                    total += tracemalloc.get_traced_memory()[1] - before
+            finally:
+                tracemalloc.stop()
+
+            print(f"{name:<14} {len(reads) / elapsed:>12,.0f} {total / len(files) / 1024:>15.1f}")
+
+
+def bench_dirs(paths):
+    """Writes with and without the known-directory cache, 0.5 ms per NFS metadata round trip"""
+    files = [f"jobs/{i % 50:02d}/out-{i:06d}.txt" for i in range(2000)]
+    real_makedirs = os.makedirs
+
+    def nfs_makedirs(name, *args, **kwargs):
+        # Existing directory: stat parent, MKDIR (EEXIST), stat directory
+        time.sleep(0.0005 * app.MAKEDIRS_EXISTING_METADATA_OPS)
+        return real_makedirs(name, *args, **kwargs)
+
+    print(f"{'known dirs':<12} {'writes/sec':>11} {'makedirs':>9} {'skipped':>8} {'ops saved/write':>16}")
+    os.makedirs = nfs_makedirs
+    try:
+        for size in (0, app.DEFAULT_KNOWN_DIRECTORIES_SIZE):
+            with tempfile.TemporaryDirectory() as root:
+                router = app.MountRouter(_local_mounts(root, 2))
+                app.configure_known_directories(size)
+                before = app.get_known_directory_stats()
+
+                start = time.perf_counter()
+                for path in files:
+                    app.write_file(path, 'x', router)
+                elapsed = time.perf_counter() - start
+
+                stats = app.get_known_directory_stats()
+                calls = stats['makedirs_calls'] - before['makedirs_calls']
+                skipped = stats['makedirs_skipped'] - before['makedirs_skipped']
+                saved = stats['metadata_ops_saved'] - before['metadata_ops_saved']
+                print(f"{size:<12} {len(files) / elapsed:>11,.0f} {calls:>9} {skipped:>8} {saved / len(files):>16.2f}")
+    finally:
+        os.makedirs = real_makedirs
+        app.configure_known_directories(app.DEFAULT_KNOWN_DIRECTORIES_SIZE)
+
+
+def bench_durability(paths):
+    """Concurrent writes in place versus atomic with group commit, 4 ms per NFS COMMIT"""
+    files = [f"jobs/{i % 50:02d}/out-{i:06d}.txt" for i in range(2000)]
+    real_fsync = os.fsync
+    real_syncfs = app._syncfs
+
+    def nfs_commit(fd):
+        time.sleep(0.004)
+        real_fsync(fd)
+
+    print(f"{'write mode':<18} {'writes/sec':>11} {'syncs':>7} {'batch':>6} {'p50 ms':>7} {'p99 ms':>7}")
+    os.fsync = nfs_commit
+    app._syncfs = nfs_commit
+    try:
+        for mode, window_ms in (('in_place', 0), ('atomic', 0), ('atomic', 2), ('atomic', 5)):
+            with tempfile.TemporaryDirectory() as root:
+                router = app.MountRouter(_local_mounts(root, 2))
+                app.configure_write_mode(mode, window_ms)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=32) as executor:
+                    list(executor.map(lambda path: app.write_file(path, 'x' * 1024, router), files))
+                elapsed = time.perf_counter() - start
+
+                stats = app.get_durability_stats().values()
+                syncs = sum(s['syncs'] for s in stats)
+                batch = sum(s['mean_batch_size'] for s in stats) / len(stats) if stats else 0.0
+                p50 = max((s['latency_ms']['p50'] for s in stats), default=0.0)
+                p99 = max((s['latency_ms']['p99'] for s in stats), default=0.0)
+                label = mode if mode == 'in_place' else f"{mode} {window_ms} ms"
+                print(f"{label:<18} {len(files) / elapsed:>11,.0f} {syncs:>7} {batch:>6.1f} {p50:>7.1f} {p99:>7.1f}")
+    finally:
+        os.fsync = real_fsync
+        app._syncfs = real_syncfs
+        app.configure_write_mode(app.DEFAULT_WRITE_MODE)
+
+
+def bench_metadata(paths):
+    """file_exists on a hot set with and without the metadata cache, 0.5 ms per NFS lookup"""
+    files = paths[:200]
+    checks = random.Random(7).choices(files, k=20000)
+    real_exists = os.path.exists
+
+    def nfs_exists(path):
+        time.sleep(0.0005)
+        return real_exists(path)
+
+    with tempfile.TemporaryDirectory() as root:
+        router = app.MountRouter(_local_mounts(root, 2))
+        for path in files[::2]:
+            app.write_file(path, 'x', router)
+
+        print(f"{'ttl':<6} {'checks/sec':>11} {'hit rate':>9} {'lookups saved':>14}")
+        os.path.exists = nfs_exists
+        try:
+            for ttl in (0, 1, app.NFS_ACREGMIN):
+                app.configure_metadata_cache(ttl)
+                before = app.get_metadata_cache_stats()
+                start = time.perf_counter()
+                for path in checks:
+                    app.file_exists(path, router)
+                elapsed = time.perf_counter() - start
+
+                hits = app.get_metadata_cache_stats()['hits'] - before['hits']
+                print(f"{ttl:<6} {len(checks) / elapsed:>11,.0f} {hits / len(checks):>9.1%} {hits:>14,}")
+        finally:
+            os.path.exists = real_exists
+            app.configure_metadata_cache(app.DEFAULT_METADATA_CACHE_TTL)
+
+
+def bench_readcache(paths):
+    """Zipf re-reads of reference files through the read cache, EFS at 1 ms + 100 MiB/s"""
+    # Every 11th reference file is 2 MiB, the rest 16 KiB
+    files = paths[:440]
+    large = set(files[::11])
+    small = [path for path in files if path not in large]
+    popularity = [1 / (rank + 1) ** 1.1 for rank in range(len(files))]
+    requests = random.Random(11).choices(files, weights=popularity, k=4000)
+    real_stat = os.stat
+
+    with tempfile.TemporaryDirectory() as root:
+        router = app.MountRouter(_local_mounts(root, 2))
+        for path in small:
+            app.write_file(path, os.urandom(16 * 1024), router, mode='wb')
+        for path in large:
+            app.write_file(path, os.urandom(2 * 1024 * 1024), router, mode='wb')
+        mounts = os.path.join(root, 'efs-')
+
+        class EfsFile:
+            # Charges a round trip per open and per-byte transfer time on read
+            def __init__(self, f):
+                self._f = f
+                time.sleep(0.001)
+
+            def read(self, *args):
+                data = self._f.read(*args)
+                time.sleep(len(data) / (100 * 2 ** 20))
+                return data
+
+            def __getattr__(self, name):
+                return getattr(self._f, name)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._f.close()
+
+        def efs_open(file, *args, **kwargs):
+            f = open(file, *args, **kwargs)
+            return EfsFile(f) if str(file).startswith(mounts) else f
+
+        def efs_stat(path, *args, **kwargs):
+            if str(path).startswith(mounts):
+                time.sleep(0.0005)
+            return real_stat(path, *args, **kwargs)
+
+        cache_root = os.path.join(root, 'cache')
+        os.makedirs(cache_root)
+        print(f"{'read cache':<22} {'reads/sec':>10} {'hit ratio':>10} {'MiB saved':>10}")
+        app.open = efs_open
+        os.stat = efs_stat
+        try:
+            for name, memory_bytes, disk_bytes in (('off', 0, 0), ('memory 4 MiB', 4 * 2 ** 20, 0),
+                                                   ('memory + disk 64 MiB', 4 * 2 ** 20, 64 * 2 ** 20)):
+                app.configure_read_cache(memory_bytes, disk_bytes, cache_root)
+                start = time.perf_counter()
+                for path in requests:
+                    app.read_file(path, router, mode='rb')
+                elapsed = time.perf_counter() - start
+
+                stats = app.get_read_cache_stats() or {'hit_ratio': 0.0, 'bytes_saved': 0}
+                print(f"{name:<22} {len(requests) / elapsed:>10,.0f} {stats['hit_ratio']:>10.1%} "
+                      f"{stats['bytes_saved'] / 2 ** 20:>10,.0f}")
+        finally:
+            del app.open
+            os.stat = real_stat
+            app.configure_read_cache(app.DEFAULT_READ_CACHE_MEMORY_BYTES, app.DEFAULT_READ_CACHE_DISK_BYTES)
+
+
+def bench_appends(paths):
+    """Tiny log-line appends with and without the write-behind buffer, 1 ms per open"""
+    logs = [f"logs/worker-{i:02d}.log" for i in range(20)]
+    lines = [(logs[i % len(logs)], f"event {i} ok\n") for i in range(20000)]
+
+    opens = [0]
+
+    def nfs_open(file, *args, **kwargs):
+        opens[0] += 1
+        time.sleep(0.001)
+        return open(file, *args, **kwargs)
+
+    print(f"{'append buffer':<16} {'appends/sec':>12} {'writes':>7} {'appends/write':>14}")
+    app.open = nfs_open
+    try:
+        for name, flush_bytes in (('off', 0), ('64 KiB / 200 ms', 64 * 1024)):
+            with tempfile.TemporaryDirectory() as root:
+                router = app.MountRouter(_local_mounts(root, 2))
+                app.configure_append_buffer(flush_bytes, 200)
+
+                opens[0] = 0
+                start = time.perf_counter()
+                for path, line in lines:
+                    app.append_file(path, line, router)
+                app.flush_appends()
+                elapsed = time.perf_counter() - start
+
+                print(f"{name:<16} {len(lines) / elapsed:>12,.0f} {opens[0]:>7,} {len(lines) / opens[0]:>14.1f}")
+                app.configure_append_buffer(0)
+    finally:
+        del app.open
+
+
+def bench_handles(paths):
+    """Repeated appends and reads with and without the file handle cache, 1.5 ms per OPEN + CLOSE"""
+    logs = [f"logs/worker-{i:02d}.log" for i in range(20)]
+    appends = [(logs[i % len(logs)], f"event {i} ok\n") for i in range(10000)]
+    files = paths[:200]
+    reads = random.Random(5).choices(files, k=10000)
+
+    def nfs_open(file, *args, **kwargs):
+        time.sleep(0.0015)
+        return open(file, *args, **kwargs)
+
+    print(f"{'handle cache':<14} {'appends/sec':>12} {'reads/sec':>10} {'hit rate':>9}")
+    app.open = nfs_open
+    try:
+        for size in (0, 256):
+            with tempfile.TemporaryDirectory() as root:
+                router = app.MountRouter(_local_mounts(root, 2))
+                for path in files:
+                    app.write_file(path, 'x' * 4096, router)
+                app.configure_file_handle_cache(size)
+
+                elapsed = measure(lambda: [app.append_file(path, line, router) for path, line in appends], repeat=1)
+                append_rate = len(appends) / elapsed
+                elapsed = measure(lambda: [app.read_file(path, router) for path in reads], repeat=1)
+                read_rate = len(reads) / elapsed
+
+                stats = app.get_file_handle_cache_stats() or {'hit_rate': 0.0}
+                print(f"{size:<14} {append_rate:>12,.0f} {read_rate:>10,.0f} {stats['hit_rate']:>9.1%}")
+                app.configure_file_handle_cache(0)
+    finally:
+        del app.open
+
+
+BENCHMARKS = {
+    'hash': bench_hash,
+    'routing': bench_routing,
+    'router': bench_router,
+    'batch': bench_batch,
+    'reads': bench_reads,
+    'affinity': bench_affinity,
+    'aio': bench_aio,
+    'bulk': bench_bulk,
+    'stream': bench_stream,
+    'zerocopy': bench_zerocopy,
+    'dirs': bench_dirs,
+    'durability': bench_durability,
+    'metadata': bench_metadata,
+    'readcache': bench_readcache,
+    'appends': bench_appends,
+    'handles': bench_handles
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fargate routing microbenchmarks')
+    parser.add_argument('benchmarks', nargs='*',
+                        help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--paths', type=int, default=200000, help='Number of synthetic paths')
+    args = parser.parse_args()
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    # Keep configuration log lines out of the results
+    app.logger.setLevel(logging.WARNING)
+
+    paths = generate_paths(args.paths)
+    for name in args.benchmarks or list(BENCHMARKS):
+        print(f"\n== {name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name](paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -180,6 +180,66 @@ resource "aws_ecs_task_definition" "fargate" {
         {
           name  = "EFS_FILE_SYSTEM_ID"
           value = aws_efs_file_system.main.id
+        },
+        {
+          name  = "PATH_HASH_FUNCTION"
+          value = var.path_hash_function
+        },
+        {
+          name  = "ROUTING_MODE"
+          value = var.routing_mode
+        },
+        {
+          name  = "PATH_CACHE_SIZE"
+          value = tostring(var.path_cache_size)
+        },
+        {
+          name  = "READ_ROUTING"
+          value = var.read_routing
+        },
+        {
+          name  = "ROUTING_DIRECTORY_DEPTH"
+          value = tostring(var.routing_directory_depth)
+        },
+        {
+          name  = "AIO_WORKERS_PER_MOUNT"
+          value = tostring(var.aio_workers_per_mount)
+        },
+        {
+          name  = "KNOWN_DIRECTORIES_SIZE"
+          value = tostring(var.known_directories_size)
+        },
+        {
+          name  = "METADATA_CACHE_TTL"
+          value = tostring(var.metadata_cache_ttl)
+        },
+        {
+          name  = "READ_CACHE_MEMORY_BYTES"
+          value = tostring(var.read_cache_memory_bytes)
+        },
+        {
+          name  = "READ_CACHE_DISK_BYTES"
+          value = tostring(var.read_cache_disk_bytes)
+        },
+        {
+          name  = "APPEND_BUFFER_BYTES"
+          value = tostring(var.append_buffer_bytes)
+        },
+        {
+          name  = "APPEND_BUFFER_MAX_AGE_MS"
+          value = tostring(var.append_buffer_max_age_ms)
+        },
+        {
+          name  = "FILE_HANDLE_CACHE_SIZE"
+          value = tostring(var.file_handle_cache_size)
+        },
+        {
+          name  = "WRITE_MODE"
+          value = var.write_mode
+        },
+        {
+          name  = "GROUP_COMMIT_WINDOW_MS"
+          value = tostring(var.group_commit_window_ms)
         }
       ]
 
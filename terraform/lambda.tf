@@ -53,7 +53,11 @@ resource "aws_iam_role_policy" "lambda" {
           "ssm:PutParameter",
           "ssm:GetParameter"
         ]
-        Resource = aws_ssm_parameter.mount_targets.arn
+        Resource = [
+          aws_ssm_parameter.mount_targets.arn,
+          aws_ssm_parameter.invocation_lock.arn,
+          aws_ssm_parameter.subnet_inventory.arn
+        ]
       },
       {
         Effect = "Allow"
@@ -119,14 +123,17 @@ resource "aws_lambda_function" "file_monitor" {
   # Environment Variables
   environment {
     variables = {
-      TARGET_DIRECTORY      = "/mnt/efs"
-      FILE_COUNT_THRESHOLD  = var.file_count_threshold
-      EFS_FILE_SYSTEM_ID    = aws_efs_file_system.main.id
-      VPC_ID                = aws_vpc.main.id
-      SECURITY_GROUP_ID     = aws_security_group.efs.id
-      SSM_PARAMETER_NAME    = aws_ssm_parameter.mount_targets.name
-      ECS_CLUSTER_NAME      = aws_ecs_cluster.main.name
-      ECS_SERVICE_NAME      = aws_ecs_service.fargate.name
+      TARGET_DIRECTORY                = "/mnt/efs"
+      FILE_COUNT_THRESHOLD            = var.file_count_threshold
+      EFS_FILE_SYSTEM_ID              = aws_efs_file_system.main.id
+      VPC_ID                          = aws_vpc.main.id
+      SECURITY_GROUP_ID               = aws_security_group.efs.id
+      SSM_PARAMETER_NAME              = aws_ssm_parameter.mount_targets.name
+      ECS_CLUSTER_NAME                = aws_ecs_cluster.main.name
+      ECS_SERVICE_NAME                = aws_ecs_service.fargate.name
+      LOCK_PARAMETER_NAME             = aws_ssm_parameter.invocation_lock.name
+      LOCK_TTL_SECONDS                = 360
+      SUBNET_INVENTORY_PARAMETER_NAME = aws_ssm_parameter.subnet_inventory.name
     }
   }
 
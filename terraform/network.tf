@@ -28,8 +28,9 @@ resource "aws_subnet" "private" {
   availability_zone = var.availability_zones[count.index]
 
   tags = {
-    Name = "${var.project_name}-private-subnet-${count.index + 1}"
-    Tier = "Private"
+    Name                   = "${var.project_name}-private-subnet-${count.index + 1}"
+    Tier                   = "Private"
+    EfsMountTargetEligible = "true"
   }
 }
 
@@ -42,8 +43,9 @@ resource "aws_subnet" "public" {
   map_public_ip_on_launch = true
 
   tags = {
-    Name = "${var.project_name}-public-subnet-${count.index + 1}"
-    Tier = "Public"
+    Name                   = "${var.project_name}-public-subnet-${count.index + 1}"
+    Tier                   = "Public"
+    EfsMountTargetEligible = "false"
   }
 }
 
@@ -26,3 +26,47 @@ resource "aws_ssm_parameter" "mount_targets" {
     ignore_changes = [value]
   }
 }
+
+# SSM Parameter used as the Lambda invocation lock (lease record with fencing token)
+resource "aws_ssm_parameter" "invocation_lock" {
+  name        = "/${var.project_name}/invocation-lock"
+  description = "Invocation lock lease for the file monitor Lambda"
+  type        = "String"
+  value       = jsonencode({ owner = null, expires_at = 0 })
+
+  tags = {
+    Name = "${var.project_name}-invocation-lock"
+  }
+
+  lifecycle {
+    ignore_changes = [value]
+  }
+}
+
+# SSM Parameter for the AZ-to-subnet inventory
+# Published at deploy time so the Lambda function does not describe the whole VPC
+# on every scale-out. Only subnets tagged EfsMountTargetEligible = "true" are used.
+resource "aws_ssm_parameter" "subnet_inventory" {
+  name        = "/${var.project_name}/subnet-inventory"
+  description = "AZ-to-subnet inventory for EFS mount target placement"
+  type        = "String"
+
+  value = jsonencode({
+    vpc_id = aws_vpc.main.id
+    availability_zones = {
+      for az in var.availability_zones : az => [
+        for subnet in concat(aws_subnet.private, aws_subnet.public) : {
+          subnet_id = subnet.id
+          tags = {
+            Tier                   = subnet.tags["Tier"]
+            EfsMountTargetEligible = subnet.tags["EfsMountTargetEligible"]
+          }
+        } if subnet.availability_zone == az
+      ]
+    }
+  })
+
+  tags = {
+    Name = "${var.project_name}-subnet-inventory"
+  }
+}
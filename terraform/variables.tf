@@ -66,6 +66,96 @@ variable "fargate_desired_count" {
   default     = 2
 }
 
+variable "path_hash_function" {
+  description = "Hash function used by Fargate tasks to route file paths (sha256, blake2b, fnv1a, xxh64, xxh3)"
+  type        = string
+  default     = "sha256"
+}
+
+variable "routing_mode" {
+  description = "Routing mode used by Fargate tasks to pick a mount target (modulo, ring, rendezvous, jump)"
+  type        = string
+  default     = "modulo"
+}
+
+variable "routing_directory_depth" {
+  description = "Route on the first N directories of each path instead of the full path (0 disables directory affinity)"
+  type        = number
+  default     = 0
+}
+
+variable "path_cache_size" {
+  description = "Resolved-path LRU cache size per Fargate task (0 disables the cache)"
+  type        = number
+  default     = 0
+}
+
+variable "read_routing" {
+  description = "Read routing used by Fargate tasks (hash, least_loaded)"
+  type        = string
+  default     = "hash"
+}
+
+variable "known_directories_size" {
+  description = "Directories each Fargate task remembers as existing so writes skip makedirs (0 disables)"
+  type        = number
+  default     = 4096
+}
+
+variable "metadata_cache_ttl" {
+  description = "Seconds Fargate tasks reuse file_exists answers, at most the NFS acregmin of 3 (0 disables)"
+  type        = number
+  default     = 0
+}
+
+variable "read_cache_memory_bytes" {
+  description = "Memory budget of each Fargate task's read cache for small files (0 disables the tier)"
+  type        = number
+  default     = 0
+}
+
+variable "read_cache_disk_bytes" {
+  description = "Ephemeral storage budget of each Fargate task's read cache for larger files (0 disables the tier)"
+  type        = number
+  default     = 0
+}
+
+variable "append_buffer_bytes" {
+  description = "Queued bytes per file at which Fargate tasks flush buffered appends (0 disables write-behind)"
+  type        = number
+  default     = 0
+}
+
+variable "append_buffer_max_age_ms" {
+  description = "Milliseconds Fargate tasks may hold buffered appends before flushing them"
+  type        = number
+  default     = 200
+}
+
+variable "file_handle_cache_size" {
+  description = "Open files each Fargate task keeps for hot paths, capped at half of RLIMIT_NOFILE (0 disables)"
+  type        = number
+  default     = 0
+}
+
+variable "write_mode" {
+  description = "How Fargate tasks replace files (in_place, atomic: temp file, fsync and rename)"
+  type        = string
+  default     = "in_place"
+}
+
+variable "group_commit_window_ms" {
+  description = "Milliseconds atomic writes on the same mount wait to share one fsync (0 fsyncs immediately)"
+  type        = number
+  default     = 2
+}
+
+variable "aio_workers_per_mount" {
+  description = "Worker threads per mount point for the Fargate asyncio file API"
+  type        = number
+  default     = 4
+}
+
 variable "tags" {
   description = "Additional tags to apply to all resources"
   type        = map(string)
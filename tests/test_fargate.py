@@ -3,9 +3,19 @@ import pytest
 import sys
 import os
 import json
+import shutil
 import subprocess
+import ctypes
+import asyncio
+import threading
+import tracemalloc
+import errno
+import signal
+import time
+import builtins
 from unittest.mock import patch, MagicMock, call, mock_open
 from botocore.exceptions import ClientError
+from hypothesis import given, strategies as st
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -20,8 +30,100 @@ from fargate.app import (
     append_file,
     file_exists,
     delete_file,
-    get_file_path
+    get_file_path,
+    calculate_file_path_hash,
+    configure_hash_function,
+    get_hash_function,
+    register_hash_function,
+    configure_routing,
+    select_mount_target_index,
+    HashRing,
+    RendezvousRouter,
+    jump_consistent_hash,
+    MountRouter,
+    get_mount_router,
+    resolve_file_path,
+    PathCache,
+    configure_path_cache,
+    get_path_cache_stats,
+    route_batch,
+    configure_read_routing,
+    directory_routing_key,
+    AsyncFileAPI,
+    bulk_read,
+    bulk_write,
+    BulkResult,
+    BULK_WINDOW_PER_WORKER,
+    read_chunks,
+    write_stream,
+    NFS_IO_SIZE,
+    BufferPool,
+    read_into,
+    pooled_read,
+    map_file,
+    configure_known_directories,
+    get_known_directory_stats,
+    configure_write_mode,
+    get_durability_stats,
+    GroupCommitter,
+    configure_metadata_cache,
+    get_metadata_cache_stats,
+    ReadCache,
+    configure_read_cache,
+    get_read_cache_stats,
+    AppendBuffer,
+    configure_append_buffer,
+    flush_appends,
+    get_append_buffer_stats,
+    FileHandleCache,
+    configure_file_handle_cache,
+    get_file_handle_cache_stats,
+    HASH_FUNCTIONS
 )
+from fargate import app as app_module
+
+
+@pytest.fixture
+def tmp_mounts(tmp_path):
+    """Factory creating n mount point directories and their mounted list"""
+    def make(count):
+        mounted = []
+        for index in range(count):
+            mount_point = tmp_path / f"efs-{index}"
+            mount_point.mkdir()
+            mounted.append({
+                'index': index,
+                'mount_point': str(mount_point),
+                'mount_target_id': f"fsmt-{index}",
+                'ip_address': f"10.0.{index}.100"
+            })
+        return mounted
+    return make
+
+
+@pytest.fixture
+def router(tmp_mounts):
+    """Router over a single mount point; classes needing more override it"""
+    return MountRouter(tmp_mounts(1))
+
+
+@pytest.fixture(autouse=True)
+def restore_default_config():
+    """Put routing, caching, write settings and signal handlers back to their defaults after each test"""
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+    configure_hash_function('sha256')
+    configure_routing('modulo', directory_depth=0)
+    configure_read_routing('hash')
+    configure_path_cache(0)
+    configure_known_directories(4096)
+    configure_write_mode('in_place', 2)
+    configure_metadata_cache(0)
+    configure_read_cache(0, 0)
+    configure_append_buffer(0)
+    configure_file_handle_cache(0)
 
 
 class TestSSMParameterStoreRetrieval:
@@ -627,7 +729,7 @@ class TestFileAccessOperations:
             {'mount_target_id': 'fsmt-1', 'ip_address': '10.0.1.100', 'index': 0}
         ]
         
-        with patch('os.path.exists', return_value=True):
+        with patch('os.path.exists') as mock_exists:
             with patch('os.remove') as mock_remove:
                 # Act
                 result = delete_file('test.txt', mount_targets)
@@ -635,6 +737,7 @@ class TestFileAccessOperations:
                 # Assert
                 assert result is True
                 mock_remove.assert_called_once()
+                mock_exists.assert_not_called()
     
     def test_delete_file_not_exists(self):
         """Test deleting non-existent file"""
@@ -643,12 +746,13 @@ class TestFileAccessOperations:
             {'mount_target_id': 'fsmt-1', 'ip_address': '10.0.1.100', 'index': 0}
         ]
         
-        with patch('os.path.exists', return_value=False):
+        with patch('os.remove', side_effect=FileNotFoundError) as mock_remove:
             # Act
             result = delete_file('test.txt', mount_targets)
             
             # Assert
             assert result is False
+            mock_remove.assert_called_once()
     
     def test_delete_file_no_mount_targets(self):
         """Test deleting file with no mount targets"""
@@ -675,3 +779,1795 @@ class TestFileAccessOperations:
         
         # Assert - All paths should be identical
         assert path1 == path2 == path3
+
+
+class TestHashFunctionRegistry:
+    """Test the pluggable path hash registry"""
+    
+    def test_sha256_matches_legacy_hex_implementation(self):
+        """Test that the default hash keeps routing compatible with the hex-digest version"""
+        import hashlib
+        
+        for path in ['test.txt', 'data/a/b.bin', '日本語/ファイル.txt']:
+            legacy = int(hashlib.sha256(path.encode('utf-8')).hexdigest(), 16)
+            assert calculate_file_path_hash(path) == legacy
+    
+    def test_blake2b_returns_64_bit_key(self):
+        """Test that blake2b produces a 64-bit integer"""
+        import hashlib
+        
+        value = get_hash_function('blake2b')('test.txt')
+        
+        assert 0 <= value < 2 ** 64
+        assert value == int.from_bytes(hashlib.blake2b(b'test.txt', digest_size=8).digest(), 'big')
+    
+    def test_fnv1a_reference_vectors(self):
+        """Test FNV-1a 64 against published reference values"""
+        fnv1a = get_hash_function('fnv1a')
+        
+        assert fnv1a('') == 0xcbf29ce484222325
+        assert fnv1a('a') == 0xaf63dc4c8601ec8c
+        assert fnv1a('foobar') == 0x85944171f73967e8
+    
+    def test_configure_from_environment(self):
+        """Test that PATH_HASH_FUNCTION selects the hash used for routing"""
+        with patch.dict(os.environ, {'PATH_HASH_FUNCTION': 'blake2b'}):
+            assert configure_hash_function() == 'blake2b'
+        
+        assert calculate_file_path_hash('test.txt') == HASH_FUNCTIONS['blake2b']('test.txt')
+    
+    def test_unknown_hash_function(self):
+        """Test that an unknown hash name is rejected"""
+        with pytest.raises(ValueError, match="Unknown hash function"):
+            configure_hash_function('md5')
+    
+    def test_register_custom_hash_function(self):
+        """Test registering and selecting a custom hash function"""
+        register_hash_function('constant', lambda path: 7)
+        try:
+            configure_hash_function('constant')
+            assert get_file_path('anything.txt', [{}, {}, {}]) == '/mnt/efs-1/anything.txt'
+        finally:
+            del HASH_FUNCTIONS['constant']
+    
+    def test_xxhash_when_installed(self):
+        """Test the optional xxhash functions"""
+        xxhash = pytest.importorskip('xxhash')
+        
+        assert get_hash_function('xxh64')('test.txt') == xxhash.xxh64_intdigest(b'test.txt')
+
+
+class TestConsistentHashRing:
+    """Test consistent-hash ring routing"""
+    
+    PATHS = [f"data/{i % 50}/file-{i}.bin" for i in range(5000)]
+    
+    def _targets(self, count):
+        return [{'mount_target_id': f'fsmt-{i}', 'ip_address': f'10.0.{i}.100'} for i in range(count)]
+    
+    def test_adding_target_remaps_about_one_nth(self):
+        """Test that adding a fourth target moves roughly 1/4 of paths, all to the new target"""
+        before = HashRing(['fsmt-0', 'fsmt-1', 'fsmt-2'], virtual_nodes=200)
+        after = HashRing(['fsmt-0', 'fsmt-1', 'fsmt-2', 'fsmt-3'], virtual_nodes=200)
+        
+        moved = [p for p in self.PATHS if before.lookup(p) != after.lookup(p)]
+        
+        assert 0.15 < len(moved) / len(self.PATHS) < 0.35
+        assert all(after.lookup(p) == 3 for p in moved)
+    
+    def test_routing_is_keyed_by_id_not_position(self):
+        """Test that reordering the mount target list does not move paths"""
+        ring = HashRing(['fsmt-a', 'fsmt-b', 'fsmt-c'])
+        reordered = HashRing(['fsmt-c', 'fsmt-a', 'fsmt-b'])
+        
+        for path in self.PATHS[:500]:
+            assert ring.node_ids[ring.lookup(path)] == reordered.node_ids[reordered.lookup(path)]
+    
+    def test_lookup_wraps_around_the_ring(self):
+        """Test that a hash past the last ring point maps to the first point's owner"""
+        ring = HashRing(['fsmt-a', 'fsmt-b'], virtual_nodes=10)
+        
+        assert ring.lookup_hash(2 ** 256) == ring.lookup_hash(0)
+    
+    def test_ring_mode_in_get_file_path(self):
+        """Test that ring mode is used by get_file_path and stays stable when a target is appended"""
+        configure_routing('ring', virtual_nodes=150)
+        
+        three = self._targets(3)
+        four = self._targets(4)
+        moved = sum(get_file_path(p, three) != get_file_path(p, four) for p in self.PATHS)
+        
+        assert moved / len(self.PATHS) < 0.35
+        assert select_mount_target_index('test.txt', 3, ('fsmt-0', 'fsmt-1', 'fsmt-2')) in (0, 1, 2)
+    
+    def test_modulo_mode_remaps_most_paths(self):
+        """Test the baseline: modulo routing moves most paths when a target is added"""
+        three = self._targets(3)
+        four = self._targets(4)
+        moved = sum(get_file_path(p, three) != get_file_path(p, four) for p in self.PATHS)
+        
+        assert moved / len(self.PATHS) > 0.6
+    
+    def test_configure_routing_from_environment(self):
+        """Test ROUTING_MODE and RING_VIRTUAL_NODES configuration"""
+        with patch.dict(os.environ, {'ROUTING_MODE': 'ring', 'RING_VIRTUAL_NODES': '64'}):
+            assert configure_routing() == 'ring'
+        
+        with pytest.raises(ValueError, match="Unknown routing mode"):
+            configure_routing('random')
+        with pytest.raises(ValueError, match="virtual nodes"):
+            configure_routing('ring', virtual_nodes=0)
+
+
+class TestRendezvousRouting:
+    """Test weighted rendezvous (HRW) routing"""
+    
+    PATHS = [f"data/{i % 50}/file-{i}.bin" for i in range(6000)]
+    
+    def _owner(self, router, path):
+        return router.node_ids[router.lookup(path)]
+    
+    def test_adding_target_only_moves_keys_to_new_target(self):
+        """Test minimal disruption when a target is added"""
+        before = RendezvousRouter(['fsmt-0', 'fsmt-1', 'fsmt-2'])
+        after = RendezvousRouter(['fsmt-0', 'fsmt-1', 'fsmt-2', 'fsmt-3'])
+        
+        moved = [p for p in self.PATHS if self._owner(before, p) != self._owner(after, p)]
+        
+        assert 0.18 < len(moved) / len(self.PATHS) < 0.32
+        assert all(self._owner(after, p) == 'fsmt-3' for p in moved)
+    
+    def test_removing_target_only_moves_its_keys(self):
+        """Test minimal disruption when a target is removed"""
+        before = RendezvousRouter(['fsmt-0', 'fsmt-1', 'fsmt-2'])
+        after = RendezvousRouter(['fsmt-0', 'fsmt-2'])
+        
+        for path in self.PATHS[:1000]:
+            if self._owner(before, path) != 'fsmt-1':
+                assert self._owner(after, path) == self._owner(before, path)
+    
+    def test_weights_shift_share_proportionally(self):
+        """Test that a target with weight 2 receives about twice the keys"""
+        router = RendezvousRouter(['fsmt-0', 'fsmt-1', 'fsmt-2'], weights=[1, 2, 1])
+        
+        counts = [0, 0, 0]
+        for path in self.PATHS:
+            counts[router.lookup(path)] += 1
+        
+        assert 0.42 < counts[1] / len(self.PATHS) < 0.58
+    
+    def test_equal_weights_match_unweighted_routing(self):
+        """Test that explicit equal weights route exactly like the unweighted fast path"""
+        unweighted = RendezvousRouter(['fsmt-0', 'fsmt-1', 'fsmt-2'])
+        weighted = RendezvousRouter(['fsmt-0', 'fsmt-1', 'fsmt-2'], weights=[3, 3, 3])
+        weighted._weighted = True
+        
+        for path in self.PATHS[:1000]:
+            assert unweighted.lookup(path) == weighted.lookup(path)
+    
+    def test_invalid_weights(self):
+        """Test weight validation"""
+        with pytest.raises(ValueError, match="greater than 0"):
+            RendezvousRouter(['fsmt-0', 'fsmt-1'], weights=[1, 0])
+        with pytest.raises(ValueError, match="must match"):
+            RendezvousRouter(['fsmt-0', 'fsmt-1'], weights=[1])
+    
+    def test_rendezvous_mode_uses_ssm_weights(self):
+        """Test that get_file_path honours the weight field from the SSM document"""
+        configure_routing('rendezvous')
+        mount_targets = [
+            {'mount_target_id': 'fsmt-0', 'weight': 1},
+            {'mount_target_id': 'fsmt-1', 'weight': 3}
+        ]
+        
+        on_heavy = sum(get_file_path(p, mount_targets).startswith('/mnt/efs-1/') for p in self.PATHS)
+        
+        assert 0.65 < on_heavy / len(self.PATHS) < 0.85
+
+
+def reference_jump_consistent_hash(key, num_buckets):
+    """Line-by-line port of the C++ reference from Lamping & Veach using fixed-width integers"""
+    key = ctypes.c_uint64(key)
+    b = ctypes.c_int64(-1)
+    j = ctypes.c_int64(0)
+    while j.value < num_buckets:
+        b.value = j.value
+        key.value = key.value * 2862933555777941757 + 1
+        j.value = int((b.value + 1) * (float(1 << 31) / float((key.value >> 33) + 1)))
+    return b.value
+
+
+class TestJumpConsistentHash:
+    """Test jump consistent hash routing"""
+    
+    PATHS = [f"data/{i % 50}/file-{i}.bin" for i in range(6000)]
+    
+    @given(st.integers(min_value=0, max_value=2**64 - 1), st.integers(min_value=1, max_value=1000))
+    def test_matches_reference_implementation(self, key, num_buckets):
+        """Test against the reference algorithm for arbitrary 64-bit keys"""
+        assert jump_consistent_hash(key, num_buckets) == reference_jump_consistent_hash(key, num_buckets)
+    
+    def test_keys_wider_than_64_bits_are_truncated(self):
+        """Test that SHA-256 sized keys route on their low 64 bits"""
+        key = (123 << 64) | 456
+        assert jump_consistent_hash(key, 6) == jump_consistent_hash(456, 6)
+    
+    def test_appending_bucket_only_moves_keys_to_it(self):
+        """Test minimal remapping when a mount target is appended"""
+        for num_buckets in range(1, 6):
+            moved = 0
+            for path in self.PATHS:
+                key = calculate_file_path_hash(path)
+                before = jump_consistent_hash(key, num_buckets)
+                after = jump_consistent_hash(key, num_buckets + 1)
+                if before != after:
+                    assert after == num_buckets
+                    moved += 1
+            expected = 1 / (num_buckets + 1)
+            assert abs(moved / len(self.PATHS) - expected) < 0.05
+    
+    def test_invalid_bucket_count(self):
+        """Test that a non-positive bucket count is rejected"""
+        with pytest.raises(ValueError):
+            jump_consistent_hash(1, 0)
+    
+    @pytest.mark.parametrize("hash_name", ['sha256', 'blake2b', 'fnv1a'])
+    def test_jump_mode_routing(self, hash_name):
+        """Test jump mode through select_mount_target_index and get_file_path"""
+        configure_hash_function(hash_name)
+        configure_routing('jump')
+        mount_targets = [{'mount_target_id': f"fsmt-{i}"} for i in range(3)]
+        
+        for path in self.PATHS[:200]:
+            index = jump_consistent_hash(calculate_file_path_hash(path), 3)
+            assert select_mount_target_index(path, 3) == index
+            assert get_file_path(path, mount_targets) == f"/mnt/efs-{index}/{path}"
+
+
+class TestMountRouter:
+    """Test the precomputed MountRouter and the wrappers built on it"""
+    
+    PATHS = [f"data/{i % 50}/file-{i}.bin" for i in range(500)] + ['/abs/path.txt', '//double.txt', '']
+    MOUNT_TARGETS = [{'mount_target_id': f"fsmt-{i}", 'weight': i + 1} for i in range(4)]
+    
+    @pytest.mark.parametrize("mode", ['modulo', 'ring', 'rendezvous', 'jump'])
+    def test_route_matches_free_functions(self, mode):
+        """Test that route() agrees with select_mount_target_index + resolve_file_path"""
+        configure_routing(mode)
+        router = MountRouter(self.MOUNT_TARGETS)
+        ids = tuple(mt['mount_target_id'] for mt in self.MOUNT_TARGETS)
+        weights = tuple(mt['weight'] for mt in self.MOUNT_TARGETS)
+        
+        for path in self.PATHS:
+            index = select_mount_target_index(path, 4, ids, weights)
+            assert router.route(path) == resolve_file_path(path, index)
+            assert router.route(path) == get_file_path(path, self.MOUNT_TARGETS)
+        assert router.route_many(self.PATHS) == [router.route(p) for p in self.PATHS]
+    
+    def test_prefixes_are_precomputed(self):
+        """Test the precomputed prefix tuple and slot-only instances"""
+        router = MountRouter(self.MOUNT_TARGETS, mode='jump')
+        
+        assert router.prefixes == ('/mnt/efs-0/', '/mnt/efs-1/', '/mnt/efs-2/', '/mnt/efs-3/')
+        assert router.route('/a/b.txt').endswith('/a/b.txt')
+        assert not hasattr(router, '__dict__')
+    
+    def test_router_keeps_configuration_it_was_built_with(self):
+        """Test that a held router is not affected by later configure_routing calls"""
+        router = MountRouter(self.MOUNT_TARGETS, mode='ring')
+        expected = router.route_many(self.PATHS)
+        
+        configure_routing('jump')
+        
+        assert router.mode == 'ring'
+        assert router.route_many(self.PATHS) == expected
+    
+    def test_get_mount_router_reuses_instances(self):
+        """Test that wrappers share one router per mount target set and configuration"""
+        configure_routing('ring')
+        router = get_mount_router(self.MOUNT_TARGETS)
+        
+        assert get_mount_router(list(self.MOUNT_TARGETS)) is router
+        assert get_mount_router(router) is router
+        assert get_mount_router(self.MOUNT_TARGETS[:3]) is not router
+        
+        configure_routing('modulo')
+        assert get_mount_router(self.MOUNT_TARGETS) is not router
+    
+    def test_file_operations_accept_router(self):
+        """Test that file helpers accept a MountRouter in place of the mount target list"""
+        router = MountRouter(self.MOUNT_TARGETS)
+        
+        with patch('builtins.open', mock_open(read_data='content')) as mocked_open:
+            assert read_file('test.txt', router) == 'content'
+            mocked_open.assert_called_once_with(router.route('test.txt'), 'r', encoding='utf-8')
+    
+    def test_invalid_configuration(self):
+        """Test validation of empty lists and unknown modes"""
+        with pytest.raises(ValueError, match="No mount targets available"):
+            MountRouter([])
+        with pytest.raises(ValueError, match="Unknown routing mode"):
+            MountRouter(self.MOUNT_TARGETS, mode='random')
+
+
+class TestPathCache:
+    """Test the resolved-path LRU cache"""
+    
+    MOUNT_TARGETS = [{'mount_target_id': f"fsmt-{i}"} for i in range(3)]
+    
+    def test_lru_eviction_and_counters(self):
+        """Test LRU order, eviction and hit/miss counters"""
+        cache = PathCache(2)
+        cache.put('a', '/mnt/efs-0/a')
+        cache.put('b', '/mnt/efs-1/b')
+        
+        assert cache.get('a') == '/mnt/efs-0/a'
+        cache.put('c', '/mnt/efs-2/c')
+        
+        assert cache.get('b') is None
+        assert cache.get('c') == '/mnt/efs-2/c'
+        assert cache.stats() == {
+            'hits': 2, 'misses': 1, 'evictions': 1, 'size': 2, 'maxsize': 2, 'hit_rate': 2 / 3
+        }
+    
+    def test_cached_router_matches_uncached(self):
+        """Test that caching does not change routing results"""
+        paths = [f"dir/{i % 7}/file-{i}" for i in range(300)]
+        uncached = MountRouter(self.MOUNT_TARGETS, mode='ring', cache_size=0)
+        cached = MountRouter(self.MOUNT_TARGETS, mode='ring', cache_size=100)
+        
+        assert cached.route_many(paths + paths) == uncached.route_many(paths + paths)
+        assert uncached.cache_stats() is None
+        stats = cached.cache_stats()
+        assert stats['size'] == 100
+        assert stats['evictions'] == 500
+    
+    def test_repeated_paths_hit_cache(self):
+        """Test that repeated lookups are served from the cache"""
+        router = MountRouter(self.MOUNT_TARGETS, cache_size=10)
+        
+        with patch.object(router, '_hash', wraps=router._hash) as hash_spy:
+            for _ in range(5):
+                router.route('hot/file.txt')
+        
+        assert hash_spy.call_count == 1
+        assert router.cache_stats()['hits'] == 4
+    
+    def test_cache_kept_when_alternating_mount_sets(self):
+        """Test that each mount target list keeps its cached paths when get_file_path switches lists"""
+        configure_path_cache(100)
+        configure_routing('ring')
+        grown = self.MOUNT_TARGETS + [{'mount_target_id': 'fsmt-3'}]
+        
+        for _ in range(3):
+            get_file_path('a.txt', self.MOUNT_TARGETS)
+            get_file_path('a.txt', grown)
+        
+        assert get_path_cache_stats() == get_mount_router(grown).cache_stats()
+        for mount_targets in (self.MOUNT_TARGETS, grown):
+            stats = get_mount_router(mount_targets).cache_stats()
+            assert (stats['misses'], stats['hits'], stats['size']) == (1, 2, 1)
+    
+    def test_configure_path_cache_from_environment(self):
+        """Test PATH_CACHE_SIZE parsing"""
+        with patch.dict(os.environ, {'PATH_CACHE_SIZE': '5000'}):
+            assert configure_path_cache() == 5000
+        assert MountRouter(self.MOUNT_TARGETS).cache.maxsize == 5000
+        
+        with patch.dict(os.environ, {'PATH_CACHE_SIZE': 'big'}):
+            with pytest.raises(ValueError, match="PATH_CACHE_SIZE"):
+                configure_path_cache()
+        with pytest.raises(ValueError):
+            configure_path_cache(-1)
+
+
+class TestBatchRouting:
+    """Test route_batch grouping and the NumPy / pure-Python index paths"""
+    
+    PATHS = [f"batch/{i % 31}/item-{i}.dat" for i in range(2000)] + ['/leading/slash.txt']
+    MOUNT_TARGETS = [{'mount_target_id': f"fsmt-{i}"} for i in range(5)]
+    
+    def _expected_groups(self, router):
+        groups = {}
+        for path in self.PATHS:
+            complete_path = router.route(path)
+            groups.setdefault(complete_path[:complete_path.index('/', len('/mnt/'))], []).append(complete_path)
+        return groups
+    
+    @pytest.mark.parametrize("hash_name", ['sha256', 'blake2b', 'fnv1a'])
+    @pytest.mark.parametrize("mode", ['modulo', 'ring', 'rendezvous', 'jump'])
+    def test_route_batch_matches_route(self, mode, hash_name):
+        """Test that batch routing groups exactly what route() would return"""
+        configure_hash_function(hash_name)
+        configure_routing(mode)
+        router = MountRouter(self.MOUNT_TARGETS)
+        expected = self._expected_groups(router)
+        
+        assert router.route_batch(self.PATHS) == expected
+        assert route_batch(iter(self.PATHS), self.MOUNT_TARGETS) == expected
+        
+        with patch('fargate.app.np', None):
+            assert router.route_batch(self.PATHS) == expected
+    
+    def test_weighted_rendezvous_batch(self):
+        """Test that weighted rendezvous batches agree with per-path routing"""
+        mount_targets = [{'mount_target_id': f"fsmt-{i}", 'weight': i + 1} for i in range(3)]
+        router = MountRouter(mount_targets, mode='rendezvous')
+        
+        hashes = [calculate_file_path_hash(p) for p in self.PATHS]
+        assert router.select_batch(hashes) == [router.select(p) for p in self.PATHS]
+    
+    def test_numpy_indices_are_exact(self):
+        """Test the vectorized selectors against the scalar ones on 64-bit hashes"""
+        pytest.importorskip('numpy')
+        from fargate.app import _select_batch_numpy
+        
+        configure_hash_function('blake2b')
+        hashes = [calculate_file_path_hash(p) for p in self.PATHS]
+        for mode in ('modulo', 'ring', 'rendezvous', 'jump'):
+            router = MountRouter(self.MOUNT_TARGETS, mode=mode)
+            indices = _select_batch_numpy(router, hashes)
+            assert indices is not None
+            assert indices.tolist() == [router._select(h) for h in hashes]
+    
+    def test_empty_batch(self):
+        """Test batches with no paths and with no mount targets"""
+        assert MountRouter(self.MOUNT_TARGETS).route_batch([]) == {}
+        with pytest.raises(ValueError, match="No mount targets available"):
+            route_batch(['a.txt'], [])
+
+
+class TestHealthAwareRouting:
+    """Test routing to live mount points and failover between mount targets"""
+    
+    PATHS = [f"health/{i % 17}/obj-{i}" for i in range(1500)]
+    
+    def test_routes_only_to_successful_mounts(self):
+        """Test that a target skipped by mount_nfs_targets never receives traffic"""
+        successfully_mounted = [
+            {'index': 0, 'mount_point': '/mnt/efs-0', 'mount_target_id': 'fsmt-0', 'ip_address': '10.0.0.100'},
+            {'index': 2, 'mount_point': '/mnt/efs-2', 'mount_target_id': 'fsmt-2', 'ip_address': '10.0.2.100'}
+        ]
+        
+        for mode in ('modulo', 'ring', 'rendezvous', 'jump'):
+            configure_routing(mode)
+            used = {get_file_path(p, successfully_mounted).split('/')[2] for p in self.PATHS}
+            assert used == {'efs-0', 'efs-2'}
+    
+    @pytest.mark.parametrize("mode", ['modulo', 'ring', 'rendezvous', 'jump'])
+    def test_failover_only_moves_keys_of_unhealthy_target(self, mode):
+        """Test that marking a target unhealthy leaves every other key in place"""
+        mount_targets = [{'mount_target_id': f"fsmt-{i}"} for i in range(4)]
+        router = MountRouter(mount_targets, mode=mode)
+        before = [router.select(p) for p in self.PATHS]
+        
+        assert router.mark_unhealthy(1)
+        after = [router.select(p) for p in self.PATHS]
+        
+        for old, new in zip(before, after):
+            if old == 1:
+                assert new != 1
+            else:
+                assert new == old
+        # Failed-over keys are spread over the remaining targets, not piled on one
+        assert len({new for old, new in zip(before, after) if old == 1}) == 3
+        batch = router.route_batch(self.PATHS)
+        assert '/mnt/efs-1' not in batch
+        assert sorted(sum(batch.values(), [])) == sorted(router.route_many(self.PATHS))
+        
+        assert router.health() == {'fsmt-0': True, 'fsmt-1': False, 'fsmt-2': True, 'fsmt-3': True}
+        assert router.mark_healthy(1)
+        assert [router.select(p) for p in self.PATHS] == before
+    
+    def test_all_unhealthy_keeps_primary(self):
+        """Test that routing still returns a path when every target is unhealthy"""
+        router = MountRouter([{'mount_target_id': 'fsmt-0'}, {'mount_target_id': 'fsmt-1'}], mode='ring')
+        expected = router.route_many(self.PATHS)
+        router.mark_unhealthy(0)
+        router.mark_unhealthy(1)
+        
+        assert router.route_many(self.PATHS) == expected
+        with pytest.raises(ValueError):
+            router.mark_unhealthy(2)
+    
+    def test_health_change_flushes_path_cache(self):
+        """Test that cached paths are not served for an unhealthy target"""
+        router = MountRouter([{'mount_target_id': f"fsmt-{i}"} for i in range(3)], cache_size=100)
+        path = next(p for p in self.PATHS if router.select(p) == 0)
+        router.route(path)
+        
+        router.mark_unhealthy(0)
+        
+        assert not router.route(path).startswith('/mnt/efs-0/')
+    
+    def test_check_health_probes_mount_points(self, tmp_mounts, tmp_path):
+        """Test that check_health marks failing mount points unhealthy and recovers them"""
+        router = MountRouter(tmp_mounts(3))
+        failing = {str(tmp_path / 'efs-1')}
+        
+        def probe(mount_point):
+            if mount_point in failing:
+                raise OSError(errno.ESTALE, 'Stale file handle')
+        
+        assert router.check_health(probe) == {'fsmt-0': True, 'fsmt-1': False, 'fsmt-2': True}
+        failing.clear()
+        assert router.check_health(probe) == {'fsmt-0': True, 'fsmt-1': True, 'fsmt-2': True}
+    
+    def test_read_and_write_fail_over_on_mount_failure(self, tmp_mounts, tmp_path):
+        """Test that file operations retry on the next candidate after ESTALE"""
+        mounted = tmp_mounts(3)
+        router = MountRouter(mounted)
+        path = next(p for p in self.PATHS if router.select(p) == 1)
+        bad_prefix = str(tmp_path / 'efs-1')
+        real_open = builtins.open
+        
+        def flaky_open(file, *args, **kwargs):
+            if str(file).startswith(bad_prefix):
+                raise OSError(errno.ESTALE, 'Stale file handle')
+            return real_open(file, *args, **kwargs)
+        
+        with patch('builtins.open', side_effect=flaky_open):
+            written = write_file(path, 'payload', router)
+            assert not written.startswith(bad_prefix)
+            assert read_file(path, router) == 'payload'
+        
+        assert router.health()['fsmt-1'] is False
+    
+    @staticmethod
+    def _join_probes():
+        for thread in threading.enumerate():
+            if thread.name.startswith('health-'):
+                thread.join(5)
+    
+    def test_unhealthy_target_is_probed_and_recovers(self, tmp_mounts):
+        """Test that traffic returns to a failed mount once its probation ends and a probe succeeds"""
+        router = MountRouter(tmp_mounts(3), health_retry_seconds=0)
+        path = next(p for p in self.PATHS if router.select(p) == 1)
+        router.mark_unhealthy(1)
+        
+        with patch('os.statvfs', side_effect=OSError(errno.EIO, 'I/O error')):
+            assert '/efs-1/' not in router.route(path)
+            self._join_probes()
+        assert router.health()['fsmt-1'] is False
+        
+        router.route(path)
+        self._join_probes()
+        assert router.health()['fsmt-1'] is True
+        assert '/efs-1/' in router.route(path)
+    
+    def test_no_probe_during_probation(self, tmp_mounts):
+        """Test that an unhealthy mount is not probed before health_retry_seconds"""
+        router = MountRouter(tmp_mounts(2), health_retry_seconds=60)
+        path = next(p for p in self.PATHS if router.select(p) == 1)
+        router.mark_unhealthy(1)
+        
+        with patch('os.statvfs') as statvfs:
+            for _ in range(10):
+                assert '/efs-1/' not in router.route(path)
+            self._join_probes()
+        
+        statvfs.assert_not_called()
+        assert router.health()['fsmt-1'] is False
+    
+    def test_file_errors_do_not_fail_over(self, tmp_mounts):
+        """Test that ordinary file errors are raised without marking the mount unhealthy"""
+        router = MountRouter(tmp_mounts(2))
+        
+        with pytest.raises(FileNotFoundError):
+            read_file('missing.txt', router)
+        
+        assert all(router.health().values())
+
+
+class TestLeastLoadedReads:
+    """Test power-of-two-choices read routing"""
+    
+    PATHS = [f"reads/{i % 13}/blob-{i}" for i in range(800)]
+    MOUNT_TARGETS = [{'mount_target_id': f"fsmt-{i}"} for i in range(4)]
+    
+    def _second_candidate(self, router, path):
+        hash_value = calculate_file_path_hash(path)
+        primary = router.select(path)
+        return next(c for c in router._candidates(hash_value) if c != primary)
+    
+    @pytest.mark.parametrize("mode", ['modulo', 'ring', 'rendezvous', 'jump'])
+    def test_idle_router_reads_from_hash_target(self, mode):
+        """Test that reads stay on the hash-selected target while loads are equal"""
+        router = MountRouter(self.MOUNT_TARGETS, mode=mode)
+        
+        assert [router.select_read(p) for p in self.PATHS] == [router.select(p) for p in self.PATHS]
+    
+    def test_busy_target_sheds_reads_to_second_candidate(self):
+        """Test that reads move to the second candidate while the primary is busy"""
+        router = MountRouter(self.MOUNT_TARGETS, mode='rendezvous')
+        on_zero = [p for p in self.PATHS if router.select(p) == 0]
+        
+        with router.track(0), router.track(0):
+            for path in on_zero:
+                assert router.select_read(path) == self._second_candidate(router, path)
+            # Writes stay pinned
+            assert all(router.route(p).startswith('/mnt/efs-0/') for p in on_zero)
+        
+        assert router.load()['fsmt-0']['in_flight'] == 0
+    
+    def test_latency_ewma_steers_reads(self):
+        """Test that a slow target loses reads to a fast one"""
+        router = MountRouter(self.MOUNT_TARGETS, mode='modulo')
+        clock = iter([0.0, 0.5, 1.0, 1.001])
+        with patch('fargate.app.time.perf_counter', side_effect=lambda: next(clock)):
+            with router.track(0):
+                pass
+            with router.track(1):
+                pass
+        
+        load = router.load()
+        assert load['fsmt-0'] == {'in_flight': 0, 'latency_ewma_ms': 500.0}
+        assert load['fsmt-1']['latency_ewma_ms'] == pytest.approx(1.0)
+        path = next(p for p in self.PATHS if router.select(p) == 0 and self._second_candidate(router, p) == 1)
+        assert router.select_read(path) == 1
+    
+    def test_unhealthy_targets_are_not_read_candidates(self):
+        """Test that least-loaded reads never pick an unhealthy target"""
+        router = MountRouter(self.MOUNT_TARGETS, mode='ring')
+        router.mark_unhealthy(2)
+        with router.track(0), router.track(1), router.track(3):
+            assert all(router.select_read(p) != 2 for p in self.PATHS)
+    
+    def test_read_file_uses_read_routing(self, tmp_path):
+        """Test that read_file follows READ_ROUTING and tracks in-flight operations"""
+        mounted = []
+        for index in range(2):
+            (tmp_path / f"efs-{index}").mkdir()
+            (tmp_path / f"efs-{index}" / 'shared.txt').write_text(f"via {index}")
+            mounted.append({'mount_point': str(tmp_path / f"efs-{index}"), 'mount_target_id': f"fsmt-{index}"})
+        router = MountRouter(mounted, mode='modulo')
+        primary = router.select('shared.txt')
+        
+        configure_read_routing('least_loaded')
+        with router.track(primary), router.track(primary):
+            assert read_file('shared.txt', router) == f"via {1 - primary}"
+        
+        configure_read_routing('hash')
+        with router.track(primary), router.track(primary):
+            assert read_file('shared.txt', router) == f"via {primary}"
+        
+        assert all(state['in_flight'] == 0 for state in router.load().values())
+    
+    def test_invalid_read_routing(self):
+        """Test READ_ROUTING validation"""
+        with patch.dict(os.environ, {'READ_ROUTING': 'least_loaded'}):
+            assert configure_read_routing() == 'least_loaded'
+        with pytest.raises(ValueError, match="Unknown read routing mode"):
+            configure_read_routing('random')
+
+
+class TestDirectoryAffinityRouting:
+    """Test routing on a directory prefix"""
+    
+    MOUNT_TARGETS = [{'mount_target_id': f"fsmt-{i}"} for i in range(4)]
+    
+    @pytest.mark.parametrize("path,depth,expected", [
+        ('data/2024/01/a.bin', 2, 'data/2024'),
+        ('/data/2024/01/a.bin', 2, 'data/2024'),
+        ('data/2024/a.bin', 2, 'data/2024'),
+        ('data/a.bin', 2, 'data/a.bin'),
+        ('/a.bin', 2, 'a.bin'),
+        ('data/2024/01/a.bin', 1, 'data'),
+        ('data/2024/01/a.bin', 0, 'data/2024/01/a.bin')
+    ])
+    def test_directory_routing_key(self, path, depth, expected):
+        """Test directory prefix extraction"""
+        assert directory_routing_key(path, depth) == expected
+    
+    @pytest.mark.parametrize("mode", ['modulo', 'ring', 'rendezvous', 'jump'])
+    def test_files_of_a_directory_share_a_mount(self, mode):
+        """Test that every file under one prefix routes to the same mount target"""
+        router = MountRouter(self.MOUNT_TARGETS, mode=mode, directory_depth=2)
+        
+        for tenant in range(20):
+            targets = {router.select(f"tenant-{tenant}/batch/sub-{i}/f-{i}.bin") for i in range(30)}
+            assert len(targets) == 1
+            assert router.select(f"tenant-{tenant}/batch/x") == targets.pop()
+        
+        routed = router.route('/tenant-1/batch/sub-2/f.bin')
+        assert routed.endswith('/tenant-1/batch/sub-2/f.bin')
+    
+    def test_files_above_the_depth_are_spread(self):
+        """Test that files with fewer than N leading directories do not all share one mount"""
+        router = MountRouter(self.MOUNT_TARGETS, directory_depth=2)
+        
+        assert len({router.select(f"f-{i}.bin") for i in range(100)}) == len(self.MOUNT_TARGETS)
+        assert len({router.select(f"top/f-{i}.bin") for i in range(100)}) == len(self.MOUNT_TARGETS)
+    
+    def test_batch_and_cache_follow_directory_key(self):
+        """Test that batch routing and the path cache agree with route()"""
+        paths = [f"tenant-{i % 9}/batch-{i % 4}/f-{i}" for i in range(500)]
+        router = MountRouter(self.MOUNT_TARGETS, mode='ring', directory_depth=1, cache_size=50)
+        expected = router.route_many(paths)
+        
+        batch = router.route_batch(paths)
+        
+        assert sorted(sum(batch.values(), [])) == sorted(expected)
+    
+    def test_configured_depth_applies_to_get_file_path(self):
+        """Test ROUTING_DIRECTORY_DEPTH through get_file_path"""
+        with patch.dict(os.environ, {'ROUTING_MODE': 'jump', 'ROUTING_DIRECTORY_DEPTH': '1'}):
+            configure_routing()
+        
+        mount_points = {get_file_path(f"shared/{i}/f.txt", self.MOUNT_TARGETS).split('/')[2] for i in range(50)}
+        assert len(mount_points) == 1
+    
+    def test_invalid_directory_depth(self):
+        """Test ROUTING_DIRECTORY_DEPTH validation"""
+        with patch.dict(os.environ, {'ROUTING_DIRECTORY_DEPTH': 'deep'}):
+            with pytest.raises(ValueError, match="ROUTING_DIRECTORY_DEPTH"):
+                configure_routing('modulo')
+        with pytest.raises(ValueError):
+            configure_routing('modulo', directory_depth=-1)
+
+
+class TestAsyncFileAPI:
+    """Test the asyncio file API and its per-mount executors"""
+    
+    @pytest.fixture
+    def mounted(self, tmp_mounts):
+        return tmp_mounts(2)
+    
+    @pytest.fixture
+    def api(self):
+        api = AsyncFileAPI(max_workers_per_mount=1)
+        yield api
+        api.shutdown(wait=False)
+    
+    @staticmethod
+    def _path_on(router, index, prefix='file'):
+        return next(f"{prefix}-{i}.txt" for i in range(1000) if router.select(f"{prefix}-{i}.txt") == index)
+    
+    def test_round_trip_matches_sync_routing(self, api, mounted):
+        """Test write, append, read, exists and delete through the aio API"""
+        async def scenario():
+            written = await api.write_file('dir/a.txt', 'hello', mounted)
+            await api.append_file('dir/a.txt', ' world', mounted)
+            content = await api.read_file('dir/a.txt', mounted)
+            exists = await api.file_exists('dir/a.txt', mounted)
+            deleted = await api.delete_file('dir/a.txt', mounted)
+            return written, content, exists, deleted, await api.file_exists('dir/a.txt', mounted)
+        
+        written, content, exists, deleted, exists_after = asyncio.run(scenario())
+        
+        assert written == get_file_path('dir/a.txt', mounted)
+        assert content == 'hello world'
+        assert (exists, deleted, exists_after) == (True, True, False)
+        assert asyncio.run(api.file_exists('dir/a.txt', [])) is False
+    
+    def test_calls_run_on_the_selected_mounts_pool(self, api, mounted):
+        """Test that each call runs on the thread pool of its mount point"""
+        router = MountRouter(mounted)
+        threads = {}
+        real_open = builtins.open
+        
+        def recording_open(file, *args, **kwargs):
+            threads[os.path.basename(os.path.dirname(file))] = threading.current_thread().name
+            return real_open(file, *args, **kwargs)
+        
+        with patch('builtins.open', side_effect=recording_open):
+            asyncio.run(api.write_file(self._path_on(router, 0), 'x', router))
+            asyncio.run(api.write_file(self._path_on(router, 1), 'x', router))
+        
+        assert threads['efs-0'].startswith('aio-efs-0')
+        assert threads['efs-1'].startswith('aio-efs-1')
+    
+    def test_slow_mount_does_not_starve_others(self, api, mounted):
+        """Test that a blocked mount target does not delay calls for another mount"""
+        router = MountRouter(mounted)
+        slow_path = self._path_on(router, 0)
+        fast_path = self._path_on(router, 1)
+        release = threading.Event()
+        real_open = builtins.open
+        
+        def blocking_open(file, *args, **kwargs):
+            if file.startswith(router.prefixes[0]):
+                release.wait(5)
+            return real_open(file, *args, **kwargs)
+        
+        async def scenario():
+            slow = asyncio.ensure_future(api.write_file(slow_path, 'slow', router))
+            fast = await api.write_file(fast_path, 'fast', router, timeout=2)
+            assert not slow.done()
+            release.set()
+            await slow
+            return fast
+        
+        with patch('builtins.open', side_effect=blocking_open):
+            assert asyncio.run(scenario()) == router.route(fast_path)
+    
+    def test_timeout_and_cancellation_drop_queued_calls(self, api, mounted):
+        """Test that a timed-out call queued behind a busy worker never runs"""
+        router = MountRouter(mounted)
+        first = self._path_on(router, 0, 'first')
+        queued = self._path_on(router, 0, 'queued')
+        release = threading.Event()
+        opened = []
+        real_open = builtins.open
+        
+        def blocking_open(file, *args, **kwargs):
+            opened.append(file)
+            if file.endswith(first):
+                release.wait(5)
+            return real_open(file, *args, **kwargs)
+        
+        async def scenario():
+            running = asyncio.ensure_future(api.write_file(first, '1', router))
+            await asyncio.sleep(0.05)
+            with pytest.raises(asyncio.TimeoutError):
+                await api.write_file(queued, '2', router, timeout=0.05)
+            release.set()
+            await running
+        
+        with patch('builtins.open', side_effect=blocking_open):
+            asyncio.run(scenario())
+            api.shutdown()
+        
+        assert opened == [router.route(first)]
+    
+    def test_workers_per_mount_configuration(self):
+        """Test AIO_WORKERS_PER_MOUNT parsing"""
+        api = AsyncFileAPI()
+        with patch.dict(os.environ, {'AIO_WORKERS_PER_MOUNT': '8'}):
+            assert api.configure() == 8
+        with patch.dict(os.environ, {'AIO_WORKERS_PER_MOUNT': 'many'}):
+            with pytest.raises(ValueError, match="AIO_WORKERS_PER_MOUNT"):
+                api.configure()
+        with pytest.raises(ValueError):
+            AsyncFileAPI(0)
+
+
+class TestBulkOperations:
+    """Test bulk_read / bulk_write fan-out"""
+    
+    @pytest.fixture
+    def router(self, tmp_mounts):
+        return MountRouter(tmp_mounts(3))
+    
+    def test_bulk_write_then_read(self, router):
+        """Test that every item is written and read back through its routed mount"""
+        items = {f"bulk/{i}.txt": f"content-{i}" for i in range(60)}
+        
+        written = list(bulk_write(items.items(), router, concurrency=4))
+        read = {r.path: r.result for r in bulk_read(items, router, concurrency=4)}
+        
+        assert sorted(r.path for r in written) == sorted(items)
+        assert all(r.error is None and r.result == router.route(r.path) for r in written)
+        assert read == items
+    
+    def test_errors_are_reported_per_item(self, router):
+        """Test that a failing item does not abort the batch"""
+        write_file('present.txt', 'ok', router)
+        
+        results = {r.path: r for r in bulk_read(['present.txt', 'missing.txt'], router)}
+        
+        assert results['present.txt'] == BulkResult('present.txt', 'ok', None)
+        assert results['missing.txt'].result is None
+        assert isinstance(results['missing.txt'].error, FileNotFoundError)
+    
+    def test_results_stream_in_completion_order(self, router):
+        """Test that fast items are yielded before a slow one finishes"""
+        for i in range(5):
+            write_file(f"item-{i}", str(i), router)
+        slow = 'item-0'
+        release = threading.Event()
+        real_open = builtins.open
+        
+        def slow_open(file, *args, **kwargs):
+            if file.endswith('/' + slow):
+                release.wait(5)
+            return real_open(file, *args, **kwargs)
+        
+        with patch('builtins.open', side_effect=slow_open):
+            results = bulk_read([f"item-{i}" for i in range(5)], router, concurrency=2)
+            first_four = [next(results).path for _ in range(4)]
+            release.set()
+            last = next(results)
+        
+        assert slow not in first_four
+        assert last.path == slow
+    
+    def test_work_runs_on_per_mount_pools(self, router):
+        """Test that each item runs on the pool of its routed mount target"""
+        threads = {}
+        real_open = builtins.open
+        
+        def recording_open(file, *args, **kwargs):
+            threads[file] = threading.current_thread().name
+            return real_open(file, *args, **kwargs)
+        
+        items = [(f"f-{i}", 'x') for i in range(30)]
+        with patch('builtins.open', side_effect=recording_open):
+            list(bulk_write(items, router))
+        
+        for file, thread_name in threads.items():
+            mount = os.path.basename(os.path.dirname(file))
+            assert thread_name.startswith(f"bulk-{mount}")
+    
+    def test_least_loaded_reads_run_on_the_selected_pool(self, router):
+        """Test that a least_loaded read goes through the mount whose pool runs it"""
+        for prefix in router.prefixes:
+            for i in range(12):
+                with open(f"{prefix}r-{i}", 'w') as f:
+                    f.write('x')
+        configure_read_routing('least_loaded')
+        threads = {}
+        real_open = builtins.open
+        
+        def recording_open(file, *args, **kwargs):
+            threads[file] = threading.current_thread().name
+            return real_open(file, *args, **kwargs)
+        
+        # Every selection differs from the previous one, as shifting load would make it
+        selections = iter(range(1000))
+        with patch.object(MountRouter, 'select_read', lambda self, path: next(selections) % 3), \
+                patch('builtins.open', side_effect=recording_open):
+            results = list(bulk_read([f"r-{i}" for i in range(12)], router))
+        
+        assert all(r.error is None for r in results)
+        assert len(threads) == 12
+        for file, thread_name in threads.items():
+            mount = os.path.basename(os.path.dirname(file))
+            assert thread_name.startswith(f"bulk-{mount}")
+    
+    def test_invalid_arguments(self, router):
+        """Test validation of mount targets and concurrency"""
+        with pytest.raises(ValueError, match="No mount targets available"):
+            bulk_read(['a'], [])
+        with pytest.raises(ValueError, match="concurrency"):
+            bulk_write([('a', 'x')], router, concurrency=0)
+    
+    def test_items_are_submitted_in_a_bounded_window(self, router):
+        """Test that a long item iterable is drawn lazily instead of queued up front"""
+        drawn = []
+        
+        def items():
+            for i in range(1000):
+                drawn.append(i)
+                yield f"w-{i}", 'x'
+        
+        results = bulk_write(items(), router, concurrency=1)
+        assert drawn == []
+        next(results)
+        results.close()
+        
+        assert len(drawn) <= BULK_WINDOW_PER_WORKER * 1 * 3
+
+
+class TestStreamingIO:
+    """Test chunked streaming reads and writes"""
+    
+    @pytest.fixture
+    def router(self, tmp_mounts):
+        return MountRouter(tmp_mounts(2))
+    
+    def test_round_trip_in_chunks(self, router):
+        """Test that chunks written by write_stream come back from read_chunks"""
+        data = os.urandom(10 * 1024 + 7)
+        
+        written = write_stream('objects/blob.bin', (data[i:i + 1000] for i in range(0, len(data), 1000)), router)
+        chunks = list(read_chunks('objects/blob.bin', router, chunk_size=4096))
+        
+        assert written == router.route('objects/blob.bin')
+        assert [len(c) for c in chunks] == [4096, 4096, 2055]
+        assert b''.join(chunks) == data
+    
+    def test_text_chunks_and_append(self, router):
+        """Test str chunks and append mode"""
+        write_stream('log.txt', ['héllo ', 'wörld'], router)
+        write_stream('log.txt', [b'!'], router, mode='ab')
+        
+        assert read_file('log.txt', router) == 'héllo wörld!'
+    
+    def test_memory_stays_flat(self, router):
+        """Test that streaming a 32 MiB object never holds much more than one chunk"""
+        chunk = b'\0' * NFS_IO_SIZE
+        
+        tracemalloc.start()
+        try:
+            write_stream('big.bin', (chunk for _ in range(32)), router)
+            total = sum(len(c) for c in read_chunks('big.bin', router))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        
+        assert total == 32 * NFS_IO_SIZE
+        assert peak < 4 * NFS_IO_SIZE
+    
+    def test_errors(self, router):
+        """Test missing files, empty mount lists, text modes and invalid chunk sizes"""
+        with pytest.raises(FileNotFoundError):
+            next(read_chunks('missing.bin', router))
+        with pytest.raises(ValueError, match="No mount targets available"):
+            write_stream('a.bin', [b'x'], [])
+        with pytest.raises(ValueError, match="'wb' or 'ab'"):
+            write_stream('a.txt', ['x'], router, mode='w')
+        assert not file_exists('a.txt', router)
+        with pytest.raises(ValueError, match="Chunk size"):
+            next(read_chunks('a.bin', router, chunk_size=0))
+
+
+class TestZeroCopyReads:
+    """Test readinto, pooled-buffer and mmap read paths"""
+    
+    DATA = bytes(range(256)) * 40
+    
+    @pytest.fixture
+    def router(self, tmp_mounts):
+        router = MountRouter(tmp_mounts(2))
+        write_file('blob.bin', self.DATA, router, mode='wb')
+        write_file('empty.bin', b'', router, mode='wb')
+        return router
+    
+    def test_read_into_caller_buffer(self, router):
+        """Test filling a caller-supplied buffer, larger and smaller than the file"""
+        large = bytearray(len(self.DATA) + 100)
+        small = bytearray(1000)
+        
+        assert read_into('blob.bin', large, router) == len(self.DATA)
+        assert bytes(large[:len(self.DATA)]) == self.DATA
+        assert read_into('blob.bin', memoryview(small), router) == 1000
+        assert bytes(small) == self.DATA[:1000]
+    
+    def test_pooled_read_reuses_buffers(self, router):
+        """Test that pooled reads hand back the same buffer and return it on exit"""
+        pool = BufferPool(size_classes=(4096, 16384), buffers_per_class=1)
+        
+        with pooled_read('blob.bin', router, pool) as data:
+            assert bytes(data) == self.DATA
+            first = data.obj
+        with pooled_read('blob.bin', router, pool) as data:
+            assert data.obj is first
+        
+        assert len(first) == 16384
+        assert pool.stats() == {'hits': 2, 'misses': 0, 'free': {4096: 1, 16384: 1}}
+    
+    def test_buffer_pool_classes(self):
+        """Test size-class selection, exhaustion and oversize requests"""
+        pool = BufferPool(size_classes=(1024, 4096), buffers_per_class=1)
+        
+        small = pool.acquire(10)
+        extra = pool.acquire(10)
+        oversize = pool.acquire(5000)
+        
+        assert (len(small), len(extra), len(oversize)) == (1024, 1024, 5000)
+        assert pool.stats()['misses'] == 1
+        pool.release(small)
+        pool.release(extra)
+        pool.release(oversize)
+        assert pool.stats()['free'] == {1024: 1, 4096: 1}
+    
+    def test_map_file(self, router):
+        """Test the read-only mmap view, including empty files"""
+        with map_file('blob.bin', router) as data:
+            assert data.readonly
+            assert bytes(data[256:512]) == bytes(range(256))
+        with map_file('empty.bin', router) as data:
+            assert len(data) == 0
+    
+    def test_pooled_reads_do_not_allocate_content(self, router):
+        """Test with tracemalloc that pooled and readinto reads avoid per-call content copies"""
+        buffer = bytearray(len(self.DATA))
+        read_file('blob.bin', router, mode='rb')
+        with pooled_read('blob.bin', router):
+            pass
+        
+        def peak_allocation(read):
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                read()
+                return tracemalloc.get_traced_memory()[1] - before
+            finally:
+                tracemalloc.stop()
+        
+        def pooled():
+            with pooled_read('blob.bin', router):
+                pass
+        
+        assert peak_allocation(lambda: read_file('blob.bin', router, mode='rb')) >= len(self.DATA)
+        assert peak_allocation(lambda: read_into('blob.bin', buffer, router)) < len(self.DATA) / 2
+        assert peak_allocation(pooled) < len(self.DATA) / 2
+    
+    def test_missing_file(self, router):
+        """Test that errors propagate from every read path"""
+        with pytest.raises(FileNotFoundError):
+            read_into('missing.bin', bytearray(10), router)
+        with pytest.raises(FileNotFoundError):
+            with pooled_read('missing.bin', router):
+                pass
+        with pytest.raises(FileNotFoundError):
+            with map_file('missing.bin', router):
+                pass
+
+
+class TestKnownDirectoryCache:
+    """Test skipping os.makedirs for directories known to exist"""
+    
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self):
+        configure_known_directories(100)
+    
+    def _delta(self, before):
+        after = get_known_directory_stats()
+        return {key: after[key] - before[key] for key in ('makedirs_calls', 'makedirs_skipped', 'enoent_retries')}
+    
+    def test_second_write_skips_makedirs(self, router):
+        """Test that only the first write to a directory calls os.makedirs"""
+        before = get_known_directory_stats()
+        
+        with patch('os.makedirs', wraps=os.makedirs) as makedirs:
+            for i in range(5):
+                write_file(f"logs/{i}.txt", 'x', router)
+            write_stream('logs/stream.bin', [b'x'], router)
+        
+        assert makedirs.call_count == 1
+        assert self._delta(before) == {'makedirs_calls': 1, 'makedirs_skipped': 5, 'enoent_retries': 0}
+        assert get_known_directory_stats()['metadata_ops_saved'] >= 15
+    
+    def test_removed_directory_is_recreated_once(self, router, tmp_path):
+        """Test ENOENT invalidation and a single retry"""
+        write_file('tmp/a.txt', 'x', router)
+        shutil.rmtree(tmp_path / 'efs-0' / 'tmp')
+        before = get_known_directory_stats()
+        
+        write_file('tmp/b.txt', 'y', router)
+        
+        assert (tmp_path / 'efs-0' / 'tmp' / 'b.txt').read_text() == 'y'
+        assert self._delta(before) == {'makedirs_calls': 1, 'makedirs_skipped': 1, 'enoent_retries': 1}
+    
+    def test_missing_file_error_without_cached_directory(self, router):
+        """Test that ENOENT is raised as-is when makedirs already ran"""
+        with patch('os.makedirs'):
+            with pytest.raises(FileNotFoundError):
+                write_file('never/created.txt', 'x', router)
+        
+        assert get_known_directory_stats()['cache']['size'] == 0
+    
+    def test_disabled_cache_always_calls_makedirs(self, router):
+        """Test KNOWN_DIRECTORIES_SIZE=0"""
+        with patch.dict(os.environ, {'KNOWN_DIRECTORIES_SIZE': '0'}):
+            assert configure_known_directories() == 0
+        
+        with patch('os.makedirs', wraps=os.makedirs) as makedirs:
+            for i in range(3):
+                write_file(f"logs/{i}.txt", 'x', router)
+        
+        assert makedirs.call_count == 3
+        assert get_known_directory_stats()['cache'] is None
+    
+    def test_invalid_size(self):
+        """Test KNOWN_DIRECTORIES_SIZE validation"""
+        with patch.dict(os.environ, {'KNOWN_DIRECTORIES_SIZE': 'lots'}):
+            with pytest.raises(ValueError, match="KNOWN_DIRECTORIES_SIZE"):
+                configure_known_directories()
+        with pytest.raises(ValueError):
+            configure_known_directories(-1)
+
+
+class TestAtomicWrites:
+    """Test atomic write mode with group-commit fsync"""
+    
+    def test_atomic_write_replaces_file(self, router, tmp_path):
+        """Test that the target is replaced and no temporary file is left behind"""
+        write_file('docs/a.txt', 'old', router)
+        
+        path = write_file('docs/a.txt', 'new', router, atomic=True)
+        write_file('docs/b.bin', b'\x00\x01', router, mode='wb', atomic=True)
+        
+        assert path == str(tmp_path / 'efs-0' / 'docs' / 'a.txt')
+        assert read_file('docs/a.txt', router) == 'new'
+        assert read_file('docs/b.bin', router, mode='rb') == b'\x00\x01'
+        assert sorted(os.listdir(tmp_path / 'efs-0' / 'docs')) == ['a.txt', 'b.bin']
+        assert get_durability_stats()[str(tmp_path / 'efs-0')]['commits'] == 2
+    
+    def test_write_mode_from_environment(self, router):
+        """Test WRITE_MODE and GROUP_COMMIT_WINDOW_MS"""
+        with patch.dict(os.environ, {'WRITE_MODE': 'atomic', 'GROUP_COMMIT_WINDOW_MS': '0'}):
+            assert configure_write_mode() == 'atomic'
+        
+        with patch('os.fsync', wraps=os.fsync) as fsync:
+            write_file('a.txt', 'x', router)
+            append_file('a.txt', 'y', router)
+        
+        # Appends stay in place and are not synced
+        assert fsync.call_count == 1
+        assert read_file('a.txt', router) == 'xy'
+    
+    def test_failed_write_keeps_old_content(self, router, tmp_path):
+        """Test that a failed flush leaves the target untouched and removes the temporary file"""
+        write_file('a.txt', 'old', router)
+        configure_write_mode('atomic', 0)
+        
+        with patch('os.fsync', side_effect=OSError(errno.ENOSPC, 'No space left on device')):
+            with pytest.raises(OSError):
+                write_file('a.txt', 'new', router)
+        
+        assert read_file('a.txt', router) == 'old'
+        assert os.listdir(tmp_path / 'efs-0') == ['a.txt']
+    
+    def test_concurrent_commits_share_one_sync(self, tmp_path):
+        """Test that writers arriving within the window join one batch"""
+        committer = GroupCommitter(window=0.05)
+        files = [open(tmp_path / f"{i}.txt", 'w') for i in range(8)]
+        barrier = threading.Barrier(len(files))
+        latencies = []
+        
+        def commit(f):
+            f.write('x')
+            f.flush()
+            barrier.wait()
+            latencies.append(committer.commit(f.fileno()))
+        
+        try:
+            threads = [threading.Thread(target=commit, args=(f,)) for f in files]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for f in files:
+                f.close()
+        
+        stats = committer.stats()
+        assert stats['commits'] == 8
+        assert stats['batches'] < 8
+        assert stats['syncs'] < 8
+        assert stats['syncs_saved'] == 8 - stats['syncs']
+        assert len(latencies) == 8 and all(latency > 0 for latency in latencies)
+        assert stats['latency_ms']['max'] >= stats['latency_ms']['p50'] > 0
+    
+    def test_flush_error_reaches_every_writer(self, tmp_path):
+        """Test that each writer in a failed batch gets the error"""
+        committer = GroupCommitter(window=0)
+        with open(tmp_path / 'a.txt', 'w') as f:
+            with patch('os.fsync', side_effect=OSError(errno.EIO, 'Input/output error')):
+                with pytest.raises(OSError) as excinfo:
+                    committer.commit(f.fileno())
+        
+        assert excinfo.value.errno == errno.EIO
+        assert committer.stats()['commits'] == 0
+    
+    def test_invalid_write_mode(self):
+        """Test WRITE_MODE and GROUP_COMMIT_WINDOW_MS validation"""
+        with pytest.raises(ValueError, match="Unknown write mode"):
+            configure_write_mode('eventual')
+        with patch.dict(os.environ, {'GROUP_COMMIT_WINDOW_MS': 'soon'}):
+            with pytest.raises(ValueError, match="GROUP_COMMIT_WINDOW_MS"):
+                configure_write_mode('atomic')
+        with pytest.raises(ValueError):
+            configure_write_mode('atomic', -1)
+
+
+class TestMetadataCache:
+    """Test the TTL existence cache behind file_exists"""
+    
+    @pytest.fixture(autouse=True)
+    def enabled_cache(self):
+        configure_metadata_cache(3)
+    
+    def test_positive_and_negative_answers_are_cached(self, router, tmp_path):
+        """Test that repeated checks reuse the first answer"""
+        (tmp_path / 'efs-0' / 'hot.txt').write_text('x')
+        before = get_metadata_cache_stats()
+        
+        with patch('os.path.exists', wraps=os.path.exists) as exists:
+            results = [file_exists('hot.txt', router) for _ in range(5)]
+            results += [file_exists('cold.txt', router) for _ in range(5)]
+        
+        assert results == [True] * 5 + [False] * 5
+        assert exists.call_count == 2
+        assert get_metadata_cache_stats()['hits'] - before['hits'] == 8
+    
+    def test_own_writes_and_deletes_update_cache(self, router):
+        """Test immediate invalidation by write_file, write_stream and delete_file"""
+        assert file_exists('a.txt', router) is False
+        write_file('a.txt', 'x', router)
+        assert file_exists('a.txt', router) is True
+        
+        assert delete_file('a.txt', router) is True
+        assert file_exists('a.txt', router) is False
+        
+        write_stream('a.txt', [b'x'], router)
+        assert file_exists('a.txt', router) is True
+        write_file('b.txt', 'x', router, atomic=True)
+        assert file_exists('b.txt', router) is True
+        
+        assert get_metadata_cache_stats()['updates'] >= 4
+    
+    def test_answers_expire_after_ttl(self, router, tmp_path):
+        """Test that changes by other clients are seen once the TTL passes"""
+        assert file_exists('other.txt', router) is False
+        (tmp_path / 'efs-0' / 'other.txt').write_text('x')
+        assert file_exists('other.txt', router) is False
+        
+        with patch('time.monotonic', return_value=time.monotonic() + 3):
+            assert file_exists('other.txt', router) is True
+        assert get_metadata_cache_stats()['expired'] >= 1
+    
+    def test_delete_is_a_single_remove(self, router, tmp_path):
+        """Test EAFP delete_file without an existence check"""
+        (tmp_path / 'efs-0' / 'a.txt').write_text('x')
+        
+        with patch('os.path.exists') as exists:
+            assert delete_file('a.txt', router) is True
+            assert delete_file('a.txt', router) is False
+        
+        exists.assert_not_called()
+    
+    def test_ttl_bounded_by_nfs_attribute_cache(self):
+        """Test METADATA_CACHE_TTL validation"""
+        with patch.dict(os.environ, {'METADATA_CACHE_TTL': '0'}):
+            assert configure_metadata_cache() == 0
+        assert get_metadata_cache_stats()['cache'] is None
+        with patch.dict(os.environ, {'METADATA_CACHE_TTL': 'forever'}):
+            with pytest.raises(ValueError, match="METADATA_CACHE_TTL"):
+                configure_metadata_cache()
+        with pytest.raises(ValueError, match="acregmin"):
+            configure_metadata_cache(60)
+        with pytest.raises(ValueError):
+            configure_metadata_cache(-1)
+
+
+class TestReadCache:
+    """Test the two-tier read cache in front of read_file"""
+    
+    @pytest.fixture(autouse=True)
+    def enabled_cache(self, tmp_path):
+        (tmp_path / 'cache').mkdir()
+        configure_read_cache(1024, 64 * 1024, str(tmp_path / 'cache'))
+    
+    def test_small_objects_hit_memory(self, router):
+        """Test that repeated reads of a small file are served from memory"""
+        write_file('ref/small.txt', 'line one\r\nline two', router)
+        
+        assert read_file('ref/small.txt', router) == 'line one\nline two'
+        assert read_file('ref/small.txt', router) == 'line one\nline two'
+        assert read_file('ref/small.txt', router, mode='rb') == b'line one\r\nline two'
+        
+        stats = get_read_cache_stats()
+        assert (stats['misses'], stats['memory_hits'], stats['disk_hits']) == (1, 2, 0)
+        assert stats['bytes_saved'] == 2 * len(b'line one\r\nline two')
+        assert stats['hit_ratio'] == pytest.approx(2 / 3)
+    
+    def test_large_objects_spill_to_disk(self, router, tmp_path):
+        """Test that objects above the memory budget are served from local disk"""
+        payload = os.urandom(8192)
+        write_file('ref/large.bin', payload, router, mode='wb')
+        
+        assert read_file('ref/large.bin', router, mode='rb') == payload
+        (spill_directory,) = (tmp_path / 'cache').iterdir()
+        assert len(os.listdir(spill_directory)) == 1
+        assert read_file('ref/large.bin', router, mode='rb') == payload
+        
+        stats = get_read_cache_stats()
+        assert (stats['disk_hits'], stats['disk_entries'], stats['disk_used']) == (1, 1, 8192)
+        assert stats['memory_entries'] == 0
+    
+    def test_changed_file_is_read_again(self, router, tmp_path):
+        """Test mtime and size validation against changes made by other clients"""
+        write_file('ref/a.txt', 'old', router)
+        assert read_file('ref/a.txt', router) == 'old'
+        
+        (tmp_path / 'efs-0' / 'ref' / 'a.txt').write_text('newer')
+        
+        assert read_file('ref/a.txt', router) == 'newer'
+        assert get_read_cache_stats()['stale'] == 1
+    
+    def test_own_writes_and_deletes_invalidate(self, router):
+        """Test that content cached before a write or delete is never served"""
+        write_file('ref/a.txt', 'one', router)
+        assert read_file('ref/a.txt', router) == 'one'
+        
+        write_file('ref/a.txt', 'two', router)
+        assert get_read_cache_stats()['memory_entries'] == 0
+        assert read_file('ref/a.txt', router) == 'two'
+        
+        delete_file('ref/a.txt', router)
+        with pytest.raises(FileNotFoundError):
+            read_file('ref/a.txt', router)
+    
+    def test_own_writes_invalidate_copies_read_through_other_mounts(self, tmp_path):
+        """Test invalidation when least_loaded reads use a different mount than writes"""
+        (tmp_path / 'efs-0').mkdir()
+        # Both mount points expose the same file system, as with EFS
+        (tmp_path / 'efs-1').symlink_to(tmp_path / 'efs-0')
+        router = MountRouter([
+            {'mount_point': str(tmp_path / f"efs-{i}"), 'mount_target_id': f"fsmt-{i}"} for i in range(2)
+        ])
+        write_file('ref/a.txt', 'one', router)
+        write_index = router.select('ref/a.txt')
+        read_through_other = lambda self, path: self.prefixes[1 - write_index] + path.lstrip('/')
+        
+        configure_read_routing('least_loaded')
+        try:
+            with patch.object(MountRouter, 'route_read', read_through_other):
+                assert read_file('ref/a.txt', router) == 'one'
+                write_file('ref/a.txt', 'two', router)
+                assert get_read_cache_stats()['memory_entries'] == 0
+                assert read_file('ref/a.txt', router) == 'two'
+                
+                delete_file('ref/a.txt', router)
+                assert get_read_cache_stats()['memory_entries'] == 0
+        finally:
+            configure_read_routing('hash')
+        assert get_read_cache_stats()['stale'] == 0
+    
+    def test_eviction_by_total_bytes(self, tmp_path):
+        """Test LRU eviction in both tiers"""
+        (tmp_path / 'local').mkdir()
+        cache = ReadCache(300, 1000, str(tmp_path / 'local'), memory_object_limit=100)
+        for i in range(4):
+            cache.put(f"small-{i}", (i, 100), b'x' * 100)
+        for i in range(3):
+            cache.put(f"large-{i}", (i, 400), b'y' * 400)
+        
+        assert cache.get('small-0', (0, 100)) is None
+        assert cache.get('small-3', (3, 100)) == b'x' * 100
+        assert cache.get('large-0', (0, 400)) is None
+        assert cache.get('large-2', (2, 400)) == b'y' * 400
+        
+        stats = cache.stats()
+        assert (stats['memory_used'], stats['disk_used'], stats['evictions']) == (300, 800, 2)
+        assert len(os.listdir(cache.directory)) == 2
+        
+        cache.clear()
+        assert cache.directory is None
+        assert not list((tmp_path / 'local').iterdir())
+    
+    def test_configuration(self, tmp_path):
+        """Test READ_CACHE_* environment variables and validation"""
+        env = {'READ_CACHE_MEMORY_BYTES': '2048', 'READ_CACHE_DISK_BYTES': '0', 'READ_CACHE_DIR': str(tmp_path)}
+        with patch.dict(os.environ, env):
+            assert configure_read_cache() == (2048, 0)
+        assert get_read_cache_stats()['memory_used'] == 0
+        
+        assert configure_read_cache(0, 0) == (0, 0)
+        assert get_read_cache_stats() is None
+        with patch.dict(os.environ, {'READ_CACHE_MEMORY_BYTES': 'lots'}):
+            with pytest.raises(ValueError, match="READ_CACHE_MEMORY_BYTES"):
+                configure_read_cache()
+        with pytest.raises(ValueError):
+            configure_read_cache(-1, 0)
+
+
+class TestAppendBuffer:
+    """Test write-behind coalescing of append_file"""
+    
+    def test_sigterm_flushes_queued_appends(self, tmp_path):
+        """Test that appends still queued when ECS stops the task reach the file"""
+        (tmp_path / 'efs-0').mkdir()
+        script = f"""
+import sys, time
+sys.path.insert(0, {os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))!r})
+from fargate import app
+router = app.MountRouter([{{'mount_point': {str(tmp_path / 'efs-0')!r}, 'mount_target_id': 'fsmt-0'}}])
+app.configure_append_buffer(1024 * 1024, 60000)
+app.install_signal_handlers()
+for i in range(100):
+    app.append_file('logs/app.log', f"line {{i}}\\n", router)
+print('ready', flush=True)
+time.sleep(60)
+"""
+        process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, text=True)
+        try:
+            assert process.stdout.readline().strip() == 'ready'
+            target = tmp_path / 'efs-0' / 'logs' / 'app.log'
+            assert not target.exists()
+            
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=30) == 0
+        finally:
+            process.kill()
+            process.stdout.close()
+        
+        assert target.read_text() == ''.join(f"line {i}\n" for i in range(100))
+    
+    def test_appends_are_coalesced_until_flush(self, router, tmp_path):
+        """Test that queued appends reach the file in order with one write"""
+        configure_append_buffer(1024 * 1024, 60000)
+        target = tmp_path / 'efs-0' / 'logs' / 'app.log'
+        
+        with patch('fargate.app._write_file', wraps=app_module._write_file) as write:
+            for i in range(100):
+                assert append_file('logs/app.log', f"line {i}\n", router) == str(target)
+            append_file('logs/app.log', b'raw\n', router)
+            assert not target.exists()
+            
+            flush_appends()
+        
+        assert write.call_count == 1
+        assert target.read_text() == ''.join(f"line {i}\n" for i in range(100)) + 'raw\n'
+        stats = get_append_buffer_stats()
+        assert (stats['appends'], stats['flushes'], stats['pending_bytes']) == (101, 1, 0)
+        assert stats['flush_reasons']['explicit'] == 1
+    
+    def test_flush_by_size(self, router, tmp_path):
+        """Test that reaching the per-file threshold writes immediately"""
+        configure_append_buffer(10, 60000)
+        
+        append_file('a.log', '12345', router)
+        assert not (tmp_path / 'efs-0' / 'a.log').exists()
+        append_file('a.log', '67890', router)
+        
+        assert (tmp_path / 'efs-0' / 'a.log').read_text() == '1234567890'
+        assert get_append_buffer_stats()['flush_reasons']['size'] == 1
+    
+    def test_flush_by_age(self, router, tmp_path):
+        """Test that the background thread flushes old appends"""
+        configure_append_buffer(1024, 20)
+        append_file('a.log', 'late', router)
+        
+        for _ in range(100):
+            if (tmp_path / 'efs-0' / 'a.log').exists():
+                break
+            time.sleep(0.01)
+        
+        assert (tmp_path / 'efs-0' / 'a.log').read_text() == 'late'
+        assert get_append_buffer_stats()['flush_reasons']['age'] == 1
+    
+    def test_backpressure_bounds_memory(self, router, tmp_path):
+        """Test that appenders flush once the memory budget is reached"""
+        configure_append_buffer(1024, 60000, memory_bytes=100)
+        
+        for i in range(10):
+            append_file(f"{i}.log", 'x' * 30, router)
+            assert get_append_buffer_stats()['pending_bytes'] <= 100
+        
+        assert get_append_buffer_stats()['flush_reasons']['backpressure'] >= 1
+    
+    def test_failed_flush_keeps_content_queued(self, router, tmp_path):
+        """Test that a failed flush raises and loses nothing"""
+        buffer = AppendBuffer(1024, 60)
+        buffer.append('a.log', 'one ', router)
+        
+        with patch('fargate.app._write_file', side_effect=OSError(errno.EIO, 'Input/output error')):
+            with pytest.raises(OSError):
+                buffer.flush('a.log', router)
+        buffer.append('a.log', 'two', router)
+        buffer.close()
+        
+        assert (tmp_path / 'efs-0' / 'a.log').read_text() == 'one two'
+        with pytest.raises(ValueError, match="closed"):
+            buffer.append('a.log', 'three', router)
+    
+    def test_concurrent_appends_keep_per_thread_order(self, router, tmp_path):
+        """Test that no append is lost or reordered under concurrent flushes"""
+        configure_append_buffer(64, 5)
+        
+        def writer(n):
+            for i in range(200):
+                append_file('shared.log', f"{n}:{i}\n", router)
+        
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        configure_append_buffer(0)
+        
+        lines = (tmp_path / 'efs-0' / 'shared.log').read_text().splitlines()
+        assert len(lines) == 800
+        for n in range(4):
+            assert [line for line in lines if line.startswith(f"{n}:")] == [f"{n}:{i}" for i in range(200)]
+    
+    def test_write_after_append_replaces_queued_content(self, router, tmp_path):
+        """Test that a write is not overtaken by appends queued before it"""
+        configure_append_buffer(1024, 60000)
+        
+        append_file('a.log', 'OLD\n', router)
+        write_file('a.log', 'NEW\n', router)
+        flush_appends()
+        
+        assert (tmp_path / 'efs-0' / 'a.log').read_text() == 'NEW\n'
+        assert get_append_buffer_stats()['flush_reasons']['access'] == 1
+    
+    def test_delete_after_append_removes_file(self, router, tmp_path):
+        """Test that a deleted file is not brought back by a later flush"""
+        configure_append_buffer(1024, 60000)
+        
+        append_file('a.log', 'queued\n', router)
+        assert file_exists('a.log', router) is True
+        assert delete_file('a.log', router) is True
+        flush_appends()
+        
+        assert not (tmp_path / 'efs-0' / 'a.log').exists()
+        assert get_append_buffer_stats()['pending_bytes'] == 0
+    
+    def test_read_after_append_sees_queued_content(self, router):
+        """Test read-your-appends through read_file"""
+        configure_append_buffer(1024, 60000)
+        
+        append_file('a.log', 'one\n', router)
+        append_file('a.log', 'two\n', router)
+        
+        assert read_file('a.log', router) == 'one\ntwo\n'
+        assert get_append_buffer_stats()['pending_files'] == 0
+    
+    @staticmethod
+    def _read_with(api, router):
+        if api == 'read_chunks':
+            return b''.join(read_chunks('a.log', router))
+        if api == 'read_into':
+            buffer = bytearray(64)
+            return bytes(buffer[:read_into('a.log', buffer, router)])
+        opener = pooled_read if api == 'pooled_read' else map_file
+        with opener('a.log', router) as data:
+            return bytes(data)
+    
+    @pytest.mark.parametrize("api", ['read_chunks', 'read_into', 'pooled_read', 'map_file'])
+    def test_streaming_and_zero_copy_reads_see_queued_content(self, router, api):
+        """Test read-your-appends through the streaming and zero-copy read APIs"""
+        configure_append_buffer(1024, 60000)
+        
+        append_file('a.log', 'one\n', router)
+        append_file('a.log', 'two\n', router)
+        
+        assert self._read_with(api, router) == b'one\ntwo\n'
+        assert get_append_buffer_stats()['pending_files'] == 0
+    
+    def test_write_stream_after_append_replaces_queued_content(self, router, tmp_path):
+        """Test that a queued append is not written on top of a later write_stream"""
+        configure_append_buffer(1024, 60000)
+        
+        append_file('a.log', 'stale\n', router)
+        write_stream('a.log', [b'fresh\n'], router)
+        flush_appends()
+        
+        assert (tmp_path / 'efs-0' / 'a.log').read_bytes() == b'fresh\n'
+    
+
+        with patch.dict(os.environ, {'APPEND_BUFFER_BYTES': '4096', 'APPEND_BUFFER_MAX_AGE_MS': '50'}):
+            assert configure_append_buffer() == 4096
+        assert get_append_buffer_stats()['appends'] == 0
+        assert configure_append_buffer(0) == 0
+        assert get_append_buffer_stats() is None
+        
+        with patch.dict(os.environ, {'APPEND_BUFFER_BYTES': 'big'}):
+            with pytest.raises(ValueError, match="APPEND_BUFFER_BYTES"):
+                configure_append_buffer()
+        with pytest.raises(ValueError):
+            configure_append_buffer(-1)
+        with pytest.raises(ValueError):
+            configure_append_buffer(1024, 0)
+
+
+class TestFileHandleCache:
+    """Test reuse of open file handles by read_file, write_file and append_file"""
+    
+    @pytest.fixture(autouse=True)
+    def enabled_cache(self):
+        configure_file_handle_cache(16)
+    
+    def test_repeated_calls_open_once(self, router, tmp_path):
+        """Test that appends, writes and reads reuse one handle per path and kind"""
+        with patch('builtins.open', wraps=builtins.open) as opened:
+            for i in range(10):
+                append_file('logs/a.log', f"{i}\n", router)
+            for _ in range(3):
+                write_file('cfg/b.txt', 'long content', router)
+            write_file('cfg/b.txt', 'short', router)
+            reads = [read_file('logs/a.log', router) for _ in range(5)]
+            assert read_file('cfg/b.txt', router, mode='rb') == b'short'
+        
+        assert opened.call_count == 4
+        assert reads == [''.join(f"{i}\n" for i in range(10))] * 5
+        assert (tmp_path / 'efs-0' / 'cfg' / 'b.txt').read_text() == 'short'
+        stats = get_file_handle_cache_stats()
+        assert (stats['misses'], stats['hits'], stats['size']) == (4, 16, 4)
+    
+    def test_replaced_file_is_reopened(self, router, tmp_path):
+        """Test inode validation against files replaced or removed by other clients"""
+        write_file('a.txt', 'one', router)
+        assert read_file('a.txt', router) == 'one'
+        
+        replacement = tmp_path / 'efs-0' / 'a.txt.new'
+        replacement.write_text('two')
+        os.replace(replacement, tmp_path / 'efs-0' / 'a.txt')
+        assert read_file('a.txt', router) == 'two'
+        
+        os.remove(tmp_path / 'efs-0' / 'a.txt')
+        with pytest.raises(FileNotFoundError):
+            read_file('a.txt', router)
+        assert get_file_handle_cache_stats()['stale'] == 2
+    
+    def test_own_deletes_and_atomic_writes_close_handles(self, router):
+        """Test invalidation when this module removes or replaces a file"""
+        append_file('a.log', 'x', router)
+        read_file('a.log', router)
+        assert get_file_handle_cache_stats()['size'] == 2
+        
+        delete_file('a.log', router)
+        assert get_file_handle_cache_stats()['size'] == 0
+        
+        write_file('b.txt', 'one', router)
+        write_file('b.txt', 'two', router, atomic=True)
+        assert get_file_handle_cache_stats()['size'] == 0
+        assert read_file('b.txt', router) == 'two'
+    
+    def test_rewritten_file_is_reread(self, router, tmp_path):
+        """Test that a read handle is not reused after another client rewrites the file in place"""
+        write_file('a.txt', 'one', router)
+        assert read_file('a.txt', router) == 'one'
+        
+        with open(tmp_path / 'efs-0' / 'a.txt', 'r+') as f:
+            f.write('three')
+        assert read_file('a.txt', router) == 'three'
+        assert get_file_handle_cache_stats()['stale'] == 1
+    
+    def test_own_changes_close_handles_opened_through_other_mounts(self, tmp_path):
+        """Test invalidation when least_loaded reads use a different mount than writes"""
+        (tmp_path / 'efs-0').mkdir()
+        # Both mount points expose the same file system, as with EFS
+        (tmp_path / 'efs-1').symlink_to(tmp_path / 'efs-0')
+        router = MountRouter([
+            {'mount_point': str(tmp_path / f"efs-{i}"), 'mount_target_id': f"fsmt-{i}"} for i in range(2)
+        ])
+        write_file('ref/a.txt', 'one', router)
+        write_index = router.select('ref/a.txt')
+        read_through_other = lambda self, path: self.prefixes[1 - write_index] + path.lstrip('/')
+        
+        configure_read_routing('least_loaded')
+        try:
+            with patch.object(MountRouter, 'route_read', read_through_other):
+                assert read_file('ref/a.txt', router) == 'one'
+                assert get_file_handle_cache_stats()['size'] == 2
+                write_file('ref/a.txt', 'two', router, atomic=True)
+                assert get_file_handle_cache_stats()['size'] == 0
+                assert read_file('ref/a.txt', router) == 'two'
+                
+                delete_file('ref/a.txt', router)
+                assert get_file_handle_cache_stats()['size'] == 0
+        finally:
+            configure_read_routing('hash')
+        assert get_file_handle_cache_stats()['stale'] == 0
+    
+    def test_eviction_waits_for_handles_in_use(self, tmp_path):
+        """Test that an evicted handle is closed only after its last user is done"""
+        cache = FileHandleCache(1)
+        (tmp_path / 'a').write_bytes(b'a')
+        (tmp_path / 'b').write_bytes(b'b')
+        opener = lambda path: open(path, 'rb', buffering=0)
+        
+        with cache.use(str(tmp_path / 'a'), 'r', opener) as fd:
+            with cache.use(str(tmp_path / 'b'), 'r', opener):
+                pass
+            assert os.pread(fd, 1, 0) == b'a'
+        
+        with pytest.raises(OSError):
+            os.fstat(fd)
+        assert cache.stats()['evictions'] == 1
+        cache.close()
+    
+    def test_concurrent_appends_share_a_handle(self, router, tmp_path):
+        """Test that O_APPEND writes from many threads are not lost"""
+        def writer(n):
+            for i in range(100):
+                append_file('shared.log', f"{n}:{i}\n", router)
+        
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        lines = (tmp_path / 'efs-0' / 'shared.log').read_text().splitlines()
+        assert sorted(lines) == sorted(f"{n}:{i}" for n in range(4) for i in range(100))
+    
+    def test_size_capped_below_rlimit(self):
+        """Test the RLIMIT_NOFILE cap and FILE_HANDLE_CACHE_SIZE validation"""
+        with patch('resource.getrlimit', return_value=(1024, 4096)):
+            assert configure_file_handle_cache(100000) == 512
+        with patch.dict(os.environ, {'FILE_HANDLE_CACHE_SIZE': '0'}):
+            assert configure_file_handle_cache() == 0
+        assert get_file_handle_cache_stats() is None
+        with patch.dict(os.environ, {'FILE_HANDLE_CACHE_SIZE': 'many'}):
+            with pytest.raises(ValueError, match="FILE_HANDLE_CACHE_SIZE"):
+                configure_file_handle_cache()
+        with pytest.raises(ValueError):
+            configure_file_handle_cache(-1)
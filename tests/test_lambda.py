@@ -3,6 +3,7 @@ import pytest
 import sys
 import os
 import tempfile
+import time
 import shutil
 import importlib.util
 
@@ -839,8 +840,22 @@ class TestLambdaHandler:
                  patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_describe_subnets, \
                  patch.object(file_monitor.efs_client, 'create_mount_target') as mock_create_mt, \
                  patch.object(file_monitor.ssm_client, 'put_parameter') as mock_put_param, \
+                 patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get_param, \
+                 patch.object(file_monitor.ecs_client, 'describe_services') as mock_describe_services, \
                  patch.object(file_monitor.ecs_client, 'update_service') as mock_update_service:
                 
+                # Mock ECS service lookup
+                mock_describe_services.return_value = {
+                    'services': [{'serviceName': 'my-service', 'status': 'ACTIVE'}]
+                }
+                
+                # Mock published mount target list (matches the existing mount target)
+                mock_get_param.return_value = {
+                    'Parameter': {
+                        'Value': json.dumps({'mount_targets': [{'mount_target_id': 'fsmt-existing'}]})
+                    }
+                }
+                
                 # Mock existing mount targets - first call returns one, subsequent calls return both
                 mock_describe_mt.side_effect = [
                     # First call: get existing mount targets
@@ -945,3 +960,732 @@ class TestLambdaHandler:
                 assert mock_create_mt.call_count == 1
                 assert mock_put_param.call_count == 1
                 assert mock_update_service.call_count == 1
+
+
+class TestInvocationMetrics:
+    """Tests for per-step latency instrumentation"""
+    
+    def test_step_records_duration_with_injected_clock(self):
+        """Test that step durations are computed from the clock"""
+        ticks = iter([0.0, 1.0, 1.25, 2.0])
+        metrics = file_monitor.InvocationMetrics(clock=lambda: next(ticks))
+        
+        with metrics.step('config'):
+            pass
+        summary = metrics.finish()
+        
+        assert summary['step_durations_ms'] == {'config': 250.0}
+        assert summary['total_duration_ms'] == 2000.0
+    
+    def test_finish_closes_open_steps(self):
+        """Test that a step left open by an early return is still recorded"""
+        metrics = file_monitor.InvocationMetrics()
+        
+        step = metrics.step('count_files')
+        step.__enter__()
+        summary = metrics.finish()
+        
+        assert 'count_files' in summary['step_durations_ms']
+        assert summary['step_durations_ms']['count_files'] >= 0
+    
+    def test_api_calls_are_counted_per_step_and_operation(self):
+        """Test that AWS API calls issued through the module clients are counted"""
+        from botocore.stub import Stubber
+        
+        metrics = file_monitor.InvocationMetrics()
+        with Stubber(file_monitor.efs_client) as stubber:
+            stubber.add_response('describe_mount_targets', {'MountTargets': []}, {'FileSystemId': 'fs-12345678'})
+            stubber.add_response('describe_mount_targets', {'MountTargets': []}, {'FileSystemId': 'fs-12345678'})
+            with metrics.step('describe_mount_targets'):
+                file_monitor.get_existing_mount_targets('fs-12345678')
+                file_monitor.get_existing_mount_targets('fs-12345678')
+        summary = metrics.finish()
+        
+        assert summary['step_api_calls'] == {'describe_mount_targets': 2}
+        assert summary['api_calls'] == {'DescribeMountTargets': 2}
+        assert summary['total_api_calls'] == 2
+
+
+class TestEmfOutput:
+    """Tests for CloudWatch Embedded Metric Format output"""
+    
+    def _summary(self):
+        return {
+            'total_duration_ms': 42.5,
+            'step_durations_ms': {'config': 0.5, 'count_files': 40.0},
+            'step_api_calls': {'config': 0, 'count_files': 0},
+            'api_calls': {},
+            'total_api_calls': 0
+        }
+    
+    def test_build_emf_document_structure(self):
+        """Test that every metric value is declared in the EMF metadata"""
+        document = file_monitor.build_emf_document(
+            self._summary(),
+            {'file_count': 7, 'error': None},
+            'TestNamespace',
+            {'FunctionName': 'fn'},
+            timestamp_ms=1700000000000
+        )
+        
+        directive = document['_aws']['CloudWatchMetrics'][0]
+        assert document['_aws']['Timestamp'] == 1700000000000
+        assert directive['Namespace'] == 'TestNamespace'
+        assert directive['Dimensions'] == [['FunctionName']]
+        assert document['FunctionName'] == 'fn'
+        
+        declared = {m['Name']: m['Unit'] for m in directive['Metrics']}
+        assert declared['count_files.Duration'] == 'Milliseconds'
+        assert declared['count_files.ApiCalls'] == 'Count'
+        assert declared['TotalDuration'] == 'Milliseconds'
+        for name in declared:
+            assert name in document
+        assert document['count_files.Duration'] == 40.0
+        assert document['FileCount'] == 7
+        assert document['Error'] == 0
+        assert (document['MountTargetCreated'], document['MountTargetResumed']) == (0, 0)
+    
+    def test_resumed_mount_target_is_not_counted_as_created(self):
+        """Test that a run finishing an earlier run's mount target reports it separately"""
+        document = file_monitor.build_emf_document(
+            self._summary(),
+            {'file_count': 7, 'new_mount_target_created': False, 'mount_target_resumed': True, 'error': None},
+            'TestNamespace',
+            {'FunctionName': 'fn'}
+        )
+        
+        assert (document['MountTargetCreated'], document['MountTargetResumed']) == (0, 1)
+    
+    def test_emit_emf_metrics_writes_single_json_line(self, capsys, monkeypatch):
+        """Test that the EMF writer prints one JSON document to stdout"""
+        monkeypatch.setenv('METRICS_NAMESPACE', 'CustomNamespace')
+        monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'my-function')
+        
+        file_monitor.emit_emf_metrics(self._summary(), {'file_count': 1})
+        
+        lines = capsys.readouterr().out.strip().splitlines()
+        assert len(lines) == 1
+        document = json.loads(lines[0])
+        assert document['_aws']['CloudWatchMetrics'][0]['Namespace'] == 'CustomNamespace'
+        assert document['FunctionName'] == 'my-function'
+    
+    def test_lambda_handler_emits_emf_and_step_metrics(self, monkeypatch, capsys):
+        """Test that the handler attaches step metrics to the result and emits EMF"""
+        monkeypatch.setenv('FILE_COUNT_THRESHOLD', '100')
+        monkeypatch.setenv('EFS_FILE_SYSTEM_ID', 'fs-12345678')
+        monkeypatch.setenv('VPC_ID', 'vpc-12345678')
+        monkeypatch.setenv('SSM_PARAMETER_NAME', '/app/efs/mount-targets')
+        monkeypatch.setenv('ECS_CLUSTER_NAME', 'my-cluster')
+        monkeypatch.setenv('ECS_SERVICE_NAME', 'my-service')
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            monkeypatch.setenv('TARGET_DIRECTORY', tmpdir)
+            mock_context = Mock()
+            mock_context.request_id = 'test-request-123'
+            
+            response = file_monitor.lambda_handler({}, mock_context)
+        
+        body = json.loads(response['body'])
+        assert set(body['metrics']['step_durations_ms']) == {'config', 'lock_acquire', 'count_files'}
+        assert body['metrics']['total_api_calls'] == 0
+        
+        emf_lines = [line for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+        assert len(emf_lines) == 1
+        document = json.loads(emf_lines[0])
+        assert 'config.Duration' in document
+        assert 'count_files.Duration' in document
+    
+    def test_lambda_handler_records_step_that_returned_early(self, monkeypatch):
+        """Test that a step which returns an error response is still timed"""
+        for key in ['TARGET_DIRECTORY', 'EFS_FILE_SYSTEM_ID']:
+            monkeypatch.delenv(key, raising=False)
+        
+        response = file_monitor.lambda_handler({}, None)
+        
+        body = json.loads(response['body'])
+        assert response['statusCode'] == 400
+        assert 'config' in body['metrics']['step_durations_ms']
+
+
+class TestInvocationLock:
+    """Tests for the lease-based invocation lock"""
+    
+    def _lock(self, tmp_path, owner_id, now, ttl_seconds=60):
+        backend = file_monitor.LocalFileLockBackend(str(tmp_path / 'lock.json'))
+        return file_monitor.InvocationLock(backend, owner_id, ttl_seconds=ttl_seconds, clock=lambda: now[0])
+    
+    def test_acquire_free_lock(self, tmp_path):
+        """Test acquiring a lock that nobody holds"""
+        now = [1000.0]
+        lock = self._lock(tmp_path, 'run-a', now)
+        
+        assert lock.acquire() is True
+        assert lock.fencing_token == 1
+        assert lock.validate() is True
+    
+    def test_overlapping_invocation_is_rejected(self, tmp_path):
+        """Test that a second invocation cannot acquire a live lease"""
+        now = [1000.0]
+        first = self._lock(tmp_path, 'run-a', now)
+        second = self._lock(tmp_path, 'run-b', now)
+        
+        assert first.acquire() is True
+        assert second.acquire() is False
+        assert second.holder == 'run-a'
+        assert first.validate() is True
+    
+    def test_expired_lease_is_taken_over_and_old_token_is_fenced(self, tmp_path):
+        """Test that an expired lease can be taken over and the old holder is fenced off"""
+        now = [1000.0]
+        first = self._lock(tmp_path, 'run-a', now)
+        second = self._lock(tmp_path, 'run-b', now)
+        
+        assert first.acquire() is True
+        now[0] += 61
+        assert second.acquire() is True
+        
+        assert second.fencing_token > first.fencing_token
+        assert first.validate() is False
+        assert first.release() is False
+        assert second.validate() is True
+    
+    def test_release_allows_next_invocation(self, tmp_path):
+        """Test that a released lock can be acquired immediately"""
+        now = [1000.0]
+        first = self._lock(tmp_path, 'run-a', now)
+        second = self._lock(tmp_path, 'run-b', now)
+        
+        assert first.acquire() is True
+        assert first.release() is True
+        assert second.acquire() is True
+    
+    def test_ssm_backend_round_trip(self):
+        """Test the SSM backend against a mocked Parameter Store"""
+        import boto3
+        from moto import mock_aws
+        
+        with mock_aws():
+            client = boto3.client('ssm', region_name='us-east-1')
+            backend = file_monitor.SsmLockBackend('/app/efs/invocation-lock', client=client)
+            
+            assert backend.get() == (None, 0)
+            version = backend.put({'owner': 'run-a', 'expires_at': 10})
+            record, current_version = backend.get()
+            
+            assert record == {'owner': 'run-a', 'expires_at': 10}
+            assert current_version == version
+            assert backend.put({'owner': None, 'expires_at': 0}) == version + 1
+    
+    def test_lambda_handler_skips_when_lock_held(self, monkeypatch, tmp_path):
+        """Test that an overlapping invocation exits before scanning"""
+        lock_path = str(tmp_path / 'lock.json')
+        monkeypatch.setenv('TARGET_DIRECTORY', str(tmp_path))
+        monkeypatch.setenv('FILE_COUNT_THRESHOLD', '100')
+        monkeypatch.setenv('EFS_FILE_SYSTEM_ID', 'fs-12345678')
+        monkeypatch.setenv('VPC_ID', 'vpc-12345678')
+        monkeypatch.setenv('SSM_PARAMETER_NAME', '/app/efs/mount-targets')
+        monkeypatch.setenv('ECS_CLUSTER_NAME', 'my-cluster')
+        monkeypatch.setenv('ECS_SERVICE_NAME', 'my-service')
+        monkeypatch.setenv('LOCK_FILE_PATH', lock_path)
+        
+        held = file_monitor.InvocationLock(file_monitor.LocalFileLockBackend(lock_path), 'run-a')
+        assert held.acquire() is True
+        
+        mock_context = Mock()
+        mock_context.request_id = 'run-b'
+        with patch.object(file_monitor, 'count_files_in_directory') as mock_count:
+            response = file_monitor.lambda_handler({}, mock_context)
+        
+        body = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert body['skipped'] == 'invocation_in_progress'
+        mock_count.assert_not_called()
+        assert held.validate() is True
+    
+    def test_lambda_handler_releases_lock(self, monkeypatch, tmp_path):
+        """Test that the handler releases its lease when it completes"""
+        lock_path = str(tmp_path / 'lock.json')
+        monkeypatch.setenv('TARGET_DIRECTORY', str(tmp_path))
+        monkeypatch.setenv('FILE_COUNT_THRESHOLD', '100')
+        monkeypatch.setenv('EFS_FILE_SYSTEM_ID', 'fs-12345678')
+        monkeypatch.setenv('VPC_ID', 'vpc-12345678')
+        monkeypatch.setenv('SSM_PARAMETER_NAME', '/app/efs/mount-targets')
+        monkeypatch.setenv('ECS_CLUSTER_NAME', 'my-cluster')
+        monkeypatch.setenv('ECS_SERVICE_NAME', 'my-service')
+        monkeypatch.setenv('LOCK_FILE_PATH', lock_path)
+        
+        mock_context = Mock()
+        mock_context.request_id = 'run-a'
+        response = file_monitor.lambda_handler({}, mock_context)
+        
+        body = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert body['fencing_token'] == 1
+        
+        record, _ = file_monitor.LocalFileLockBackend(lock_path).get()
+        assert record['owner'] is None
+
+    
+    def test_lambda_handler_stops_before_ssm_update_when_lock_lost(self, monkeypatch, tmp_path):
+        """Test that the fencing token is re-checked before publishing the mount target list"""
+        lock_path = str(tmp_path / 'lock.json')
+        monkeypatch.setenv('TARGET_DIRECTORY', str(tmp_path))
+        monkeypatch.setenv('FILE_COUNT_THRESHOLD', '0')
+        monkeypatch.setenv('EFS_FILE_SYSTEM_ID', 'fs-12345678')
+        monkeypatch.setenv('VPC_ID', 'vpc-12345678')
+        monkeypatch.setenv('SSM_PARAMETER_NAME', '/app/efs/mount-targets')
+        monkeypatch.setenv('ECS_CLUSTER_NAME', 'my-cluster')
+        monkeypatch.setenv('ECS_SERVICE_NAME', 'my-service')
+        monkeypatch.setenv('LOCK_FILE_PATH', lock_path)
+        
+        mt = {
+            'MountTargetId': 'fsmt-b',
+            'IpAddress': '10.0.1.100',
+            'AvailabilityZoneName': 'ap-northeast-1c',
+            'SubnetId': 'subnet-b',
+            'LifeCycleState': 'available'
+        }
+        
+        def take_over_lease(**kwargs):
+            backend = file_monitor.LocalFileLockBackend(lock_path)
+            backend.put({'owner': 'run-b', 'expires_at': time.time() + 60})
+            return mt
+        
+        mock_context = Mock()
+        mock_context.request_id = 'run-a'
+        with patch.object(file_monitor.efs_client, 'describe_mount_targets') as mock_describe, \
+             patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_subnets, \
+             patch.object(file_monitor.efs_client, 'create_mount_target', side_effect=take_over_lease), \
+             patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get, \
+             patch.object(file_monitor.ssm_client, 'put_parameter') as mock_put, \
+             patch.object(file_monitor.ecs_client, 'describe_services') as mock_services, \
+             patch.object(file_monitor.ecs_client, 'update_service') as mock_update:
+            mock_describe.side_effect = [{'MountTargets': []}, {'MountTargets': [mt]}]
+            mock_subnets.return_value = {'Subnets': [{'SubnetId': 'subnet-b', 'AvailabilityZone': 'ap-northeast-1c'}]}
+            mock_get.return_value = {'Parameter': {'Value': json.dumps({'mount_targets': []})}}
+            mock_services.return_value = {'services': [{'status': 'ACTIVE'}]}
+            
+            response = file_monitor.lambda_handler({}, mock_context)
+        
+        body = json.loads(response['body'])
+        assert response['statusCode'] == 500
+        assert body['error'] == "Invocation lock lost before SSM Parameter Store update"
+        mock_put.assert_not_called()
+        mock_update.assert_not_called()
+        record, _ = file_monitor.LocalFileLockBackend(lock_path).get()
+        assert record['owner'] == 'run-b'
+
+
+class TestResumeInFlightMountTargets:
+    """Tests for resuming in-flight or unpublished mount targets"""
+    
+    def _mt(self, mount_target_id, subnet_id, state):
+        return {
+            'MountTargetId': mount_target_id,
+            'IpAddress': '10.0.1.100',
+            'AvailabilityZoneName': 'ap-northeast-1a',
+            'SubnetId': subnet_id,
+            'LifeCycleState': state
+        }
+    
+    def _set_env(self, monkeypatch, tmpdir):
+        monkeypatch.setenv('TARGET_DIRECTORY', tmpdir)
+        monkeypatch.setenv('FILE_COUNT_THRESHOLD', '0')
+        monkeypatch.setenv('EFS_FILE_SYSTEM_ID', 'fs-12345678')
+        monkeypatch.setenv('VPC_ID', 'vpc-12345678')
+        monkeypatch.setenv('SSM_PARAMETER_NAME', '/app/efs/mount-targets')
+        monkeypatch.setenv('ECS_CLUSTER_NAME', 'my-cluster')
+        monkeypatch.setenv('ECS_SERVICE_NAME', 'my-service')
+        with open(os.path.join(tmpdir, 'file.txt'), 'w') as f:
+            f.write('test')
+    
+    def test_find_in_flight_mount_target(self):
+        """Test that creating/updating mount targets are detected"""
+        mount_targets = [
+            {'mount_target_id': 'fsmt-1', 'lifecycle_state': 'available'},
+            {'mount_target_id': 'fsmt-2', 'lifecycle_state': 'creating'}
+        ]
+        
+        assert file_monitor.find_in_flight_mount_target(mount_targets)['mount_target_id'] == 'fsmt-2'
+        assert file_monitor.find_in_flight_mount_target(mount_targets[:1]) is None
+    
+    def test_find_unpublished_mount_target(self):
+        """Test that an available mount target missing from SSM is detected"""
+        mount_targets = [
+            {'mount_target_id': 'fsmt-1', 'lifecycle_state': 'available'},
+            {'mount_target_id': 'fsmt-2', 'lifecycle_state': 'available'}
+        ]
+        
+        with patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get:
+            mock_get.return_value = {
+                'Parameter': {'Value': json.dumps({'mount_targets': [{'mount_target_id': 'fsmt-1'}]})}
+            }
+            result = file_monitor.find_unpublished_mount_target(mount_targets, '/app/efs/mount-targets')
+        
+        assert result['mount_target_id'] == 'fsmt-2'
+    
+    def test_find_unpublished_mount_target_when_ssm_unreadable(self):
+        """Test that an unreadable SSM parameter never triggers a resume"""
+        mount_targets = [{'mount_target_id': 'fsmt-1', 'lifecycle_state': 'available'}]
+        
+        with patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get:
+            mock_get.side_effect = ClientError({'Error': {'Code': 'ParameterNotFound'}}, 'GetParameter')
+            result = file_monitor.find_unpublished_mount_target(mount_targets, '/app/efs/mount-targets')
+        
+        assert result is None
+    
+    def test_create_mount_target_conflict_resolves_to_existing(self):
+        """Test that a retried create returns the mount target from the earlier attempt"""
+        with patch.object(file_monitor.efs_client, 'create_mount_target') as mock_create, \
+             patch.object(file_monitor.efs_client, 'describe_mount_targets') as mock_describe:
+            mock_create.side_effect = ClientError({'Error': {'Code': 'MountTargetConflict'}}, 'CreateMountTarget')
+            mock_describe.return_value = {
+                'MountTargets': [self._mt('fsmt-earlier', 'subnet-new', 'available')]
+            }
+            
+            result = file_monitor.create_mount_target('fs-12345678', 'subnet-new', wait=False)
+        
+        assert result['mount_target_id'] == 'fsmt-earlier'
+        assert mock_create.call_count == 1
+    
+    def test_lambda_handler_waits_on_in_flight_mount_target(self, monkeypatch):
+        """Test that the handler resumes waiting instead of creating a new mount target"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._set_env(monkeypatch, tmpdir)
+            
+            with patch.object(file_monitor.efs_client, 'describe_mount_targets') as mock_describe, \
+                 patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_subnets, \
+                 patch.object(file_monitor.efs_client, 'create_mount_target') as mock_create, \
+                 patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get, \
+                 patch.object(file_monitor.ssm_client, 'put_parameter'), \
+                 patch.object(file_monitor.ecs_client, 'describe_services') as mock_services, \
+                 patch.object(file_monitor.ecs_client, 'update_service') as mock_update:
+                mock_get.return_value = {'Parameter': {'Value': json.dumps({'mount_targets': []})}}
+                mock_services.return_value = {'services': [{'status': 'ACTIVE'}]}
+                mock_describe.side_effect = [
+                    {'MountTargets': [self._mt('fsmt-inflight', 'subnet-a', 'creating')]},
+                    {'MountTargets': [self._mt('fsmt-inflight', 'subnet-a', 'available')]},
+                    {'MountTargets': [self._mt('fsmt-inflight', 'subnet-a', 'available')]}
+                ]
+                mock_update.return_value = {'service': {'deployments': []}}
+                
+                response = file_monitor.lambda_handler({}, None)
+        
+        body = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert body['resumed_mount_target_id'] == 'fsmt-inflight'
+        assert body['new_mount_target_id'] == 'fsmt-inflight'
+        assert body['mount_target_resumed'] is True
+        assert body['new_mount_target_created'] is False
+        assert body['deployment_triggered'] is True
+        mock_create.assert_not_called()
+    
+    def test_lambda_handler_publishes_unpublished_mount_target(self, monkeypatch):
+        """Test that a mount target left behind by a timed-out run is published, not duplicated"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._set_env(monkeypatch, tmpdir)
+            
+            with patch.object(file_monitor.efs_client, 'describe_mount_targets') as mock_describe, \
+                 patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_subnets, \
+                 patch.object(file_monitor.efs_client, 'create_mount_target') as mock_create, \
+                 patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get, \
+                 patch.object(file_monitor.ssm_client, 'put_parameter') as mock_put, \
+                 patch.object(file_monitor.ecs_client, 'describe_services') as mock_services, \
+                 patch.object(file_monitor.ecs_client, 'update_service') as mock_update:
+                mock_services.return_value = {'services': [{'status': 'ACTIVE'}]}
+                mount_targets = {'MountTargets': [
+                    self._mt('fsmt-published', 'subnet-a', 'available'),
+                    self._mt('fsmt-orphan', 'subnet-b', 'available')
+                ]}
+                mock_describe.return_value = mount_targets
+                mock_get.return_value = {
+                    'Parameter': {'Value': json.dumps({'mount_targets': [{'mount_target_id': 'fsmt-published'}]})}
+                }
+                mock_update.return_value = {'service': {'deployments': []}}
+                
+                response = file_monitor.lambda_handler({}, None)
+        
+        body = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert body['resumed_mount_target_id'] == 'fsmt-orphan'
+        assert (body['mount_target_resumed'], body['new_mount_target_created']) == (True, False)
+        mock_create.assert_not_called()
+        assert 'fsmt-orphan' in mock_put.call_args.kwargs['Value']
+
+
+class TestConcurrentControlPlaneCalls:
+    """Tests for concurrent control-plane calls"""
+    
+    def test_run_concurrently_runs_calls_in_parallel(self):
+        """Test that independent calls overlap in time"""
+        import threading
+        barrier = threading.Barrier(3, timeout=5)
+        
+        futures = file_monitor.run_concurrently({
+            'a': lambda: barrier.wait() is not None and 'a',
+            'b': lambda: barrier.wait() is not None and 'b',
+            'c': lambda: barrier.wait() is not None and 'c'
+        })
+        
+        assert {name: f.result(timeout=5) for name, f in futures.items()} == {'a': 'a', 'b': 'b', 'c': 'c'}
+    
+    def test_run_concurrently_isolates_errors_and_records_latency(self):
+        """Test that a failing call is reported on its own future and latency is recorded"""
+        metrics = file_monitor.InvocationMetrics()
+        
+        def fail():
+            raise ClientError({'Error': {'Code': 'Throttling'}}, 'DescribeSubnets')
+        
+        futures = file_monitor.run_concurrently({'ok': lambda: 1, 'fail': fail}, metrics)
+        
+        assert futures['ok'].result() == 1
+        with pytest.raises(ClientError):
+            futures['fail'].result()
+        assert set(metrics.finish()['call_durations_ms']) == {'ok', 'fail'}
+    
+    def test_find_available_subnet_uses_prefetched_subnets(self):
+        """Test that prefetched subnets avoid a second DescribeSubnets call"""
+        subnets = [
+            {'SubnetId': 'subnet-a', 'AvailabilityZone': 'ap-northeast-1a'},
+            {'SubnetId': 'subnet-b', 'AvailabilityZone': 'ap-northeast-1c'}
+        ]
+        
+        with patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_describe:
+            result = file_monitor.find_available_subnet(
+                'vpc-12345678',
+                [{'subnet_id': 'subnet-a'}],
+                subnets=subnets
+            )
+        
+        assert result == {'subnet_id': 'subnet-b', 'availability_zone': 'ap-northeast-1c'}
+        mock_describe.assert_not_called()
+    
+    def test_lambda_handler_skips_deployment_for_inactive_service(self, monkeypatch):
+        """Test that the parallel ECS lookup prevents redeploying an inactive service"""
+        def mt(mount_target_id, subnet_id):
+            return {
+                'MountTargetId': mount_target_id,
+                'IpAddress': '10.0.1.100',
+                'AvailabilityZoneName': 'ap-northeast-1a',
+                'SubnetId': subnet_id,
+                'LifeCycleState': 'available'
+            }
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            monkeypatch.setenv('TARGET_DIRECTORY', tmpdir)
+            monkeypatch.setenv('FILE_COUNT_THRESHOLD', '0')
+            monkeypatch.setenv('EFS_FILE_SYSTEM_ID', 'fs-12345678')
+            monkeypatch.setenv('VPC_ID', 'vpc-12345678')
+            monkeypatch.setenv('SSM_PARAMETER_NAME', '/app/efs/mount-targets')
+            monkeypatch.setenv('ECS_CLUSTER_NAME', 'my-cluster')
+            monkeypatch.setenv('ECS_SERVICE_NAME', 'my-service')
+            with open(os.path.join(tmpdir, 'file.txt'), 'w') as f:
+                f.write('test')
+            
+            with patch.object(file_monitor.efs_client, 'describe_mount_targets') as mock_describe, \
+                 patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_subnets, \
+                 patch.object(file_monitor.efs_client, 'create_mount_target') as mock_create, \
+                 patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get, \
+                 patch.object(file_monitor.ssm_client, 'put_parameter'), \
+                 patch.object(file_monitor.ecs_client, 'describe_services') as mock_services, \
+                 patch.object(file_monitor.ecs_client, 'update_service') as mock_update:
+                mock_describe.side_effect = [
+                    {'MountTargets': [mt('fsmt-a', 'subnet-a')]},
+                    {'MountTargets': [mt('fsmt-a', 'subnet-a'), mt('fsmt-b', 'subnet-b')]}
+                ]
+                mock_subnets.return_value = {'Subnets': [
+                    {'SubnetId': 'subnet-a', 'AvailabilityZone': 'ap-northeast-1a'},
+                    {'SubnetId': 'subnet-b', 'AvailabilityZone': 'ap-northeast-1c'}
+                ]}
+                mock_create.return_value = mt('fsmt-b', 'subnet-b')
+                mock_get.return_value = {
+                    'Parameter': {'Value': json.dumps({'mount_targets': [{'mount_target_id': 'fsmt-a'}]})}
+                }
+                mock_services.return_value = {'services': [{'status': 'DRAINING'}]}
+                
+                response = file_monitor.lambda_handler({}, None)
+        
+        body = json.loads(response['body'])
+        assert body['new_mount_target_id'] == 'fsmt-b'
+        assert body['deployment_triggered'] is False
+        mock_update.assert_not_called()
+        assert {
+            'describe_mount_targets',
+            'describe_subnets',
+            'get_published_mount_targets',
+            'refresh_mount_targets',
+            'describe_ecs_service'
+        } <= set(body['metrics']['call_durations_ms'])
+
+
+class TestSubnetInventory:
+    """Tests for the deploy-time AZ-to-subnet inventory"""
+    
+    INVENTORY = {
+        'vpc_id': 'vpc-12345678',
+        'availability_zones': {
+            'ap-northeast-1a': [
+                {'subnet_id': 'subnet-priv-a', 'tags': {'Tier': 'Private', 'EfsMountTargetEligible': 'true'}},
+                {'subnet_id': 'subnet-pub-a', 'tags': {'Tier': 'Public', 'EfsMountTargetEligible': 'false'}}
+            ],
+            'ap-northeast-1c': [
+                {'subnet_id': 'subnet-priv-c', 'tags': {'Tier': 'Private', 'EfsMountTargetEligible': 'true'}},
+                {'subnet_id': 'subnet-pub-c', 'tags': {'Tier': 'Public', 'EfsMountTargetEligible': 'false'}}
+            ]
+        }
+    }
+    
+    @pytest.fixture(autouse=True)
+    def clear_inventory_cache(self):
+        file_monitor.invalidate_subnet_inventory('/app/efs/subnet-inventory')
+        yield
+        file_monitor.invalidate_subnet_inventory('/app/efs/subnet-inventory')
+    
+    def _parameter(self, inventory):
+        return {'Parameter': {'Value': json.dumps(inventory)}}
+    
+    def test_validate_rejects_other_vpc(self):
+        """Test that an inventory for another VPC fails validation"""
+        with pytest.raises(ValueError, match="expected vpc-other"):
+            file_monitor.validate_subnet_inventory(self.INVENTORY, 'vpc-other')
+    
+    def test_validate_rejects_malformed_subnet(self):
+        """Test that malformed subnet entries fail validation"""
+        inventory = {'vpc_id': 'vpc-1', 'availability_zones': {'az-a': [{'subnet_id': 'bogus'}]}}
+        with pytest.raises(ValueError):
+            file_monitor.validate_subnet_inventory(inventory, 'vpc-1')
+    
+    def test_inventory_to_subnets_keeps_only_eligible(self):
+        """Test that only subnets tagged as eligible are used"""
+        subnets = file_monitor.inventory_to_subnets(self.INVENTORY)
+        
+        assert [s['SubnetId'] for s in subnets] == ['subnet-priv-a', 'subnet-priv-c']
+    
+    def test_inventory_is_loaded_once_and_used_without_describe_subnets(self):
+        """Test lazy loading and caching of the inventory"""
+        existing = [{'subnet_id': 'subnet-priv-a', 'availability_zone': 'ap-northeast-1a'}]
+        
+        with patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get, \
+             patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_describe:
+            mock_get.return_value = self._parameter(self.INVENTORY)
+            
+            first = file_monitor.find_available_subnet('vpc-12345678', existing, inventory_parameter_name='/app/efs/subnet-inventory')
+            second = file_monitor.find_available_subnet('vpc-12345678', existing, inventory_parameter_name='/app/efs/subnet-inventory')
+        
+        assert first == {'subnet_id': 'subnet-priv-c', 'availability_zone': 'ap-northeast-1c'}
+        assert second == first
+        assert mock_get.call_count == 1
+        mock_describe.assert_not_called()
+    
+    def test_invalid_inventory_falls_back_to_eligible_subnets(self):
+        """Test the live fallback when the inventory fails validation"""
+        with patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get, \
+             patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_describe:
+            mock_get.return_value = self._parameter(dict(self.INVENTORY, vpc_id='vpc-other'))
+            mock_describe.return_value = {'Subnets': [{'SubnetId': 'subnet-live', 'AvailabilityZone': 'ap-northeast-1d'}]}
+            
+            result = file_monitor.find_available_subnet('vpc-12345678', [], inventory_parameter_name='/app/efs/subnet-inventory')
+        
+        assert result['subnet_id'] == 'subnet-live'
+        assert mock_describe.call_count == 1
+        assert {'Name': 'tag:EfsMountTargetEligible', 'Values': ['true']} in mock_describe.call_args.kwargs['Filters']
+    
+    def test_lambda_handler_reads_failed_inventory_once(self, monkeypatch):
+        """Test that a failed inventory prefetch is not fetched again when choosing a subnet"""
+        def mt(mount_target_id, subnet_id, availability_zone):
+            return {
+                'MountTargetId': mount_target_id,
+                'IpAddress': '10.0.1.100',
+                'AvailabilityZoneName': availability_zone,
+                'SubnetId': subnet_id,
+                'LifeCycleState': 'available'
+            }
+        
+        def get_parameter(Name):
+            if Name == '/app/efs/subnet-inventory':
+                return self._parameter(dict(self.INVENTORY, vpc_id='vpc-other'))
+            return {'Parameter': {'Value': json.dumps({'mount_targets': [{'mount_target_id': 'fsmt-a'}]})}}
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            monkeypatch.setenv('TARGET_DIRECTORY', tmpdir)
+            monkeypatch.setenv('FILE_COUNT_THRESHOLD', '0')
+            monkeypatch.setenv('EFS_FILE_SYSTEM_ID', 'fs-12345678')
+            monkeypatch.setenv('VPC_ID', 'vpc-12345678')
+            monkeypatch.setenv('SSM_PARAMETER_NAME', '/app/efs/mount-targets')
+            monkeypatch.setenv('SUBNET_INVENTORY_PARAMETER_NAME', '/app/efs/subnet-inventory')
+            monkeypatch.setenv('ECS_CLUSTER_NAME', 'my-cluster')
+            monkeypatch.setenv('ECS_SERVICE_NAME', 'my-service')
+            with open(os.path.join(tmpdir, 'file.txt'), 'w') as f:
+                f.write('test')
+            
+            with patch.object(file_monitor.efs_client, 'describe_mount_targets') as mock_describe, \
+                 patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_subnets, \
+                 patch.object(file_monitor.efs_client, 'create_mount_target') as mock_create, \
+                 patch.object(file_monitor.ssm_client, 'get_parameter', side_effect=get_parameter) as mock_get, \
+                 patch.object(file_monitor.ssm_client, 'put_parameter'), \
+                 patch.object(file_monitor.ecs_client, 'describe_services') as mock_services, \
+                 patch.object(file_monitor.ecs_client, 'update_service'):
+                mock_describe.side_effect = [
+                    {'MountTargets': [mt('fsmt-a', 'subnet-a', 'ap-northeast-1a')]},
+                    {'MountTargets': [mt('fsmt-a', 'subnet-a', 'ap-northeast-1a'), mt('fsmt-d', 'subnet-d', 'ap-northeast-1d')]}
+                ]
+                mock_subnets.return_value = {'Subnets': [{'SubnetId': 'subnet-d', 'AvailabilityZone': 'ap-northeast-1d'}]}
+                mock_create.return_value = mt('fsmt-d', 'subnet-d', 'ap-northeast-1d')
+                mock_services.return_value = {'services': [{'status': 'ACTIVE'}]}
+                
+                response = file_monitor.lambda_handler({}, None)
+        
+        body = json.loads(response['body'])
+        assert body['new_mount_target_id'] == 'fsmt-d'
+        inventory_reads = [c for c in mock_get.call_args_list if c.kwargs['Name'] == '/app/efs/subnet-inventory']
+        assert len(inventory_reads) == 1
+        assert mock_subnets.call_count == 1
+    
+    def test_full_inventory_returns_none_without_describe_subnets(self):
+        """Test that an inventory with every AZ in use is kept and answers on its own"""
+        existing = [
+            {'subnet_id': 'subnet-priv-a', 'availability_zone': 'ap-northeast-1a'},
+            {'subnet_id': 'subnet-priv-c', 'availability_zone': 'ap-northeast-1c'}
+        ]
+        
+        with patch.object(file_monitor.ssm_client, 'get_parameter') as mock_get, \
+             patch.object(file_monitor.ec2_client, 'describe_subnets') as mock_describe:
+            mock_get.return_value = self._parameter(self.INVENTORY)
+            
+            for _ in range(3):
+                result = file_monitor.find_available_subnet('vpc-12345678', existing, inventory_parameter_name='/app/efs/subnet-inventory')
+                assert result is None
+        
+        assert mock_get.call_count == 1
+        mock_describe.assert_not_called()
+
+
+class TestPublishedWeights:
+    """Tests for preserving operator-set routing weights in the SSM document"""
+    
+    def test_convert_includes_weight_when_present(self):
+        """Test that weights are published alongside the required fields"""
+        mount_targets = [{
+            'mount_target_id': 'fsmt-1',
+            'ip_address': '10.0.1.100',
+            'availability_zone': 'ap-northeast-1a',
+            'subnet_id': 'subnet-1',
+            'lifecycle_state': 'available',
+            'weight': 2
+        }]
+        
+        data = json.loads(convert_mount_targets_to_json(mount_targets))
+        
+        assert data['mount_targets'][0]['weight'] == 2
+        assert 'lifecycle_state' not in data['mount_targets'][0]
+    
+    def test_carry_over_published_weights(self):
+        """Test that weights from the published list survive republishing"""
+        fresh = [{'mount_target_id': 'fsmt-1'}, {'mount_target_id': 'fsmt-2'}]
+        published = [{'mount_target_id': 'fsmt-1', 'weight': 3}]
+        
+        result = file_monitor.carry_over_published_weights(fresh, published)
+        
+        assert result[0]['weight'] == 3
+        assert 'weight' not in result[1]
+        assert file_monitor.carry_over_published_weights(fresh, None) is fresh